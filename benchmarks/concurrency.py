@@ -0,0 +1,78 @@
+"""
+Thread scaling of logio.dynamic_time_warping.dtw.
+
+Runs the same batch of alignments with 1, 2, 4, ... worker threads in one
+process and reports wall time and speedup over one thread. The compiled stages
+(cost matrix, cumsum and backtrack kernels) release the GIL, so on an idle
+machine the speedup should approach the thread count up to the number of cores.
+
+Usage:
+    python benchmarks/concurrency.py --len-x 2000 --len-y 2200 --jobs 16
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from logio.dynamic_time_warping import dtw
+
+
+def _make_logs(len_x, len_y, num_curves, seed):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(size=(len_y, num_curves)), axis=0)
+    # query: the reference resampled along a random monotone warp
+    warp = np.cumsum(rng.uniform(0.5, 1.5, len_x))
+    warp = warp / warp[-1] * (len_y - 1)
+    x = np.column_stack([np.interp(warp, np.arange(len_y), col) for col in y.T])
+    return x + 0.05 * rng.normal(size=x.shape), y
+
+
+def _run_batch(pairs, threads, options):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        distances = list(executor.map(lambda pair: dtw(*pair, **options).distance, pairs))
+    return time.perf_counter() - start, distances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--len-x", type=int, default=2000)
+    parser.add_argument("--len-y", type=int, default=2200)
+    parser.add_argument("--curves", type=int, default=2)
+    parser.add_argument("--jobs", type=int, default=16, help="alignments per batch")
+    parser.add_argument("--window-size", type=int, default=None,
+        help="Sakoe-Chiba window size; full matrix if omitted")
+    parser.add_argument("--traceback", action="store_true")
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    pairs = [_make_logs(args.len_x, args.len_y, args.curves, seed) for seed in range(args.jobs)]
+    options = {"traceback": args.traceback}
+    if args.window_size is not None:
+        options.update(window_type="sakoechiba", window_size=args.window_size)
+
+    # compile every kernel before timing
+    _run_batch(pairs[:1], 1, options)
+    threads = [1]
+    while threads[-1] * 2 <= args.max_threads:
+        threads.append(threads[-1] * 2)
+    if threads[-1] != args.max_threads:
+        threads.append(args.max_threads)
+
+    print("{0} alignments of {1} x {2}, {3} cores".format(
+        args.jobs, args.len_x, args.len_y, os.cpu_count()))
+    print("{0:>8s}{1:>12s}{2:>10s}".format("threads", "seconds", "speedup"))
+    base, expected = _run_batch(pairs, 1, options)
+    print("{0:>8d}{1:>12.3f}{2:>10.2f}".format(1, base, 1.0))
+    for num in threads[1:]:
+        elapsed, distances = _run_batch(pairs, num, options)
+        if distances != expected:
+            raise RuntimeError("threaded results differ from the serial run")
+        print("{0:>8d}{1:>12.3f}{2:>10.2f}".format(num, elapsed, base / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,4 @@
 from .analysis_convert import Analysis
-from .analysis_convert import FileConverter
\ No newline at end of file
+from .analysis_convert import FileConverter
+from .resample import Resampler
+from .synthetic import LogSynthesizer
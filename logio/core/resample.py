@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from .analysis_convert import InvalidFormatException
+
+
+class Resampler:
+    """
+    This class regrids well log data onto a regular depth step.
+
+    Wells logged at different sampling rates (e.g. 0.1524 m, 0.5 ft or irregular
+    steps) have to share a common depth step before they are correlated, because
+    dynamic time warping works on sample indices. The output grid is anchored at
+    integer multiples of ``step``, so every well resampled by the same ``Resampler``
+    lands on the same depth nodes.
+
+    It houses two methods:
+
+       | resample: regrid a DataFrame onto the depth step;
+       | decimate: block-average a regular DataFrame onto a coarser step.
+
+    Attributes
+    ----------
+        step : float
+            Output depth step.
+        depth : str
+            Name of the depth column.
+        method : str
+            Interpolation method, "linear" or "mean" (block average).
+        max_gap : float or None
+            Largest depth interval that may be bridged by interpolation.
+            Output nodes falling in larger gaps are set to NaN.
+    """
+
+    methods = ("linear", "mean")
+
+    def __init__(self, step, depth="DEPTH", method="linear", max_gap=None):
+        """
+        Constructs all the necessary attributes for the Resampler object.
+
+        Parameters
+        ----------
+            step : float
+                Output depth step.
+            depth : str
+                Name of the depth column, e.g. "DEPTH" for frames returned
+                by ``Analysis.read_file``.
+            method : str
+                "linear" interpolates between the bracketing samples,
+                "mean" averages all samples falling in each depth bin.
+            max_gap : float, optional
+                Largest depth interval bridged by linear interpolation.
+                Defaults to twice the output step.
+        """
+        if step <= 0:
+            raise ValueError("step must be positive")
+        if method not in self.methods:
+            raise ValueError("method must be one of: 'linear', 'mean'")
+        self.step = float(step)
+        self.depth = depth
+        self.method = method
+        self.max_gap = 2 * self.step if max_gap is None else float(max_gap)
+
+    def grid(self, start, stop):
+        """
+        Depth nodes of the output grid covering [start, stop].
+
+        Parameters
+        ----------
+        start, stop : float
+            Depth range to cover.
+
+        Returns
+        -------
+        1D array
+            Depth nodes, integer multiples of ``step``.
+        """
+        first = int(np.ceil(start / self.step - 1e-9))
+        last = int(np.floor(stop / self.step + 1e-9))
+        return np.arange(first, last + 1) * self.step
+
+    def resample(self, data, start=None, stop=None):
+        """
+        Regrid a well log DataFrame onto the depth step.
+
+        Parameters
+        ----------
+        data : DataFrame
+            Well log data with a depth column, as returned by ``Analysis.read_file``.
+        start, stop : float, optional
+            Depth range of the output. Defaults to the range of the data.
+
+        Returns
+        -------
+        DataFrame
+            Resampled log data. Numerical columns are interpolated with ``method``,
+            other (e.g. facies) columns take the nearest sample.
+        """
+        depth, order, values, numeric, other = self._split(data)
+        start = depth[0] if start is None else start
+        stop = depth[-1] if stop is None else stop
+        nodes = self.grid(start, stop)
+
+        if self.method == "linear":
+            out = _interp_linear(depth, values, nodes, self.max_gap)
+        else:
+            out = _block_mean(depth, values, nodes, self.step)
+
+        result = DataFrame(out, columns=numeric)
+        if len(other):
+            nearest = _nearest(depth, nodes, max(self.max_gap, self.step / 2))
+            for col in other:
+                column = data[col].to_numpy()[order]
+                result[col] = pd.Series(column[np.maximum(nearest, 0)]).where(nearest >= 0).values
+        result.insert(0, self.depth, nodes)
+        return result[[self.depth] + [col for col in data.columns if col != self.depth]]
+
+    def decimate(self, data, factor):
+        """
+        Block-average a regularly sampled DataFrame onto a coarser step.
+
+        Parameters
+        ----------
+        data : DataFrame
+            Regularly sampled log data, e.g. the output of :meth:`resample`.
+        factor : int
+            Number of samples averaged into each output sample.
+
+        Returns
+        -------
+        DataFrame
+            Decimated log data with depth step ``factor * step``.
+        """
+        factor = int(factor)
+        if factor < 1:
+            raise ValueError("factor must be a positive integer")
+        coarse = Resampler(self.step * factor, depth=self.depth, method="mean")
+        return coarse.resample(data)
+
+    def _split(self, data):
+        """Extract sorted depth, sort order and numerical values from ``data``."""
+        if not isinstance(data, DataFrame):
+            raise InvalidFormatException("data input is not a DataFrame object")
+        if self.depth not in data.columns:
+            raise InvalidFormatException(f"depth column {self.depth} not found in data")
+        depth = data[self.depth].to_numpy(dtype=np.float64)
+        order = np.argsort(depth, kind="stable")
+        order = order[~np.isnan(depth[order])]
+        columns = [col for col in data.columns if col != self.depth]
+        numeric = [col for col in columns if pd.api.types.is_numeric_dtype(data[col])]
+        other = [col for col in columns if col not in numeric]
+        values = data[numeric].to_numpy(dtype=np.float64)[order]
+        return depth[order], order, values, numeric, other
+
+
+def _interp_linear(depth, values, nodes, max_gap):
+    """Linear interpolation of every column at once; NaNs and wide gaps propagate."""
+    n = depth.size
+    right = np.searchsorted(depth, nodes, side="right")
+    left = right - 1
+    inside = (left >= 0) & (right < n)
+    exact = (left >= 0) & (depth[np.clip(left, 0, n - 1)] == nodes)
+    left = np.clip(left, 0, n - 1)
+    right = np.clip(right, 0, n - 1)
+    span = depth[right] - depth[left]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = np.where(span > 0, (nodes - depth[left]) / span, 0.0)
+    out = values[left] + frac[:, np.newaxis] * (values[right] - values[left])
+    # nodes sitting on a sample take its value even if the neighbour is missing
+    out[exact] = values[left[exact]]
+    invalid = ~(inside & (span <= max_gap)) & ~exact
+    out[invalid] = np.nan
+    return out
+
+
+def _block_mean(depth, values, nodes, step):
+    """Average the samples falling in each bin centred on ``nodes``; empty bins are NaN."""
+    num_nodes, num_cols = nodes.size, values.shape[1]
+    if num_nodes == 0:
+        return np.empty((0, num_cols))
+    bins = np.floor((depth - nodes[0]) / step + 0.5).astype(np.int64)
+    keep = (bins >= 0) & (bins < num_nodes)
+    bins, values = bins[keep], values[keep]
+    valid = ~np.isnan(values)
+    flat = (bins[:, np.newaxis] * num_cols + np.arange(num_cols)).ravel()
+    size = num_nodes * num_cols
+    total = np.bincount(flat, weights=np.where(valid, values, 0.0).ravel(), minlength=size)
+    count = np.bincount(flat, weights=valid.ravel(), minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = total / count
+    return out.reshape(num_nodes, num_cols)
+
+
+def _nearest(depth, nodes, tolerance):
+    """Index of the nearest sample for every node, -1 if further than ``tolerance``."""
+    n = depth.size
+    right = np.clip(np.searchsorted(depth, nodes), 0, n - 1)
+    left = np.clip(right - 1, 0, n - 1)
+    take_left = np.abs(nodes - depth[left]) <= np.abs(depth[right] - nodes)
+    idx = np.where(take_left, left, right)
+    return np.where(np.abs(depth[idx] - nodes) <= tolerance, idx, -1)
@@ -0,0 +1,283 @@
+import numpy as np
+from pandas import DataFrame
+from scipy.ndimage import uniform_filter1d
+
+
+class LogSynthesizer:
+    """
+    This class synthesizes well logs and warped copies with a known alignment.
+
+    Logs are built from a latent shale volume: blocky beds of random thickness,
+    tapered at their boundaries and modulated by depositional cycles, over a
+    sand porosity that decreases with depth. Gamma ray, bulk density and neutron
+    porosity follow from shale volume and porosity through linear mixing rules,
+    with measurement noise and missing intervals on top. Every step is a
+    vectorized array operation, so millions of samples take seconds.
+
+    Warped copies resample a log along a smooth monotone mapping with a random
+    local stretch, starting at a bulk offset and optionally truncated, and come
+    with the ground-truth warping path, for benchmarks and accuracy checks of
+    dynamic time warping.
+
+    It houses three methods:
+
+       | log: synthesize a log;
+       | warp: warp, shift and truncate a log, returning the ground-truth path;
+       | pair: synthesize a reference log and a warped query of it.
+
+    Attributes
+    ----------
+        step : float
+            Depth step of synthesized logs.
+        curves : list
+            Curves to synthesize, any of "GR", "RHOB", "NPHI".
+        noise : float
+            Scale of the measurement noise; 1 gives typical tool noise.
+        gaps : float
+            Share of the samples of every curve set missing (NaN).
+        gap_length : int
+            Mean length of a missing interval, in samples.
+        bed : int
+            Mean bed thickness, in samples.
+        cycles : tuple
+            Periods of the depositional cycles, in samples.
+    """
+
+    curve_names = ("GR", "RHOB", "NPHI")
+    # standard deviation of the measurement noise at noise=1
+    noise_levels = {"GR": 3.0, "RHOB": 0.015, "NPHI": 0.01}
+
+    def __init__(self, step=0.1, curves=("GR", "RHOB", "NPHI"), noise=1.0, gaps=0.0,
+        gap_length=50, bed=40, cycles=(400, 2500), seed=None):
+        """
+        Constructs all the necessary attributes for the LogSynthesizer object.
+
+        Parameters
+        ----------
+            step : float
+                Depth step of synthesized logs, e.g. 0.1 like the tutorial wells.
+            curves : list
+                Curves to synthesize, any of "GR", "RHOB", "NPHI".
+            noise : float
+                Scale of the measurement noise; 0 gives clean logs.
+            gaps : float
+                Share of the samples of every curve set missing, in [0, 1).
+            gap_length : int
+                Mean length of a missing interval, in samples.
+            bed : int
+                Mean bed thickness, in samples.
+            cycles : tuple
+                Periods of the depositional cycles, in samples.
+            seed : int or numpy.random.Generator, optional
+                Seed of the random numbers, for reproducible logs.
+        """
+        if step <= 0:
+            raise ValueError("step must be positive")
+        self.curves = list(curves)
+        for curve in self.curves:
+            if curve not in self.curve_names:
+                raise ValueError("curves must be any of: 'GR', 'RHOB', 'NPHI'")
+        if not 0 <= gaps < 1:
+            raise ValueError("gaps must be in [0, 1)")
+        self.step = float(step)
+        self.noise = float(noise)
+        self.gaps = float(gaps)
+        self.gap_length = max(int(gap_length), 1)
+        self.bed = max(int(bed), 1)
+        self.cycles = tuple(cycles)
+        self.rng = np.random.default_rng(seed)
+
+    def _shale_volume(self, num_samples):
+        """Latent shale volume in [0, 1] (tapered beds modulated by cycles) and the bed of every sample."""
+        num_beds = num_samples // self.bed + 16
+        thickness = np.maximum(self.rng.exponential(self.bed, num_beds), 1).astype(np.int64)
+        while thickness.sum() < num_samples:
+            more = np.maximum(self.rng.exponential(self.bed, num_beds), 1).astype(np.int64)
+            thickness = np.concatenate((thickness, more))
+        # sands and shales rather than mixtures
+        beds = self.rng.beta(0.5, 0.5, thickness.size)
+        vsh = np.repeat(beds, thickness)[:num_samples]
+        vsh = uniform_filter1d(vsh, max(self.bed // 4, 1), mode="nearest")
+        samples = np.arange(num_samples)
+        for period in self.cycles:
+            phase = self.rng.uniform(0, 2 * np.pi)
+            vsh += 0.15 * np.sin(2 * np.pi * samples / period + phase)
+        return np.clip(vsh, 0.0, 1.0), np.repeat(np.arange(thickness.size), thickness)[:num_samples]
+
+    def _clean(self, num_samples):
+        """Noise-free curves as (sample * curve) array."""
+        vsh, bed_index = self._shale_volume(num_samples)
+        # sand porosity compacting with depth, varying from bed to bed
+        burial = np.arange(num_samples) * self.step
+        porosity = 0.3 * np.exp(-burial / 5000.0) \
+            + self.rng.normal(0, 0.03, bed_index[-1] + 1)[bed_index]
+        porosity = np.clip(porosity * (1 - vsh) + 0.1 * vsh, 0.01, 0.45)
+        curves = {"GR": 20.0 + 110.0 * vsh,
+            "RHOB": 2.65 * (1 - porosity) + 1.0 * porosity + 0.05 * vsh,
+            "NPHI": porosity + 0.2 * vsh}
+        return np.column_stack([curves[curve] for curve in self.curves])
+
+    def _observe(self, values, curves, noise=None):
+        """Add measurement noise and missing intervals to clean curves, in place."""
+        noise = self.noise if noise is None else noise
+        num_samples = values.shape[0]
+        for col, curve in enumerate(curves):
+            if noise > 0:
+                level = self.noise_levels.get(curve)
+                if level is None:
+                    # curves of other logs: a fiftieth of their spread
+                    level = 0.02 * np.nanstd(values[:, col])
+                values[:, col] += self.rng.normal(0, noise * level, num_samples)
+            if self.gaps > 0:
+                values[self._gap_mask(num_samples), col] = np.nan
+        if "NPHI" in curves:
+            col = list(curves).index("NPHI")
+            values[:, col] = np.maximum(values[:, col], 0.0)
+        return values
+
+    def _gap_mask(self, num_samples):
+        """Random missing intervals covering about ``gaps`` of the samples."""
+        num_gaps = self.rng.poisson(self.gaps * num_samples / self.gap_length)
+        starts = self.rng.integers(0, num_samples, num_gaps)
+        stops = np.minimum(starts + self.rng.geometric(1 / self.gap_length, num_gaps), num_samples)
+        edges = np.zeros(num_samples + 1, dtype=np.int64)
+        np.add.at(edges, starts, 1)
+        np.add.at(edges, stops, -1)
+        return np.cumsum(edges[:-1]) > 0
+
+    def log(self, num_samples, top=0.0):
+        """
+        Synthesize a log.
+
+        Parameters
+        ----------
+        num_samples : int
+            Number of samples.
+        top : float
+            Depth of the first sample.
+
+        Returns
+        -------
+        DataFrame
+            "DEPTH" column followed by the curves.
+        """
+        values = self._observe(self._clean(int(num_samples)), self.curves)
+        log = DataFrame(values, columns=self.curves)
+        log.insert(0, "DEPTH", top + self.step * np.arange(values.shape[0]))
+        return log
+
+    def warp(self, log, stretch=1.0, wobble=0.1, wavelength=500, offset=0.0, length=None,
+        depth_shift=0.0, noise=None, depth="DEPTH"):
+        """
+        Warp, shift and truncate a log, returning the ground-truth path.
+
+        Query sample k lies at the fractional reference position f(k): f starts
+        at ``offset`` and advances by the local stretch, which wanders smoothly
+        around ``stretch`` (log-normal, knots ``wavelength`` query samples apart),
+        so f is strictly increasing. Query curves are interpolated from the log
+        at f(k) and get fresh noise and gaps.
+
+        Parameters
+        ----------
+        log : DataFrame
+            Reference log, e.g. from ``log`` or ``Analysis.read_file``. Its
+            missing values carry over into the query.
+        stretch : float
+            Mean reference samples per query sample; above 1 the query is
+            compressed, below 1 it is expanded.
+        wobble : float
+            Standard deviation of the log of the local stretch.
+        wavelength : int
+            Query samples between independent stretch values.
+        offset : float
+            Reference position of the first query sample (bulk shift).
+        length : int, optional
+            Number of query samples. Defaults to reaching the end of the log;
+            a query running past the end is truncated there.
+        depth_shift : float
+            Added to the query depths, as a depth datum mismatch between wells.
+        noise : float, optional
+            Noise scale of the query; defaults to the synthesizer's.
+        depth : str
+            Name of the depth column; without it, depths are sample indices.
+
+        Returns
+        -------
+        query : DataFrame
+            Warped log, regular depth step equal to the log's.
+        path : 2D array
+            Ground-truth warping path of (query index, reference index) pairs,
+            monotone and connected like a dtw path.
+        """
+        if stretch <= 0:
+            raise ValueError("stretch must be positive")
+        curves = [col for col in log.columns if col != depth]
+        values = log[curves].to_numpy(dtype=np.float64)
+        num_samples = values.shape[0]
+        if not 0 <= offset < num_samples - 1:
+            raise ValueError("offset must lie within the log")
+        nominal = int(np.ceil((num_samples - 1 - offset) / stretch)) + 1
+        length = nominal if length is None else int(length)
+        # smooth local stretch, normalized to the mean stretch
+        num_knots = length // max(int(wavelength), 1) + 2
+        knots = self.rng.normal(0, wobble, num_knots)
+        rate = np.exp(np.interp(np.arange(length - 1) / max(int(wavelength), 1),
+            np.arange(num_knots), knots))
+        rate *= stretch / rate.mean() if rate.size else 1.0
+        position = offset + np.concatenate(([0.0], np.cumsum(rate)))
+        # truncated at the end of the log
+        position = position[position <= num_samples - 1]
+
+        grid = np.arange(num_samples)
+        warped = np.column_stack([np.interp(position, grid, values[:, col])
+            for col in range(len(curves))])
+        query = DataFrame(self._observe(warped, curves, noise), columns=curves)
+        if depth in log.columns:
+            ref_depth = log[depth].to_numpy(dtype=np.float64)
+            step = np.median(np.diff(ref_depth)) if num_samples > 1 else self.step
+            top = np.interp(position[0], grid, ref_depth) + depth_shift
+        else:
+            step, top = 1.0, position[0] + depth_shift
+        query.insert(0, depth, top + step * np.arange(position.size))
+        return query, _position_path(position)
+
+    def pair(self, num_samples, top=0.0, **kwargs):
+        """
+        Synthesize a reference log and a warped query of it.
+
+        Parameters
+        ----------
+        num_samples : int
+            Number of reference samples.
+        top : float
+            Depth of the first reference sample.
+        **kwargs :
+            Passed to ``warp``, e.g. stretch, wobble, offset, length.
+
+        Returns
+        -------
+        query : DataFrame
+        reference : DataFrame
+        path : 2D array
+            Ground-truth warping path of (query index, reference index) pairs.
+        """
+        reference = self.log(num_samples, top)
+        query, path = self.warp(reference, **kwargs)
+        return query, reference, path
+
+
+def _position_path(position):
+    """
+    Monotone connected path through fractional reference positions.
+
+    Query sample k is matched to round(position[k]) and, when the next sample
+    jumps ahead by more than one, to the reference samples in between, so steps
+    are (1, 0), (0, 1) or (1, 1).
+    """
+    ref_idx = np.round(position).astype(np.int64)
+    jump = np.diff(ref_idx)
+    counts = np.append(np.maximum(jump, 1), 1)
+    rows = np.repeat(np.arange(ref_idx.size), counts)
+    run_start = np.cumsum(counts) - counts
+    cols = np.repeat(ref_idx, counts) + np.arange(rows.size) - np.repeat(run_start, counts)
+    return np.column_stack((rows, cols))
@@ -1,15 +1,34 @@
+import shutil
+import tempfile
+
 import numpy as np
+from scipy.sparse import issparse
 from scipy.spatial.distance import cdist
-from .cost import _calc_cumsum_matrix_jit
-from .backtrack import _backtrack_jit
+from .cost import _calc_cumsum_matrix_jit, _get_cumsum_rows_kernel, _num_rolling_rows
+from .cost import _TB_NONE
+from .backtrack import _get_backtrack, _backtrack_traceback_jit, _backtrack_checkpointed
+from .backtrack import _checkpoint_levels, _NUM_SPLITS
 from .step_pattern import *
 from .window import *
+from .window import _intersect_ranges
 from .result import DtwResult
-from .distance import _get_alignment_distance
+from .banded import BandedMatrix, _banded_cdist, _pattern_ranges
+from .categorical import CategoricalCost
+from .distance import _get_row_alignment_distance
+from .profile import DtwProfile, _get_profile
+from .features import FeatureCost, _prepare_features, _get_weights
+from .shift import estimate_shift
+from .cache import DtwCache, _get_cache, _cache_key
+from .reduce import _get_reduction, _reduce_log, _reduce_window, _expand_result
+from .plan import _get_budget, _estimate, _plan
+from .progress import _check_cancel, _run_in_chunks
 
 
 def dtw(x, y, dist="euclidean", window_type="none", window_size=None,
-    step_pattern="symmetric2", dist_only=False, open_begin=False, open_end=False):
+    step_pattern="symmetric2", dist_only=False, open_begin=False, open_end=False,
+    x_depth=None, y_depth=None, profile=False, curves=None, weights=None,
+    transforms=None, nan_policy="propagate", gap_cost=None, traceback=False,
+    prior=None, cache=None, reduce=None, memory_budget=None, progress=None, cancel=None):
     """
     Perform dynamic time warping (dtw).
 
@@ -17,12 +36,20 @@ def dtw(x, y, dist="euclidean", window_type="none", window_size=None,
     ----------
     A Dynamic Programming algorithm to correlate well logs and to find the minimum-cost or "best" match.
 
+    The warping path is backtracked with the step pattern the cumsum kernel
+    chooses at every cell: cost of the pattern's start cell plus its weighted
+    step costs, the first minimum on ties. Its cost therefore equals the
+    alignment distance, and it is the same in traceback mode and under every
+    memory strategy. Earlier versions chose the pattern by the cost of its start
+    cell alone; distances are unchanged, but paths may differ from theirs
+    wherever that choice was not optimal.
+
     Parameters
     ----------
-    x : 1D or 2D array (sample * feature)
+    x : 1D or 2D array (sample * feature), Series or DataFrame
         Query log.
 
-    y : 1D or 2D array (sample * feature)
+    y : 1D or 2D array (sample * feature), Series or DataFrame
         Reference log.
 
     dist : string or callable
@@ -30,13 +57,17 @@ def dtw(x, y, dist="euclidean", window_type="none", window_size=None,
         a string given, it will be interpreted as metric argument of ``scipy.spatial.distance``.
         If callable that defines metric between two samples, it will be used to compute distance matrix.
 
-    window_type : string
+    window_type : string or window.BaseWindow object
         Window type to use.  
         If "sakoechiba" given, Sakoechiba window will be used.
         If "itakura" given, Itakura window will be used.
+        If "shifted" given, the bulk shift and stretch of x against y are estimated
+        by :func:`estimate_shift` and a ShiftedBandWindow follows them.
+        If "corridor" given, a CorridorWindow is built around the ``prior`` path.
+        A window object is used as is.
 
     window_size : int
-        Window size to use for Sakoechiba window.
+        Window size to use for Sakoechiba and shifted band windows; corridor radius.
 
     step_pattern : string
         Step pattern to use.
@@ -52,12 +83,127 @@ def dtw(x, y, dist="euclidean", window_type="none", window_size=None,
         Whether or not perform open-ended alignment at the end point of query log.
         If true, partial alignment will be performed.
 
+    x_depth : 1D array, optional
+        Depth of each sample of the query log, e.g. the depth column of a
+        DataFrame regridded by ``logio.core.Resampler``.
+
+    y_depth : 1D array, optional
+        Depth of each sample of the reference log.
+
+    profile : bool
+        Whether or not to record wall time per stage, matrix sizes and allocation
+        estimates in the ``profile`` attribute of the result.
+
+    curves : list, optional
+        Curves to correlate on: column names when x and y are DataFrames
+        (e.g. ["GR", "RHOB", "NPHI", "RT"]), column indices for arrays.
+
+    weights : list or dict, optional
+        Weight of each curve in the local cost, passed to ``scipy.spatial.distance``
+        as the ``w`` argument; requires a string ``dist``.
+
+    transforms : str, list or dict, optional
+        Per-curve transform applied to each log before the local cost:
+        "log10", "zscore", "minmax" or None. z-score and min-max statistics are
+        computed per log. A string applies the same transform to every curve.
+
+    nan_policy : string
+        How samples with missing (NaN) values are handled.
+        If "propagate", NaNs go into the local cost unchanged.
+        If "raise", a ValueError is raised if any sample is missing.
+        If "gap", every cell involving a missing sample costs ``gap_cost``.
+        If "skip", such cells cost nothing, so the path crosses gaps freely.
+        Paths stay in the original sample index space.
+
+    gap_cost : float
+        Local cost of cells involving a missing sample, for ``nan_policy="gap"``.
+
+    traceback : bool
+        Whether or not to run in traceback mode: the winning step pattern of every
+        window cell is recorded as one byte and only the rolling rows of the cumsum
+        matrix are kept, cutting memory about 8x. The warping path is walked from the
+        recorded directions; ``cumsum_matrix`` of the result is None.
+        Requires a Sakoechiba, Itakura, no or contiguous user window. Always on
+        for a corridor window, so its memory scales with the corridor.
+
+    prior : result.DtwResult or 2D array, optional
+        Previous alignment of the logs, for ``window_type="corridor"`` only. If
+        both the prior result and this call carry depth axes, the prior path is
+        carried over in depth units, so logs re-gridded or extended since still
+        line up.
+
+    cache : str, path-like or cache.DtwCache, optional
+        On-disk result cache. Runs are keyed by a hash of the prepared logs and
+        all parameters above that affect the result; on a hit nothing is computed
+        and a slim result (see :meth:`result.DtwResult.slim`) is returned.
+        Requires a string ``dist``.
+
+    reduce : int or tuple, optional
+        Align coarse versions of both logs: every segment of r samples becomes one
+        sample, cutting the number of matrix cells about r**2 times. An int r
+        takes segment means (piecewise aggregate approximation); ("envelope", r)
+        takes the segment minimum and maximum of every curve; ("paa", r) equals r.
+        ``window_size``, window objects and ``prior`` stay in full-resolution
+        samples. The path and window of the result are mapped back to
+        full-resolution indices; distances are those of the coarse alignment,
+        and no cumsum matrix is kept.
+
+    memory_budget : int or str, optional
+        Bytes the run may hold at once, e.g. 2e9 or "2GB". The footprint of the
+        cost matrix, cumsum matrix, window and path is estimated for every
+        strategy that applies, and the first of these that fits is run: "dense" or
+        "banded" cost with the full cumsum matrix, "traceback" mode, "linear"
+        (costs computed cell by cell from the samples, for "euclidean",
+        "sqeuclidean" and "cityblock"; only rolling cumsum rows and copies of them
+        saved at block starts are held, and the traceback of one block at a time
+        is recomputed while the path is walked, at a few extra passes over the
+        window) or "out-of-core" (costs computed cell by cell and one traceback
+        byte per window cell, i.e. len_x * len_y bytes without a window, in a
+        memory-mapped file in the temporary directory; left out when the
+        temporary directory has less free space). The plan is recorded
+        in the ``plan`` attribute of the result; a MemoryError listing the
+        estimates is raised up front when none fits. All strategies give the
+        same distance and path; only "dense" and "banded" keep the cumsum
+        matrix.
+
+    progress : callable, optional
+        Called as progress(rows_done, total_rows, eta) while the cumsum matrix
+        is computed, eta being the estimated seconds left (NaN until the second
+        chunk, as the first one may include compiling the kernel). The kernel then runs
+        in chunks of a few million window cells; without progress and cancel it
+        runs in one call. Rows are those of the (reduced) query log.
+
+    cancel : progress.CancelToken or threading.Event, optional
+        Checked before the cost matrix and between kernel chunks; once set, the
+        run stops with progress.DtwCancelled. Windows without row ranges are
+        computed in one call, so they are only checked before and after it.
+
     Returns
     -------
     result.DtwResult
         Result obj.
 
     """
+    profile = _get_profile(profile)
+    cache = _get_cache(cache)
+    if memory_budget is not None:
+        budget = _get_budget(memory_budget)
+    if reduce is not None:
+        method, factor = _get_reduction(reduce)
+    if cache is not None and type(dist) != str:
+        raise ValueError("cache requires dist to be given as a string metric")
+    w = None
+    if curves is not None or transforms is not None:
+        # one float copy per log, transformed in place
+        x, x_curves = _prepare_features(x, curves, transforms)
+        y, _ = _prepare_features(y, curves, transforms)
+        w = _get_weights(weights, x_curves)
+    elif weights is not None:
+        # logs used as given, e.g. features prepared once by the caller
+        x_curves = list(getattr(x, "columns", range(np.shape(x)[1] if np.ndim(x) == 2 else 1)))
+        w = _get_weights(weights, x_curves)
+    if w is not None and type(dist) != str:
+        raise ValueError("weights require dist to be given as a string metric")
     len_x = x.shape[0]; len_y = y.shape[0]
     # if 1D array, convert to 2D array
     if x.ndim == 1:
@@ -66,31 +212,205 @@ def dtw(x, y, dist="euclidean", window_type="none", window_size=None,
     if y.ndim == 1:
         y = np.array(y)
         y = y[:, np.newaxis]
-
+    x_valid, y_valid, gap_cost = _get_validity(x, y, nan_policy, gap_cost)
+
+    profile.count("num_features", x.shape[1])
+
+    with profile.stage("window"):
+        if prior is not None:
+            _check_prior(window_type)
+            prior = _get_prior_path(prior, x_depth, y_depth)
+
+    if cache is not None:
+        with profile.stage("cache"):
+            key = _cache_key(x, y, dist=dist, window_type=window_type, window_size=window_size,
+                step_pattern=step_pattern, dist_only=dist_only, open_begin=open_begin,
+                open_end=open_end, w=w, nan_policy=nan_policy, gap_cost=gap_cost,
+                traceback=traceback, prior=prior, reduce=reduce)
+            result = cache.get(key, _get_pattern(step_pattern))
+        if result is not None:
+            result.set_depth(x_depth, y_depth)
+            result.profile = profile if profile.enabled else None
+            return result
+
+    full_len_x, full_len_y = len_x, len_y
+    if reduce is not None:
+        with profile.stage("reduce"):
+            x = _reduce_log(x, method, factor)
+            y = _reduce_log(y, method, factor)
+            if method == "envelope" and w is not None:
+                w = np.concatenate((w, w))
+            len_x, len_y = x.shape[0], y.shape[0]
+            x_valid, y_valid, gap_cost = _get_validity(x, y, nan_policy, gap_cost)
+            if window_size is not None:
+                window_size = -(-window_size // factor)
+            if isinstance(window_type, BaseWindow):
+                window_type = _reduce_window(window_type, factor, len_x, len_y)
+            if prior is not None:
+                prior = prior / factor
+        profile.count("reduced_len_x", len_x)
+        profile.count("reduced_len_y", len_y)
+
+    with profile.stage("window"):
+        if window_type == "shifted":
+            shift, stretch, _ = estimate_shift(x, y)
+            window = ShiftedBandWindow(len_x, len_y, window_size, shift, stretch)
+        else:
+            window = _get_window(window_type, window_size, len_x, len_y, prior)
+    if isinstance(window, CorridorWindow):
+        # only the corridor is stored, never the full cumsum matrix
+        traceback = True
+
+    ranges = None
+    if window.ranges is not None and (type(dist) == str or memory_budget is not None):
+        # cells read by the step pattern inside the window
+        ranges = _pattern_ranges(window.ranges, _get_pattern(step_pattern).array, len_y)
+    plan = None
+    scratch_dir = None
+    if memory_budget is not None:
+        with profile.stage("plan"):
+            pattern_cells = None if ranges is None else int((ranges[:, 1] - ranges[:, 0]).sum())
+            estimates, disk_bytes = _estimate(len_x, len_y, x.shape[1], window, pattern_cells,
+                _num_rolling_rows(_get_pattern(step_pattern).array), dist, dist_only, open_begin)
+            plan = _plan(budget, estimates, disk_bytes, traceback,
+                shutil.disk_usage(tempfile.gettempdir()).free)
+        if plan.strategy in ("traceback", "linear", "out-of-core"):
+            traceback = True
+        if plan.strategy == "out-of-core":
+            scratch_dir = tempfile.gettempdir()
+    strategy = None if plan is None else plan.strategy
+
+    _check_cancel(cancel)
     # get pair-wise cost matrix
-    if type(dist) == str:
-        # scipy
-        X = cdist(x, y, metric=dist)
-    else:
-        # user defined metric
-        window = _get_window(window_type, window_size, len_x, len_y)
-        X = np.ones([len_x, len_y]) * np.inf
-        for i, j in window.list:
-            X[i, j] = dist(x[i, :], y[j, :])
+    with profile.stage("distance"):
+        if strategy in ("linear", "out-of-core"):
+            # costs are computed inside the kernel
+            X = FeatureCost(x, y, dist, w)
+        elif type(dist) == str:
+            # scipy
+            if strategy in ("banded", "traceback") or (strategy is None and ranges is not None
+                and 2 * (ranges[:, 1] - ranges[:, 0]).sum() < len_x * len_y):
+                # narrow window; costs outside it are never read
+                X = _banded_cdist(x, y, ranges, metric=dist, w=w)
+            else:
+                X = cdist(x, y, metric=dist) if w is None else cdist(x, y, metric=dist, w=w)
+        else:
+            # user defined metric
+            X = np.ones([len_x, len_y]) * np.inf
+            for i, j in window.list:
+                X[i, j] = dist(x[i, :], y[j, :])
+
+    result = dtw_from_distance_matrix(X, window, window_size, step_pattern,
+        dist_only, open_begin, open_end, profile, x_valid, y_valid, gap_cost, traceback,
+        scratch_dir=scratch_dir, progress=progress, cancel=cancel,
+        linear_space=strategy == "linear")
+    result.plan = plan
+    if reduce is not None:
+        result = _expand_result(result, factor, full_len_x, full_len_y)
+    if cache is not None:
+        with profile.stage("cache"):
+            cache.put(key, result)
+    result.set_depth(x_depth, y_depth)
+    return result
+
+
+def dtw_categorical(x, y, cost_table=None, categories=None, window_type="none",
+    window_size=None, step_pattern="symmetric2", dist_only=False, open_begin=False,
+    open_end=False, x_depth=None, y_depth=None, profile=False, nan_policy="propagate",
+    gap_cost=None, traceback=False, prior=None):
+    """
+    Perform dynamic time warping (dtw) of categorical logs.
+
+    Details
+    ----------
+    Facies or lithology codes are integer-encoded once; the local cost of every
+    window cell is gathered from a K x K substitution cost table inside the
+    compiled kernel, so neither a float distance matrix nor per-cell Python
+    calls are needed.
+
+    Parameters
+    ----------
+    x : 1D array or Series
+        Query log codes, e.g. an object column of a DataFrame.
 
-    return dtw_from_distance_matrix(X, window_type, window_size, step_pattern,
-        dist_only, open_begin, open_end)
+    y : 1D array or Series
+        Reference log codes.
+
+    cost_table : 2D array, DataFrame or dict, optional
+        Substitution cost between categories; see
+        :meth:`categorical.CategoricalCost.from_logs`. Defaults to 0 for equal
+        categories and 1 otherwise.
+
+    categories : list, optional
+        Order of the cost table rows and columns.
+
+    nan_policy : string
+        How missing (None, NaN) codes are handled: "gap" costs ``gap_cost`` and
+        "skip" costs nothing; "propagate" and "raise" raise if any code is missing.
+
+    others :
+        see :func:`dtw` function.
+
+    Returns
+    -------
+    result.DtwResult
+        Result obj.
+
+    """
+    profile = _get_profile(profile)
+    with profile.stage("distance"):
+        X = CategoricalCost.from_logs(x, y, cost_table, categories)
+    if nan_policy == "propagate":
+        if X.missing:
+            raise ValueError("categorical logs with missing codes require nan_policy 'gap' or 'skip'")
+        x_valid, y_valid, gap_cost = None, None, 0.0
+    else:
+        # missing codes stand in for NaN samples
+        x_valid, y_valid, gap_cost = _get_validity(
+            np.where(X.codes_x < 0, np.nan, 0.0)[:, np.newaxis],
+            np.where(X.codes_y < 0, np.nan, 0.0)[:, np.newaxis], nan_policy, gap_cost)
+    profile.count("num_categories", len(X.categories))
+    if prior is not None:
+        prior = _get_prior_path(prior, x_depth, y_depth)
+    result = dtw_from_distance_matrix(X, window_type, window_size, step_pattern,
+        dist_only, open_begin, open_end, profile, x_valid, y_valid, gap_cost, traceback,
+        prior)
+    result.set_depth(x_depth, y_depth)
+    return result
 
 
 def dtw_from_distance_matrix(X, window_type="none", window_size=None,
-    step_pattern="symmetric2", dist_only=False, open_begin=False, open_end=False):
+    step_pattern="symmetric2", dist_only=False, open_begin=False, open_end=False,
+    profile=False, x_valid=None, y_valid=None, gap_cost=0.0, traceback=False,
+    prior=None, scratch_dir=None, progress=None, cancel=None, linear_space=False):
     """
     Perform dtw based correlation using pre-computed pair-wise distance matrix.
 
     Parameters
     ----------
-    X : 2D array
-        Pre-computed pair-wise distance matrix.
+    X : 2D array, banded.BandedMatrix, categorical.CategoricalCost, features.FeatureCost or scipy.sparse matrix
+        Pre-computed pair-wise distance matrix. Banded and sparse matrices are
+        only defined on their stored cells; all other cells are treated as
+        unreachable, and the stored values are used without densification.
+        A CategoricalCost is looked up in its substitution table per cell; a
+        FeatureCost is computed from the samples per cell.
+
+    x_valid, y_valid : 1D bool array, optional
+        Validity mask of query and reference samples. Cells involving an
+        invalid sample cost ``gap_cost`` instead of their value in X.
+
+    prior : result.DtwResult or 2D array, optional
+        Previous alignment path, for ``window_type="corridor"`` only.
+
+    scratch_dir : str or path-like, optional
+        Directory of the memory-mapped traceback file; see :func:`dtw_low`.
+
+    linear_space : bool
+        Whether or not to recompute the traceback block by block instead of
+        storing it; see :func:`dtw_low`.
+
+    progress, cancel : optional
+        Progress callback and cancel token; see :func:`dtw`.
 
     others : 
         see :func:`dtw` function.
@@ -101,20 +421,33 @@ def dtw_from_distance_matrix(X, window_type="none", window_size=None,
         Result obj.
 
     """
+    profile = _get_profile(profile)
+    if issparse(X):
+        X = BandedMatrix.from_csr(X)
     len_x, len_y = X.shape
-    window = _get_window(window_type, window_size, len_x, len_y)
+    with profile.stage("window"):
+        if prior is not None:
+            _check_prior(window_type)
+            prior = _get_prior_path(prior)
+        window = _get_window(window_type, window_size, len_x, len_y, prior)
+    if isinstance(window, CorridorWindow):
+        traceback = True
     pattern = _get_pattern(step_pattern)
-    return dtw_low(X, window, pattern, dist_only, open_begin, open_end)
+    return dtw_low(X, window, pattern, dist_only, open_begin, open_end, profile,
+        x_valid, y_valid, gap_cost, traceback, scratch_dir, progress, cancel,
+        linear_space=linear_space)
 
 
 def dtw_low(X, window, pattern, dist_only=False,
-    open_begin=False, open_end=False):
+    open_begin=False, open_end=False, profile=False,
+    x_valid=None, y_valid=None, gap_cost=0.0, traceback=False, scratch_dir=None,
+    progress=None, cancel=None, check_cost=True, linear_space=False):
     """
     Low-level dtw interface.
 
     Parameters
     ----------
-    X : 2D array
+    X : 2D array, banded.BandedMatrix, categorical.CategoricalCost or features.FeatureCost
         Pair-wise distance matrix.
 
     window : window.BaseWindow object
@@ -123,6 +456,41 @@ def dtw_low(X, window, pattern, dist_only=False,
     pattern : step_pattern.BasePattern object
         step pattern object.
 
+    profile : bool or profile.DtwProfile
+        Whether or not to record per-stage timings and counters. A ``DtwProfile``
+        given here is filled in and attached to the result.
+
+    x_valid, y_valid : 1D bool array, optional
+        Validity mask of query and reference samples.
+
+    gap_cost : float
+        Local cost of cells involving an invalid sample.
+
+    traceback : bool
+        Whether or not to record pattern directions instead of the full cumsum matrix.
+
+    scratch_dir : str or path-like, optional
+        In traceback mode, keep the pattern directions in a memory-mapped
+        temporary file in this directory instead of in memory; only the pages
+        being written or walked stay resident. The file is removed afterwards.
+
+    progress : callable, optional
+        Called as progress(rows_done, total_rows, eta) between kernel chunks.
+
+    cancel : progress.CancelToken or threading.Event, optional
+        Checked between kernel chunks; raises progress.DtwCancelled once set.
+
+    check_cost : bool
+        Whether or not to check X for negative costs; callers aligning many
+        times on one X check it once with ``_check_cost``.
+
+    linear_space : bool
+        Whether or not to run in traceback mode without storing the traceback of
+        the whole window: rolling rows are saved at block starts and the
+        traceback of one block at a time is recomputed from them while the path
+        is walked (see ``backtrack._backtrack_checkpointed``). Memory no longer
+        grows with the window cells; a few extra passes over the window are run.
+
     others : 
         see :func:`dtw` function.
 
@@ -132,9 +500,14 @@ def dtw_low(X, window, pattern, dist_only=False,
         Result obj.
 
     """
+    profile = _get_profile(profile)
+    banded = isinstance(X, BandedMatrix)
+    categorical = isinstance(X, CategoricalCost)
+    features = isinstance(X, FeatureCost)
     # validation
-    if X[X < 0].sum() != 0:
-        raise ValueError("pair-wise cost matrix must NOT contain negative values")
+    if check_cost:
+        with profile.stage("validation"):
+            _check_cost(X)
     if not isinstance(window, BaseWindow):
         raise ValueError("window argument must be Window object")
     if not isinstance(pattern, BasePattern):
@@ -145,58 +518,315 @@ def dtw_low(X, window, pattern, dist_only=False,
     if open_end:
         if not pattern.is_normalizable:
             raise ValueError("open-end alignment requires normalizable step pattern")
-
+    len_x, len_y = X.shape
+    if banded:
+        if window.ranges is None:
+            raise ValueError("banded cost matrix requires a window given as row ranges")
+        if X.data.size == 0:
+            raise ValueError("banded cost matrix stores no cells")
+        # visit only the window cells where costs are stored
+        w_ranges = _intersect_ranges(window.ranges, X.ranges)
+    else:
+        w_ranges = window.ranges
+    if categorical and w_ranges is None:
+        raise ValueError("categorical cost requires a window given as row ranges")
+    if features and w_ranges is None:
+        raise ValueError("feature cost requires a window given as row ranges")
+    masked = x_valid is not None or y_valid is not None
+    if categorical and X.missing and not masked:
+        raise ValueError("categorical logs with missing samples require validity masks")
+    if not masked:
+        # unused by the unmasked kernels
+        x_valid = y_valid = np.ones(0, dtype=np.bool_)
+    else:
+        x_valid = np.ones(len_x, dtype=np.bool_) if x_valid is None else np.asarray(x_valid, dtype=np.bool_)
+        y_valid = np.ones(len_y, dtype=np.bool_) if y_valid is None else np.asarray(y_valid, dtype=np.bool_)
+        if x_valid.shape != (len_x,) or y_valid.shape != (len_y,):
+            raise ValueError("validity masks must have one entry per sample")
+        if w_ranges is None:
+            # cell-list kernel reads X directly; apply the gap cost on a copy
+            X = X.copy()
+            X[~x_valid, :] = gap_cost
+            X[:, ~y_valid] = gap_cost
+
+    traceback = traceback or linear_space
+    if traceback and w_ranges is None:
+        raise ValueError("traceback mode requires a window given as row ranges")
+    use_ranges = w_ranges is not None
+    if use_ranges:
+        w_offsets = np.zeros(len_x + 1, dtype=np.int64)
+        np.cumsum(w_ranges[:, 1] - w_ranges[:, 0], out=w_offsets[1:])
+        # traceback mode keeps only the rolling rows the pattern reaches back
+        num_rows = _num_rolling_rows(pattern.array) if traceback else len_x + int(open_begin)
+        num_rows = min(num_rows, len_x + int(open_begin))
+        store_tb = traceback and not dist_only and not linear_space
+        if linear_space and not dist_only:
+            # traceback of one block at a time, no larger than the rolling rows
+            base_cells = 8 * num_rows * len_y
+            num_checkpoints = _checkpoint_levels(int(w_offsets[-1]), base_cells) \
+                * (_NUM_SPLITS - 1)
+
+    if profile.enabled:
+        profile.count("len_x", len_x)
+        profile.count("len_y", len_y)
+        profile.count("matrix_cells", len_x * len_y)
+        profile.count("window_cells", window.num_cells)
+        profile.allocate("cost_matrix", X.nbytes)
+        if use_ranges:
+            profile.allocate("window", w_ranges.nbytes + w_offsets.nbytes)
+            profile.allocate("cumsum_matrix", num_rows * len_y * 8)
+            if store_tb and scratch_dir is None:
+                profile.allocate("traceback", w_offsets[-1])
+            elif store_tb:
+                profile.count("scratch_bytes", int(w_offsets[-1]))
+            elif linear_space and not dist_only:
+                profile.allocate("traceback", min(base_cells, w_offsets[-1]))
+                profile.allocate("checkpoints", num_checkpoints * num_rows * len_y * 8)
+        else:
+            profile.allocate("window", window.matrix.nbytes + window.list.nbytes)
+            if open_begin:
+                profile.allocate("cost_matrix_copy", (len_x + 1) * len_y * 8)
+            profile.allocate("cumsum_matrix", (len_x + int(open_begin)) * len_y * 8)
+
+    # local cost storage, read by the kernel and the backtracking
+    if banded:
+        storage, cost = "banded", (X.data, X.offsets, X.ranges)
+    elif categorical:
+        storage, cost = "table", (X.codes_x, X.codes_y, X.table)
+    elif features:
+        storage, cost = "features", (X.x, X.y, X.w, X.code)
+    else:
+        storage, cost = "dense", X
     # compute cumsum distance matrix
-    D = _calc_cumsum_matrix_jit(X, window.list, pattern.array, open_begin)
+    tb_file = None
+    if use_ranges:
+        # window described row by row; no cell list needed
+        kernel = _get_cumsum_rows_kernel(storage, masked)
+        with profile.stage("cumsum", kernel):
+            # cumsum matrix (or its rolling rows)
+            D = np.full((num_rows, len_y), np.inf)
+            if open_begin:
+                D[0, :] = 0
+            if not store_tb:
+                tb = np.zeros(0, dtype=np.uint8)
+            elif scratch_dir is None:
+                tb = np.full(w_offsets[-1], _TB_NONE, dtype=np.uint8)
+            else:
+                # removed from the file system on close
+                tb_file = tempfile.TemporaryFile(dir=scratch_dir)
+                tb_map = np.memmap(tb_file, dtype=np.uint8, mode="w+", shape=(int(w_offsets[-1]),))
+                tb_map[:] = _TB_NONE
+                tb = tb_map.view(np.ndarray)
+            if progress is None and cancel is None:
+                kernel(cost, w_ranges, w_offsets, pattern.array, open_begin, x_valid, y_valid,
+                    float(gap_cost), D, tb, 0, len_x)
+            else:
+                try:
+                    _run_in_chunks(lambda start, stop: kernel(cost, w_ranges, w_offsets,
+                        pattern.array, open_begin, x_valid, y_valid, float(gap_cost), D, tb,
+                        start, stop), w_offsets, progress, cancel)
+                except BaseException:
+                    if tb_file is not None:
+                        tb_file.close()
+                    raise
+    else:
+        _check_cancel(cancel)
+        with profile.stage("cumsum", _calc_cumsum_matrix_jit):
+            D = _calc_cumsum_matrix_jit(X, window.list, pattern.array, open_begin)
+        # gap costs are already applied to X
+        masked = False
+        _check_cancel(cancel)
+        if progress is not None:
+            progress(len_x, len_x, 0.0)
     # get alignment distance
-    dist, normalized_dist, last_idx = _get_alignment_distance(D, pattern,
-        open_begin, open_end)
+    with profile.stage("alignment_distance"):
+        last_row = D[(len_x - 1 + int(open_begin)) % D.shape[0], :]
+        dist, normalized_dist, last_idx = _get_row_alignment_distance(last_row,
+            len_x, pattern, open_end)
+    if traceback:
+        # only rolling rows were kept
+        D = None
 
     if dist_only:
         path = None
-        if open_begin:
+        if open_begin and D is not None:
             D = D[1:, :]
     else:
         # backtrack to obtain warping path
-        path = _backtrack_jit(D, pattern.array, last_idx)
+        if traceback:
+            if last_idx == -1:
+                last_idx = len_y - 1
+            if linear_space:
+                def fill(D, tb, tb_offsets, row_start, row_stop):
+                    _check_cancel(cancel)
+                    kernel(cost, w_ranges, tb_offsets, pattern.array, open_begin, x_valid,
+                        y_valid, float(gap_cost), D, tb, row_start, row_stop)
+
+                # rolling rows before the first window row
+                D_start = np.full((num_rows, len_y), np.inf)
+                if open_begin:
+                    D_start[0, :] = 0
+                with profile.stage("backtrack"):
+                    path = _backtrack_checkpointed(fill, D_start, w_ranges, w_offsets,
+                        pattern.array, last_idx, int(open_begin), base_cells)
+            else:
+                with profile.stage("backtrack", _backtrack_traceback_jit):
+                    path = _backtrack_traceback_jit(tb, w_ranges, w_offsets, pattern.array,
+                        last_idx, int(open_begin))
+        else:
+            backtrack = _get_backtrack(storage, masked)
+            with profile.stage("backtrack", backtrack):
+                path = backtrack(D, cost, pattern.array, last_idx, int(open_begin),
+                    x_valid, y_valid, float(gap_cost))
+        if tb_file is not None:
+            tb = tb_map = None
+            tb_file.close()
         if open_begin:
-            D = D[1:, :]
+            if D is not None:
+                D = D[1:, :]
             path = path[1:, :]
             path[:, 0] -= 1
+        profile.count("path_length", path.shape[0])
+        profile.allocate("path", path.nbytes)
 
     result = DtwResult(D, path, window, pattern)
     # set distance properties
     result.distance = dist
     result.normalized_distance = normalized_dist
+    result.profile = profile if profile.enabled else None
 
     return result
 
 
-def _get_window(window_type, window_size, len_x, len_y):
+def _check_cost(X):
+    """Raise if a pair-wise cost matrix holds negative costs; only stored values are checked."""
+    if isinstance(X, BandedMatrix):
+        has_negative = (X.data < 0).any()
+    elif isinstance(X, CategoricalCost):
+        has_negative = (X.table < 0).any()
+    elif isinstance(X, FeatureCost):
+        # distances of non-negative weights
+        has_negative = False
+    else:
+        has_negative = (X < 0).any()
+    if has_negative:
+        raise ValueError("pair-wise cost matrix must NOT contain negative values")
+
+
+def _get_validity(x, y, nan_policy, gap_cost):
+    """
+    Get validity masks
+
+    Parameters
+    ----------
+    x, y : 2D array
+        Query and reference features.
+    nan_policy : str
+        any of {"propagate", "raise", "gap", "skip"}.
+    gap_cost : float or None
+        Local cost of cells involving a missing sample.
+
+    Returns
+    -------
+    Validity masks of x and y (None if NaNs propagate) and the gap cost.
+    """
+    if nan_policy == "propagate":
+        return None, None, 0.0
+    elif nan_policy == "raise":
+        if np.isnan(x).any() or np.isnan(y).any():
+            raise ValueError("logs contain missing (NaN) samples; see nan_policy")
+        return None, None, 0.0
+    elif nan_policy == "skip":
+        gap_cost = 0.0
+    elif nan_policy == "gap":
+        if gap_cost is None:
+            raise ValueError("nan_policy 'gap' requires gap_cost")
+        if gap_cost < 0:
+            raise ValueError("gap_cost must NOT be negative")
+    else:
+        raise NotImplementedError("given nan policy not supported")
+    x_valid = ~np.isnan(x).any(axis=1)
+    y_valid = ~np.isnan(y).any(axis=1)
+    return x_valid, y_valid, float(gap_cost)
+
+
+def _check_prior(window_type):
+    """Raise if a prior alignment is given with a window that does not use it."""
+    if isinstance(window_type, BaseWindow) or window_type != "corridor":
+        raise ValueError("prior alignment requires window_type 'corridor'")
+
+
+def _get_prior_path(prior, x_depth=None, y_depth=None):
+    """
+    Get prior alignment path in sample index units
+
+    Parameters
+    ----------
+    prior : DtwResult or 2D array
+        Previous alignment, or its path.
+    x_depth, y_depth : 1D array, optional
+        Increasing depth of the current query and reference samples.
+
+    Returns
+    -------
+    2D float array of (query index, reference index) pairs.
+    """
+    if not isinstance(prior, DtwResult):
+        return np.asarray(prior, dtype=np.float64)
+    if prior.dist_only:
+        raise ValueError("prior alignment has no path; it was computed with dist_only")
+    if x_depth is None or y_depth is None \
+        or prior.query_depth is None or prior.reference_depth is None:
+        return prior.path.astype(np.float64)
+    depth_path = prior.get_depth_path()
+    x_depth = np.asarray(x_depth, dtype=np.float64)
+    y_depth = np.asarray(y_depth, dtype=np.float64)
+    # drop path nodes outside the current depth ranges
+    inside = (depth_path[:, 0] >= x_depth[0]) & (depth_path[:, 0] <= x_depth[-1]) \
+        & (depth_path[:, 1] >= y_depth[0]) & (depth_path[:, 1] <= y_depth[-1])
+    depth_path = depth_path[inside]
+    return np.column_stack((np.interp(depth_path[:, 0], x_depth, np.arange(x_depth.size)),
+        np.interp(depth_path[:, 1], y_depth, np.arange(y_depth.size))))
+
+
+def _get_window(window_type, window_size, len_x, len_y, prior=None):
     """
     Get Window
 
     Parameters
     ----------
-    window_type: str
-        type of window constraint; any of {"sakoechiba", "itakura", "none"}.
+    window_type: str or BaseWindow
+        type of window constraint; any of {"sakoechiba", "itakura", "none"},
+        or a window object, returned as is.
     window_size : int
         Size of window width.
     len_x : int
         Length of query log.
     len_y : int
         Length of reference log.
+    prior : 2D array, optional
+        Prior path (query index, reference index) of a corridor window.
 
     Returns
     -------
     Corresponding Window object.
     """
-    if window_type == "sakoechiba":
+    if isinstance(window_type, BaseWindow):
+        if (window_type.len_x, window_type.len_y) != (len_x, len_y):
+            raise ValueError("window shape does not match the cost matrix")
+        return window_type
+    elif window_type == "sakoechiba":
         return SakoechibaWindow(len_x, len_y, window_size)
     elif window_type == "itakura":
         return ItakuraWindow(len_x, len_y)
     elif window_type == "none":
         return NoWindow(len_x, len_y)
+    elif window_type == "corridor":
+        if prior is None:
+            raise ValueError("corridor window requires a prior alignment")
+        return CorridorWindow(len_x, len_y, prior, window_size)
+    elif window_type == "shifted":
+        raise ValueError("shifted window needs the logs; pass a ShiftedBandWindow instead")
     else:
         raise NotImplementedError("given window type not supported")
 
@@ -1,9 +1,23 @@
 from .DTW import *
 from .window import UserWindow, ItakuraWindow,SakoechibaWindow
-from .window import NoWindow,BaseWindow
+from .window import NoWindow,BaseWindow,ShiftedBandWindow,CorridorWindow,RangesWindow
+from .shift import estimate_shift
 from .step_pattern import *
 from .result import DtwResult
+from .path import RLEPath
+from .propagate import WarpMapping, propagate_picks
+from .index import ReferenceIndex
+from .embedding import EmbeddingIndex
+from .banded import BandedMatrix
+from .categorical import CategoricalCost
+from .features import FeatureCost
+from .profile import DtwProfile
+from .plan import DtwPlan
+from .progress import CancelToken, DtwCancelled
+from .sweep import dtw_sweep
+from .matrix_profile import MatrixProfile, matrix_profile
+from .ensemble import DtwEnsemble, dtw_ensemble
+from .batch import SharedWellStore, dtw_batch
+from .cache import DtwCache
 from .dtwPlot import AlignmentPlot, ThreeWayPlot
-from .distance import _get_alignment_distance
-from .cost import _calc_cumsum_matrix_jit
-from .backtrack import _backtrack_jit, _get_local_path
\ No newline at end of file
+from .distance import NoPathError, _get_alignment_distance
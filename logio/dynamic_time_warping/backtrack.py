@@ -4,80 +4,257 @@
 import numpy as np
 from numba import jit
 
+from .cost import _dense_cost, _banded_cost, _table_cost, _feature_cost, _make_masked_cost
+from .cost import _TB_NONE
 
-@jit(nopython=True)
-def _backtrack_jit(D, p_ar, last_idx=-1):
-    """Fast implementation by numba.jit.
 
-    D : 2D array
-        cumsum cost matrix
+def _make_backtrack(local_cost, masked=False):
+    """Build the backtracking function for a given local cost lookup.
+
+    The pattern taken into every cell is decided the way the cumsum kernel
+    (see cost.py) decides it: the pattern costs are recomputed from D and the
+    local costs with the same arithmetic and the first minimum wins, which is
+    the pattern the kernel records in traceback mode. Both modes therefore
+    return the same path, and the path cost equals the alignment distance.
+    """
+    cost = _make_masked_cost(local_cost, masked)
+
+    @jit(nopython=True, nogil=True)
+    def backtrack(D, X, p_ar, last_idx, shift, x_valid, y_valid, gap_cost):
+        """
+        D : 2D array
+            full cumsum cost matrix, open-begin row included
+        X :
+            local cost storage read by local_cost
+        p_ar : 3D array
+            step pattern array (see step_pattern.py)
+        last_idx : int
+            reference index of the end point; -1 for the last one
+        shift : int
+            1 if D has an open-begin row, else 0
+        """
+        num_pattern = p_ar.shape[0]
+        max_pattern_len = p_ar.shape[1]
+        pattern_cost = np.zeros(num_pattern, dtype=np.float64)
+        step_cost = np.zeros(max_pattern_len, dtype=np.float64)
+        i = D.shape[0] - 1
+        j = D.shape[1] - 1 if last_idx == -1 else last_idx
+        # alignment path, filled from the end
+        path = np.empty((i + j + 1, 2), dtype=np.int64)
+        pos = path.shape[0] - 1
+        path[pos, 0] = i
+        path[pos, 1] = j
+
+        while True:
+            if i == 0 and j == 0:
+                break
+            if i - shift < 0:
+                # reached the open-begin row
+                break
+            for pidx in range(num_pattern):
+                for sidx in range(1, max_pattern_len):
+                    ii = int(i + p_ar[pidx, sidx, 0])
+                    jj = int(j + p_ar[pidx, sidx, 1])
+                    if ii < 0 or jj < 0:
+                        step_cost[sidx] = np.inf
+                        continue
+                    elif ii < shift:
+                        step_cost[sidx] = 0.0 * p_ar[pidx, sidx, 2]
+                    else:
+                        step_cost[sidx] = cost(X, ii - shift, jj,
+                            x_valid, y_valid, gap_cost) * p_ar[pidx, sidx, 2]
+                ii = int(i + p_ar[pidx, 0, 0])
+                jj = int(j + p_ar[pidx, 0, 1])
+                if ii < 0 or jj < 0:
+                    pattern_cost[pidx] = np.inf
+                    continue
+                pattern_cost[pidx] = D[ii, jj] + step_cost.sum()
+
+            pidx = np.argmin(pattern_cost)
+            if pattern_cost[pidx] == np.inf:
+                # no direction can be taken
+                break
+            pos = _add_pattern_nodes(path, pos, p_ar, pidx, i, j)
+            i += int(p_ar[pidx, 0, 0])
+            j += int(p_ar[pidx, 0, 1])
+
+        return path[pos:].copy()
+
+    return backtrack
+
+
+@jit(nopython=True, nogil=True)
+def _add_pattern_nodes(path, pos, p_ar, pidx, i, j):
+    """Add the nodes pattern pidx passes on its way into (i, j), latest first.
+
+    The last weighted node is (i, j) itself, already added; returns the new
+    first filled position of path.
+    """
+    last = p_ar.shape[1] - 1
+    while p_ar[pidx, last, 2] == 0:
+        last -= 1
+    for sidx in range(last - 1, -1, -1):
+        if p_ar[pidx, sidx, 2] == 0:
+            continue
+        pos -= 1
+        path[pos, 0] = i + int(p_ar[pidx, sidx, 0])
+        path[pos, 1] = j + int(p_ar[pidx, sidx, 1])
+    return pos
+
+
+_BACKTRACKS = {}
+for _storage, _local_cost in (("dense", _dense_cost), ("banded", _banded_cost),
+    ("table", _table_cost), ("features", _feature_cost)):
+    for _masked in (False, True):
+        _BACKTRACKS[(_storage, _masked)] = _make_backtrack(_local_cost, _masked)
+
+
+def _get_backtrack(storage, masked):
+    """Backtracking function for the given cost storage and masking, see ``_get_cumsum_kernel``."""
+    return _BACKTRACKS[(storage, masked)]
+
+
+@jit(nopython=True, nogil=True)
+def _backtrack_traceback_jit(tb, w_ranges, w_offsets, p_ar, last_idx, shift):
+    """Fast implementation by numba.jit walking a traceback array.
+
+    tb : 1D uint8 array
+        winning pattern index of every window cell (see cost.py)
+    w_ranges, w_offsets : 2D/1D arrays
+        per-row window bounds and position of each row's first cell in tb
     p_ar : 3D array
         step pattern array (see step_pattern.py)
+    last_idx : int
+        reference index of the end point
+    shift : int
+        1 if the cumsum rows were offset for open-begin alignment, else 0
     """
-    # number of patterns
-    num_pattern = p_ar.shape[0]
+    len_x = w_ranges.shape[0]
     # initialize index
-    i, j = D.shape
-    i -= 1
-    if last_idx == -1:
-        j -= 1
-    else:
-        j = last_idx
-    # alignment path
-    path = np.array(((i, j),), dtype=np.int64)
-    # cache to memorize D
-    D_cache = np.ones(num_pattern, dtype=np.float64) * np.inf
+    i = len_x - 1 + shift
+    j = last_idx
+    # alignment path, filled from the end
+    path = np.empty((len_x + shift + j + 1, 2), dtype=np.int64)
+    pos = path.shape[0] - 1
+    path[pos, 0] = i
+    path[pos, 1] = j
+    i, j, pos, _ = _walk_traceback(tb, w_ranges, w_offsets, p_ar, i, j, shift, 0, path, pos)
+    return path[pos:].copy()
+
+
+@jit(nopython=True, nogil=True)
+def _walk_traceback(tb, w_ranges, w_offsets, p_ar, i, j, shift, row_start, path, pos):
+    """Walk a traceback array from node (i, j), held in path[pos], up to window row row_start.
 
+    tb holds the window rows from row_start on, each at its w_offsets position.
+    Returns the node reached, the new first filled position of path and
+    whether the path is complete; if not, it goes on above row_start.
+    """
     while True:
         if i == 0 and j == 0:
-            break
-        for pidx in range(num_pattern):
-            # get D value corresponds to end of pattern node
-            pattern_index = p_ar[pidx, 0, 0:2]
-            ii = int(i + pattern_index[0])
-            jj = int(j + pattern_index[1])
-            if ii < 0 or jj < 0:
-                D_cache[pidx] = np.inf
-            else:
-                D_cache[pidx] = D[ii, jj]
-
-        if (D_cache == np.inf).all():
-            # break if there is no direction can be taken
-            break
-
-        # find path minimize D_chache
-        min_pattern_idx = np.argmin(D_cache)
-        # get where pattern passed
-        path_to_add = _get_local_path(D, p_ar[min_pattern_idx, :, :], i, j)
-        # concatenate
-        path = np.vstack((path, path_to_add))
-
-        i += p_ar[min_pattern_idx, 0, 0]
-        j += p_ar[min_pattern_idx, 0, 1]
-
-    return path[::-1]
-
-
-@jit(nopython=True)
-def _get_local_path(D, p_ar, i, j):
+            return i, j, pos, True
+        row = i - shift
+        if row < 0:
+            # reached the open-begin row
+            return i, j, pos, True
+        if row < row_start:
+            return i, j, pos, False
+        pidx = tb[w_offsets[row] + j - w_ranges[row, 0]]
+        if pidx >= 254:
+            # origin reached or no direction can be taken
+            return i, j, pos, True
+        # add where the pattern passed
+        pos = _add_pattern_nodes(path, pos, p_ar, pidx, i, j)
+
+        i += int(p_ar[pidx, 0, 0])
+        j += int(p_ar[pidx, 0, 1])
+
+
+# blocks a checkpointed row block is split into
+_NUM_SPLITS = 8
+
+
+def _backtrack_checkpointed(fill, D, w_ranges, w_offsets, p_ar, last_idx, shift, base_cells,
+    num_splits=_NUM_SPLITS):
     """
-    Helper function to get local path.
-    D : cumsum matrix
-    p_ar : array of pattern that minimize D at i,j
+    Walk the warping path without storing the traceback of the whole window.
+
+    The window rows are split into num_splits blocks of about equal cells, and
+    one forward pass saves the rolling cumsum rows at every block start. The
+    blocks are then recovered from the last to the first, split again the same
+    way until a block holds at most base_cells cells, whose traceback is
+    recomputed from its saved rows and walked. The path equals that of
+    ``_backtrack_traceback_jit``, while at most base_cells traceback bytes and
+    about levels * (num_splits - 1) copies of D are held, for levels + 1
+    passes over the window; see ``_checkpoint_levels``.
+
+    Parameters
+    ----------
+    fill : callable
+        fill(D, tb, tb_offsets, row_start, row_stop) computes window rows
+        [row_start, row_stop) into the rolling rows D and writes the traceback
+        of row r at tb_offsets[r] of tb (an empty tb keeps none); the row-chunk
+        kernel of cost.py.
+    D : 2D array
+        Rolling cumsum rows before the first window row; not modified.
+    w_ranges, w_offsets, p_ar, last_idx, shift :
+        see ``_backtrack_traceback_jit``.
+    base_cells : int
+        Largest block whose traceback is recomputed at once.
+    num_splits : int
+        Blocks per split.
+
+    Returns
+    -------
+    path : 2D array
     """
-    weight_col = p_ar[:, 2]
-    step_selector = np.where(weight_col != 0)[0]
-    # note: starting point of pattern was already added
-    step_selector = step_selector[:-1]
-    # initialize local path
-    local_path = np.ones((step_selector.size, 2),
-        dtype=np.int64) * -1
-    for sidx in step_selector:
-        # memorize where passed
-        pattern_index = p_ar[sidx, 0:2]
-
-        ii = int(i + pattern_index[0])
-        jj = int(j + pattern_index[1])
-
-        local_path[sidx, :] = (ii, jj)
-    return local_path[::-1]
+    len_x = w_ranges.shape[0]
+    i = len_x - 1 + shift
+    j = last_idx
+    path = np.empty((len_x + shift + j + 1, 2), dtype=np.int64)
+    pos = path.shape[0] - 1
+    path[pos, 0] = i
+    path[pos, 1] = j
+    no_tb = np.zeros(0, dtype=np.uint8)
+
+    def recover(row_start, D, i, j, pos):
+        # rows after the current node are never walked
+        row_stop = i - shift + 1
+        cells = int(w_offsets[row_stop] - w_offsets[row_start])
+        if cells <= base_cells or row_stop - row_start == 1:
+            tb = np.full(cells, _TB_NONE, dtype=np.uint8)
+            tb_offsets = w_offsets - w_offsets[row_start]
+            fill(D.copy(), tb, tb_offsets, row_start, row_stop)
+            return _walk_traceback(tb, w_ranges, tb_offsets, p_ar, i, j, shift, row_start,
+                path, pos)
+        # block starts, about equal in cells
+        targets = w_offsets[row_start] + cells * np.arange(1, num_splits) // num_splits
+        starts = np.searchsorted(w_offsets, targets, side="right") - 1
+        starts = np.unique(np.concatenate(([row_start],
+            np.clip(starts, row_start + 1, row_stop - 1))))
+        states = [D]
+        rows = D.copy()
+        for start, stop in zip(starts[:-1], starts[1:]):
+            fill(rows, no_tb, w_offsets, start, stop)
+            states.append(rows.copy())
+        del rows
+        done = False
+        for k in range(len(starts) - 1, -1, -1):
+            if starts[k] <= i - shift:
+                i, j, pos, done = recover(starts[k], states[k], i, j, pos)
+                if done:
+                    break
+            states[k] = None
+        return i, j, pos, done
+
+    i, j, pos, _ = recover(0, D, i, j, pos)
+    return path[pos:].copy()
+
+
+def _checkpoint_levels(cells, base_cells, num_splits=_NUM_SPLITS):
+    """Number of times ``_backtrack_checkpointed`` splits a window of the given cells."""
+    levels = 0
+    while cells > base_cells:
+        cells = -(-cells // num_splits)
+        levels += 1
+    return levels
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""Pair-wise cost matrix stored only inside a band."""
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+
+class BandedMatrix():
+    """
+    Pair-wise cost matrix defined only inside a band.
+
+    Row ``i`` stores the costs of reference indices ``ranges[i, 0] <= j < ranges[i, 1]``,
+    concatenated row after row in ``data``. Cells outside the band are undefined
+    (infinite cost). ``dtw_from_distance_matrix`` accepts this object in place of a
+    dense matrix and runs on the stored values directly.
+
+    Attributes
+    ----------
+        data : 1d array
+            Stored costs, row after row.
+        ranges : 2d array
+            Per-row [start, stop) reference index bounds, shape (len_x, 2).
+        offsets : 1d array
+            Position in ``data`` of the first stored value of each row.
+        shape : tuple
+            (len_x, len_y) of the full matrix.
+
+    Methods
+    -------
+        from_csr(matrix):
+            Build from a scipy.sparse matrix or a (data, indices, indptr, shape) tuple.
+        from_band(band, lower, len_y):
+            Build from a (len_x, width) array of diagonal bands.
+        to_dense():
+            Dense matrix with inf outside the band.
+    """
+
+    def __init__(self, data, ranges, shape):
+        """
+        Constructs all the necessary attributes for the BandedMatrix object.
+
+        Parameters
+        ----------
+            data : 1d array
+                Stored costs, row after row.
+            ranges : 2d array
+                Per-row [start, stop) reference index bounds, shape (len_x, 2).
+            shape : tuple
+                (len_x, len_y) of the full matrix.
+        """
+        self.data = np.ascontiguousarray(data, dtype=np.float64).ravel()
+        self.ranges = np.ascontiguousarray(ranges, dtype=np.int64)
+        self.shape = (int(shape[0]), int(shape[1]))
+        counts = self.ranges[:, 1] - self.ranges[:, 0]
+        if self.ranges.shape != (self.shape[0], 2) or (counts < 0).any():
+            raise ValueError("ranges must hold one [start, stop) pair per row")
+        if (self.ranges[:, 0] < 0).any() or (self.ranges[:, 1] > self.shape[1]).any():
+            raise ValueError("ranges exceed the matrix shape")
+        self.offsets = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        if self.offsets[-1] != self.data.size:
+            raise ValueError("data size does not match ranges")
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.ranges.nbytes + self.offsets.nbytes
+
+    @classmethod
+    def from_csr(cls, matrix):
+        """
+        Build from CSR-style storage.
+
+        If the stored columns of every row are sorted and contiguous, the data
+        array is used as is. Otherwise each row is widened to its [min, max]
+        stored column and the holes are set to inf.
+
+        Parameters
+        ----------
+        matrix : scipy.sparse matrix or tuple
+            Sparse matrix, or (data, indices, indptr, shape) tuple.
+
+        Returns
+        -------
+        BandedMatrix
+        """
+        if isinstance(matrix, tuple):
+            data, indices, indptr, shape = matrix
+        else:
+            matrix = matrix.tocsr()
+            data, indices, indptr, shape = matrix.data, matrix.indices, matrix.indptr, matrix.shape
+        data = np.asarray(data, dtype=np.float64)
+        indices = np.asarray(indices, dtype=np.int64)
+        indptr = np.asarray(indptr, dtype=np.int64)
+        counts = np.diff(indptr)
+        row_of = np.repeat(np.arange(shape[0], dtype=np.int64), counts)
+        ranges = np.zeros((shape[0], 2), dtype=np.int64)
+        if data.size:
+            # per-row [min, max] stored column
+            ranges[:, 0] = shape[1]
+            np.minimum.at(ranges[:, 0], row_of, indices)
+            np.maximum.at(ranges[:, 1], row_of, indices + 1)
+            ranges[counts == 0] = 0
+        in_order = ((ranges[:, 1] - ranges[:, 0]) == counts).all() and \
+            (np.diff(indices)[row_of[1:] == row_of[:-1]] > 0).all()
+        if in_order:
+            # every row already contiguous and sorted
+            return cls(data, ranges, shape)
+        band = cls(np.full((ranges[:, 1] - ranges[:, 0]).sum(), np.inf), ranges, shape)
+        band.data[band.offsets[row_of] + indices - ranges[row_of, 0]] = data
+        return band
+
+    @classmethod
+    def from_band(cls, band, lower, len_y):
+        """
+        Build from diagonal bands.
+
+        Parameters
+        ----------
+        band : 2d array, shape (len_x, width)
+            Row ``i`` holds the costs of reference indices ``i - lower`` to
+            ``i - lower + width - 1``; entries falling outside the matrix are ignored.
+        lower : int
+            Number of stored cells left of the main diagonal.
+        len_y : int
+            Length of reference log.
+
+        Returns
+        -------
+        BandedMatrix
+        """
+        band = np.asarray(band, dtype=np.float64)
+        len_x, width = band.shape
+        start = np.arange(len_x, dtype=np.int64) - lower
+        ranges = np.column_stack((np.clip(start, 0, len_y), np.clip(start + width, 0, len_y)))
+        ranges[:, 1] = np.maximum(ranges[:, 1], ranges[:, 0])
+        if (start >= 0).all() and (start + width <= len_y).all():
+            return cls(band, ranges, (len_x, len_y))
+        cols = start[:, np.newaxis] + np.arange(width)
+        return cls(band[(cols >= 0) & (cols < len_y)], ranges, (len_x, len_y))
+
+    def to_dense(self):
+        """Dense matrix with inf outside the band."""
+        dense = np.full(self.shape, np.inf)
+        counts = self.ranges[:, 1] - self.ranges[:, 0]
+        rows = np.repeat(np.arange(self.shape[0]), counts)
+        cols = np.arange(self.data.size) - np.repeat(self.offsets[:-1] - self.ranges[:, 0], counts)
+        dense[rows, cols] = self.data
+        return dense
+
+
+def _banded_cdist(x, y, ranges, metric="euclidean", w=None, block_rows=256):
+    """
+    Pair-wise distances of x and y computed only inside per-row ranges.
+
+    Rows are processed in blocks: each block is passed to ``cdist`` against the
+    reference columns its ranges span, and the in-band values are gathered into
+    the banded storage. Work and memory scale with the band, not with len_x * len_y.
+
+    Parameters
+    ----------
+    x, y : 2D array (sample * feature)
+        Query and reference logs.
+    ranges : 2D array
+        Per-row [start, stop) reference index bounds.
+    metric : str
+        Metric argument of ``scipy.spatial.distance.cdist``.
+    w : 1D array, optional
+        Per-feature weights passed to ``cdist``.
+    block_rows : int
+        Number of query rows per ``cdist`` call.
+
+    Returns
+    -------
+    BandedMatrix
+    """
+    kwargs = {} if w is None else {"w": w}
+    len_x, len_y = x.shape[0], y.shape[0]
+    banded = BandedMatrix(np.empty(int((ranges[:, 1] - ranges[:, 0]).sum())), ranges, (len_x, len_y))
+    for r0 in range(0, len_x, block_rows):
+        r1 = min(r0 + block_rows, len_x)
+        lo = ranges[r0:r1, 0]
+        hi = ranges[r0:r1, 1]
+        counts = hi - lo
+        if counts.sum() == 0:
+            continue
+        c0 = lo[counts > 0].min()
+        c1 = hi[counts > 0].max()
+        block = cdist(x[r0:r1], y[c0:c1], metric=metric, **kwargs)
+        rows = np.repeat(np.arange(r1 - r0), counts)
+        starts = np.cumsum(counts) - counts
+        cols = np.arange(counts.sum()) - np.repeat(starts - lo + c0, counts)
+        banded.data[banded.offsets[r0]:banded.offsets[r1]] = block[rows, cols]
+    return banded
+
+
+def _pattern_ranges(ranges, p_ar, len_y):
+    """
+    Per-row bounds of the cost cells read when filling the window ``ranges``.
+
+    Multi-step patterns read intermediate cells that may lie outside the window;
+    they are added so a banded cost matrix gives the same result as a dense one.
+    """
+    len_x = ranges.shape[0]
+    filled = ranges[:, 1] > ranges[:, 0]
+    start = np.where(filled, ranges[:, 0], len_y)
+    stop = np.where(filled, ranges[:, 1], 0)
+    out_start, out_stop = start.copy(), stop.copy()
+    steps = np.unique(p_ar[:, 1:, 0:2].reshape(-1, 2).astype(np.int64), axis=0)
+    for di, dj in steps:
+        # cell (i, j) of the window reads cost cell (i + di, j + dj); di, dj <= 0
+        if -di >= len_x:
+            continue
+        rows = slice(0, len_x + di)
+        src = slice(-di, len_x)
+        out_start[rows] = np.minimum(out_start[rows], start[src] + dj)
+        out_stop[rows] = np.maximum(out_stop[rows], stop[src] + dj)
+    out_start = np.clip(out_start, 0, len_y)
+    out_stop = np.clip(out_stop, 0, len_y)
+    return np.column_stack((out_start, np.maximum(out_start, out_stop))).astype(np.int64)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Process-pool dtw over wells held once in shared memory."""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from pandas import DataFrame
+
+from .DTW import dtw
+
+
+class SharedWellStore():
+    """
+    Well logs copied once into shared memory blocks.
+
+    Worker processes attach to a block by name and get a NumPy view of it, so a
+    log is never pickled per task. Use as a context manager, or call ``close``
+    to release the blocks.
+
+    Attributes
+    ----------
+        names : list
+            Names of the stored wells.
+
+    Methods
+    -------
+        add(name, data):
+            Copy a well into shared memory.
+        descriptor(name):
+            Picklable handle workers attach to.
+        close():
+            Release all shared memory blocks.
+    """
+
+    def __init__(self, wells=None):
+        """
+        Constructs all the necessary attributes for the SharedWellStore object.
+
+        Parameters
+        ----------
+            wells : dict, optional
+                Well name to log (array or DataFrame), added right away.
+        """
+        self._blocks = {}
+        self._descriptors = {}
+        for name, data in (wells or {}).items():
+            self.add(name, data)
+
+    @property
+    def names(self):
+        return list(self._descriptors)
+
+    def __contains__(self, name):
+        return name in self._descriptors
+
+    def add(self, name, data):
+        """
+        Copy a well into shared memory.
+
+        Parameters
+        ----------
+        name : hashable
+            Well name.
+        data : 1D/2D array or DataFrame
+            Log samples. Numerical columns of a DataFrame are stored and
+            handed to workers as a DataFrame again.
+        """
+        if name in self._descriptors:
+            raise ValueError("well {0!r} already stored".format(name))
+        columns = None
+        if isinstance(data, DataFrame):
+            data = data.select_dtypes("number")
+            columns = list(data.columns)
+        values = np.ascontiguousarray(data, dtype=np.float64)
+        block = SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+        self._blocks[name] = block
+        self._descriptors[name] = (block.name, values.shape, values.dtype.str, columns)
+
+    def descriptor(self, name):
+        """Picklable (block name, shape, dtype, columns) handle of a well."""
+        return self._descriptors[name]
+
+    def close(self):
+        """Release all shared memory blocks."""
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+        self._descriptors = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def _attach(descriptor):
+    """Zero-copy view of a stored well; valid inside the ``with`` block only."""
+    block_name, shape, dtype, columns = descriptor
+    block = SharedMemory(name=block_name)
+    try:
+        values = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        values.flags.writeable = False
+        yield values if columns is None else DataFrame(values, columns=columns, copy=False)
+        del values
+    finally:
+        block.close()
+
+
+def _batch_task(query, reference, rle, options):
+    """Align two stored wells in a worker; only the slim result is sent back."""
+    with _attach(query) as x, _attach(reference) as y:
+        result = dtw(x, y, **options)
+        # drop references to the views before the blocks are closed
+        del x, y
+        return result.slim(rle)
+
+
+def dtw_batch(wells, pairs, n_jobs=None, mp_context=None, rle=False, **kwargs):
+    """
+    Align many pairs of wells in a process pool.
+
+    Details
+    ----------
+    Each well is copied once into shared memory; workers attach to it by name
+    and run :func:`dtw` on zero-copy views. Only slim results (distances, path
+    and window ranges; see :meth:`result.DtwResult.slim`) are sent back, never
+    the logs or a cumsum matrix.
+
+    Parameters
+    ----------
+    wells : dict or SharedWellStore
+        Well name to log (array or DataFrame), or an open store.
+
+    pairs : list of tuple
+        (query well name, reference well name) of every alignment.
+
+    n_jobs : int, optional
+        Number of worker processes. Defaults to the executor default.
+
+    mp_context : multiprocessing context, optional
+        Start method of the workers, passed to ``ProcessPoolExecutor``.
+
+    rle : bool
+        Whether or not to send paths back run-length encoded (see ``path.RLEPath``).
+
+    **kwargs :
+        Passed to :func:`dtw`; must be picklable (e.g. a module level
+        function as ``dist``).
+
+    Returns
+    -------
+    list of result.DtwResult
+        Slim result of every pair, in the order of ``pairs``.
+
+    """
+    pairs = list(pairs)
+    own_store = not isinstance(wells, SharedWellStore)
+    store = SharedWellStore(wells) if own_store else wells
+    try:
+        for query, reference in pairs:
+            if query not in store or reference not in store:
+                raise KeyError("well {0!r} not stored".format(query if query not in store else reference))
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp_context) as executor:
+            futures = [executor.submit(_batch_task, store.descriptor(query),
+                store.descriptor(reference), rle, kwargs) for query, reference in pairs]
+            return [future.result() for future in futures]
+    finally:
+        if own_store:
+            store.close()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed on-disk cache of dtw results."""
+
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from .path import RLEPath
+from .result import DtwResult
+from .window import BaseWindow, RangesWindow
+
+# bump when the stored layout or the meaning of a key changes
+_CACHE_VERSION = "2"
+
+
+class DtwCache():
+    """
+    Directory of slim dtw results keyed by a hash of the inputs.
+
+    Every entry is one ``.npz`` file holding the run-length encoded path,
+    distances and window row ranges of a result, named after the key. Files are
+    written to a temporary name and moved into place with ``os.replace``, so
+    readers in other processes never see a partial entry. A hit refreshes the file's modification time;
+    when the directory outgrows ``max_bytes`` the least recently used entries
+    are removed.
+
+    Attributes
+    ----------
+        directory : pathlib.Path
+            Cache directory; created if missing.
+        max_bytes : int
+            Size bound of all entries together.
+
+    Methods
+    -------
+        get(key, pattern):
+            Slim result stored under a key, or None.
+        put(key, result):
+            Store the slim copy of a result.
+        clear():
+            Remove all entries.
+    """
+
+    def __init__(self, directory, max_bytes=2**30):
+        """
+        Constructs all the necessary attributes for the DtwCache object.
+
+        Parameters
+        ----------
+            directory : str or path-like
+                Cache directory; created if missing.
+            max_bytes : int
+                Size bound of all entries together, 1 GiB by default.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = int(max_bytes)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return "DtwCache({0!r}, max_bytes={1})".format(str(self.directory), self.max_bytes)
+
+    def _entry(self, key):
+        return self.directory / (key + ".npz")
+
+    def _entries(self):
+        """(mtime, size, path) of every entry; entries removed meanwhile are left out."""
+        entries = []
+        for path in self.directory.glob("*.npz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    @property
+    def size_bytes(self):
+        """Total size of all entries."""
+        return sum(size for _, size, _ in self._entries())
+
+    def __len__(self):
+        return len(self._entries())
+
+    def get(self, key, pattern):
+        """
+        Slim result stored under a key.
+
+        Parameters
+        ----------
+        key : str
+            Entry key, see ``_cache_key``.
+        pattern : step_pattern.BasePattern object
+            Step pattern of the result.
+
+        Returns
+        -------
+        result.DtwResult or None
+            Slim result (no cumsum matrix), or None on a miss.
+        """
+        path = self._entry(key)
+        try:
+            with np.load(path) as data:
+                window = RangesWindow(int(data["len_x"]), int(data["len_y"]), data["ranges"],
+                    str(data["label"]))
+                warping_path = None
+                if "path_start" in data:
+                    warping_path = RLEPath(data["path_start"], data["path_steps"],
+                        data["path_codes"], data["path_lengths"]).to_array()
+                result = DtwResult(None, warping_path, window, pattern)
+                result.distance = float(data["distance"])
+                normalized = float(data["normalized_distance"])
+                result.normalized_distance = None if np.isnan(normalized) else normalized
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            # unreadable entry; drop it and recompute
+            self._remove(path)
+            return None
+        try:
+            # mark as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """
+        Store the slim copy of a result.
+
+        Parameters
+        ----------
+        key : str
+            Entry key, see ``_cache_key``.
+        result : result.DtwResult
+            Result to store; only its path, distances and window ranges are kept.
+        """
+        window = RangesWindow.from_window(result._window)
+        normalized = result.normalized_distance
+        arrays = {"distance": np.float64(result.distance),
+            "normalized_distance": np.float64(np.nan if normalized is None else normalized),
+            "len_x": np.int64(window.len_x), "len_y": np.int64(window.len_y),
+            "ranges": window.ranges, "label": np.str_(window.label)}
+        if not result.dist_only:
+            path = result.path if isinstance(result.path, RLEPath) else RLEPath.from_path(result.path)
+            arrays.update(path_start=path.start, path_steps=path.steps, path_codes=path.codes,
+                path_lengths=path.lengths)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self._entry(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self._evict()
+
+    def clear(self):
+        """Remove all entries."""
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        # temporary files of writers that died mid-write
+        stale = time.time() - 3600
+        for path in self.directory.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # another process got there first
+            pass
+
+
+def _get_cache(cache):
+    """Map the ``cache`` argument (path or DtwCache) to a cache object."""
+    if cache is None or isinstance(cache, DtwCache):
+        return cache
+    return DtwCache(cache)
+
+
+def _cache_key(*arrays, **params):
+    """
+    Key of a dtw run.
+
+    Parameters
+    ----------
+    *arrays : array
+        Input logs; hashed by dtype, shape and bytes.
+    **params :
+        Parameters of the run. Arrays and window objects are hashed by content,
+        everything else by ``repr``.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    digest = hashlib.blake2b(_CACHE_VERSION.encode(), digest_size=20)
+
+    def update(value):
+        if isinstance(value, BaseWindow):
+            digest.update(type(value).__name__.encode())
+            value = value.ranges if value.ranges is not None else value.matrix
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            digest.update("{0}{1}".format(value.dtype.str, value.shape).encode())
+            digest.update(value.data)
+        else:
+            digest.update(repr(value).encode())
+
+    for array in arrays:
+        update(np.asarray(array, dtype=np.float64))
+    for name in sorted(params):
+        digest.update(name.encode())
+        update(params[name])
+    return digest.hexdigest()
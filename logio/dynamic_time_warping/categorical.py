@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Integer-encoded categorical logs and their substitution cost table."""
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+
+class CategoricalCost():
+    """
+    Pair-wise cost of two categorical logs given by a substitution table.
+
+    The cost of cell (i, j) is ``table[codes_x[i], codes_y[j]]``; it is gathered
+    inside the compiled kernel, so no pair-wise matrix is ever built.
+    ``dtw_from_distance_matrix`` and ``dtw_low`` accept this object in place of a
+    cost matrix.
+
+    Attributes
+    ----------
+        codes_x, codes_y : 1d array
+            Category index of every query and reference sample; -1 if missing.
+        table : 2d array
+            (K, K) substitution cost between categories.
+        categories : list
+            Category of every table row and column.
+        shape : tuple
+            (len_x, len_y) of the implied cost matrix.
+
+    Methods
+    -------
+        from_logs(x, y, cost_table=None, categories=None):
+            Encode two categorical logs.
+        to_dense():
+            Dense pair-wise cost matrix, NaN for missing samples.
+    """
+
+    def __init__(self, codes_x, codes_y, table, categories=None):
+        """
+        Constructs all the necessary attributes for the CategoricalCost object.
+
+        Parameters
+        ----------
+            codes_x, codes_y : 1d array
+                Category index of every query and reference sample; -1 if missing.
+            table : 2d array
+                (K, K) substitution cost between categories.
+            categories : list, optional
+                Category of every table row and column.
+        """
+        self.codes_x = np.ascontiguousarray(codes_x, dtype=np.int64)
+        self.codes_y = np.ascontiguousarray(codes_y, dtype=np.int64)
+        self.table = np.ascontiguousarray(table, dtype=np.float64)
+        num = self.table.shape[0]
+        if self.table.ndim != 2 or self.table.shape != (num, num):
+            raise ValueError("cost table must be square")
+        for codes in (self.codes_x, self.codes_y):
+            if codes.ndim != 1 or (codes >= num).any() or (codes < -1).any():
+                raise ValueError("codes must index the cost table (-1 for missing samples)")
+        self.categories = list(range(num)) if categories is None else list(categories)
+        self.shape = (self.codes_x.size, self.codes_y.size)
+
+    @property
+    def nbytes(self):
+        return self.codes_x.nbytes + self.codes_y.nbytes + self.table.nbytes
+
+    @property
+    def missing(self):
+        """Whether any sample of either log is missing."""
+        return (self.codes_x < 0).any() or (self.codes_y < 0).any()
+
+    @classmethod
+    def from_logs(cls, x, y, cost_table=None, categories=None):
+        """
+        Encode two categorical logs.
+
+        Parameters
+        ----------
+        x, y : 1D array or Series
+            Facies or lithology codes of the query and reference logs, e.g. an
+            object column of a DataFrame returned by ``Analysis.read_file``.
+            Missing values (None, NaN) are encoded as -1.
+        cost_table : 2D array, DataFrame or dict, optional
+            Substitution cost between categories. A DataFrame is looked up by its
+            index and column labels, a dict by (category, category) keys with
+            missing pairs costing 1. Defaults to 0 for equal categories and 1 otherwise.
+        categories : list, optional
+            Order of the table rows and columns. Defaults to the index of a
+            DataFrame table, else to the sorted categories present in both logs.
+
+        Returns
+        -------
+        CategoricalCost
+        """
+        x = pd.Series(np.asarray(x, dtype=object).ravel())
+        y = pd.Series(np.asarray(y, dtype=object).ravel())
+        if categories is None:
+            if isinstance(cost_table, DataFrame):
+                categories = list(cost_table.index)
+            else:
+                present = pd.unique(pd.concat((x, y)).dropna())
+                try:
+                    categories = sorted(present)
+                except TypeError:
+                    # mixed types do not sort; keep order of appearance
+                    categories = list(present)
+        categories = list(categories)
+        codes = []
+        for log in (x, y):
+            code = pd.Categorical(log, categories=categories).codes.astype(np.int64)
+            unknown = (code < 0) & log.notna().to_numpy()
+            if unknown.any():
+                raise ValueError("category {0!r} not in categories".format(log[unknown].iloc[0]))
+            codes.append(code)
+
+        num = len(categories)
+        if cost_table is None:
+            table = 1.0 - np.eye(num)
+        elif isinstance(cost_table, DataFrame):
+            table = cost_table.reindex(index=categories, columns=categories).to_numpy(dtype=np.float64)
+            if np.isnan(table).any():
+                raise ValueError("cost table does not cover every pair of categories")
+        elif isinstance(cost_table, dict):
+            table = 1.0 - np.eye(num)
+            position = {category: idx for idx, category in enumerate(categories)}
+            for (first, second), cost in cost_table.items():
+                table[position[first], position[second]] = cost
+        else:
+            table = np.asarray(cost_table, dtype=np.float64)
+            if table.shape != (num, num):
+                raise ValueError("cost table must be K x K for K categories")
+        return cls(codes[0], codes[1], table, categories)
+
+    def to_dense(self):
+        """Dense pair-wise cost matrix, NaN for missing samples."""
+        dense = self.table[self.codes_x[:, np.newaxis], self.codes_y[np.newaxis, :]]
+        dense[self.codes_x < 0, :] = np.nan
+        dense[:, self.codes_y < 0] = np.nan
+        return dense
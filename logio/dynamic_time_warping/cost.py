@@ -5,17 +5,23 @@ import numpy as np
 from numba import jit
 
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True)
 def _calc_cumsum_matrix_jit(X, w_list, p_ar, open_begin):
-    """Fast implementation by numba.jit."""
+    """Fast implementation by numba.jit.
+
+    w_list is only read: windows cache their cell list and may be shared
+    between threads.
+    """
     len_x, len_y = X.shape
     # cumsum matrix
     D = np.ones((len_x, len_y), dtype=np.float64) * np.inf
+    # row offset of the window in D
+    shift = 0
 
     if open_begin:
         X = np.vstack((np.zeros((1, X.shape[1])), X))
         D = np.vstack((np.zeros((1, D.shape[1])), D))
-        w_list[:, 0] += 1
+        shift = 1
 
     # number of patterns
     num_pattern = p_ar.shape[0]
@@ -29,7 +35,7 @@ def _calc_cumsum_matrix_jit(X, w_list, p_ar, open_begin):
     num_cells = w_list.shape[0]
 
     for cell_idx in range(num_cells):
-        i = w_list[cell_idx, 0]
+        i = w_list[cell_idx, 0] + shift
         j = w_list[cell_idx, 1]
         if i == j == 0:
             D[i, j] = X[0, 0]
@@ -64,3 +70,225 @@ def _calc_cumsum_matrix_jit(X, w_list, p_ar, open_begin):
             D[i, j] = min_cost
 
     return D
+
+
+
+@jit(nopython=True, nogil=True)
+def _dense_cost(X, i, j):
+    """Local cost lookup in a dense pair-wise cost matrix."""
+    return X[i, j]
+
+
+@jit(nopython=True, nogil=True)
+def _banded_cost(X, i, j):
+    """Local cost lookup in a banded matrix given as (data, offsets, ranges).
+
+    The stored value is read at a clamped position before the band test: an
+    early return here stops numba from pruning the reference counting of the
+    three arrays, which made every lookup about 20x slower. data must not be empty.
+    """
+    data, offsets, ranges = X
+    start = ranges[i, 0]
+    stop = ranges[i, 1]
+    cost = data[min(max(offsets[i] + j - start, 0), data.shape[0] - 1)]
+    if j < start or j >= stop:
+        cost = np.inf
+    return cost
+
+
+@jit(nopython=True, nogil=True)
+def _table_cost(X, i, j):
+    """Local cost lookup in a substitution table given as (codes_x, codes_y, table)."""
+    codes_x, codes_y, table = X
+    return table[codes_x[i], codes_y[j]]
+
+
+# metric codes of _feature_cost
+_FEATURE_METRICS = {"cityblock": 0, "sqeuclidean": 1, "euclidean": 2}
+
+
+@jit(nopython=True, nogil=True, inline="always")
+def _feature_cost(X, i, j):
+    """Local cost computed from the samples given as (x, y, w, metric).
+
+    Weighted like ``scipy.spatial.distance`` with metric a code of
+    _FEATURE_METRICS; no pair-wise cost is stored at all. Inlined into the
+    kernel: as a call, the loop over features kept numba from pruning the
+    reference counting of the arrays and every lookup was about 5x slower.
+    """
+    x, y, w, metric = X
+    total = 0.0
+    for k in range(x.shape[1]):
+        diff = x[i, k] - y[j, k]
+        if metric == 0:
+            total += w[k] * abs(diff)
+        else:
+            total += w[k] * diff * diff
+    if metric == 2:
+        total = np.sqrt(total)
+    return total
+
+
+def _make_masked_cost(local_cost, masked):
+    """Wrap a local cost lookup so cells with an invalid (missing) sample cost gap_cost.
+
+    x_valid and y_valid are per-sample validity masks. The unmasked variant ignores
+    them, so alignments without missing samples pay nothing for the check.
+    """
+    if masked:
+        @jit(nopython=True, nogil=True)
+        def masked_cost(X, i, j, x_valid, y_valid, gap_cost):
+            if not (x_valid[i] and y_valid[j]):
+                return gap_cost
+            return local_cost(X, i, j)
+    else:
+        @jit(nopython=True, nogil=True)
+        def masked_cost(X, i, j, x_valid, y_valid, gap_cost):
+            return local_cost(X, i, j)
+
+    return masked_cost
+
+
+def _make_cumsum_ranges_kernel(local_cost, masked=False):
+    """Build the row-range cumsum kernel for a given local cost lookup.
+
+    The recurrence is the one of ``_calc_cumsum_matrix_jit``; window cells are
+    enumerated row by row from w_ranges and local costs are read through
+    ``local_cost(X, i, j)``, so dense, banded and categorical cost storage
+    share one kernel.
+    If masked, samples flagged invalid in x_valid/y_valid are never read from X.
+
+    D holds num_rows rows of the cumsum matrix, row i stored at i % num_rows.
+    With num_rows = len_x (+1 if open_begin) it is the full matrix; with fewer
+    rows only the rolling rows reachable by the step pattern are kept. If
+    store_tb, the index of the winning pattern of every window cell is written
+    to tb (uint8, cells ordered as in w_offsets): _TB_ORIGIN marks the start
+    cell and _TB_NONE a cell no pattern reaches.
+
+    Returns (fill_rows, kernel). fill_rows(..., D, tb, row_start, row_stop)
+    computes window rows [row_start, row_stop) into caller-allocated D and tb
+    (empty if no traceback is stored), so rows can be computed in chunks and tb
+    may be memory-mapped; kernel allocates both and fills all rows.
+    """
+    cost = _make_masked_cost(local_cost, masked)
+
+    @jit(nopython=True, nogil=True)
+    def fill_rows(X, w_ranges, w_offsets, p_ar, open_begin, x_valid, y_valid,
+        gap_cost, D, tb, row_start, row_stop):
+        # row offset of the window in D
+        shift = 1 if open_begin else 0
+        total_rows = w_ranges.shape[0] + shift
+        num_rows = D.shape[0]
+        store_tb = tb.shape[0] > 0
+
+        # number of patterns
+        num_pattern = p_ar.shape[0]
+        # max pattern length
+        max_pattern_len = p_ar.shape[1]
+        # pattern cost
+        pattern_cost = np.zeros(num_pattern, dtype=np.float64)
+        # step cost
+        step_cost = np.zeros(max_pattern_len, dtype=np.float64)
+        # D row holding the start node of each pattern
+        start_row = np.zeros(num_pattern, dtype=np.int64)
+
+        for row in range(row_start, row_stop):
+            i = row + shift
+            di = i % num_rows
+            for pidx in range(num_pattern):
+                ii = int(i + p_ar[pidx, 0, 0])
+                start_row[pidx] = ii % num_rows if ii >= 0 else -1
+            if num_rows < total_rows and i >= num_rows:
+                # recycle the slot of row i - num_rows
+                prev = i - num_rows - shift
+                if prev < 0:
+                    D[di, :] = np.inf
+                else:
+                    D[di, w_ranges[prev, 0]:w_ranges[prev, 1]] = np.inf
+            for j in range(w_ranges[row, 0], w_ranges[row, 1]):
+                if i == j == 0:
+                    D[di, j] = cost(X, 0, 0, x_valid, y_valid, gap_cost)
+                    if store_tb:
+                        tb[w_offsets[row] + j - w_ranges[row, 0]] = _TB_ORIGIN
+                    continue
+
+                for pidx in range(num_pattern):
+                    # calculate local cost for each pattern
+                    for sidx in range(1, max_pattern_len):
+                        # calculate step cost of pair-wise cost matrix
+                        pattern_index = p_ar[pidx, sidx, 0:2]
+                        ii = int(i + pattern_index[0])
+                        jj = int(j + pattern_index[1])
+                        if ii < 0 or jj < 0:
+                            step_cost[sidx] = np.inf
+                            continue
+                        elif ii < shift:
+                            # open-begin row costs nothing
+                            step_cost[sidx] = 0.0 * p_ar[pidx, sidx, 2]
+                        else:
+                            step_cost[sidx] = cost(X, ii - shift, jj,
+                                x_valid, y_valid, gap_cost) \
+                                * p_ar[pidx, sidx, 2]
+
+                    pattern_index = p_ar[pidx, 0, 0:2]
+                    ii = int(i + pattern_index[0])
+                    jj = int(j + pattern_index[1])
+                    if ii < 0 or jj < 0:
+                        pattern_cost[pidx] = np.inf
+                        continue
+
+                    pattern_cost[pidx] = D[start_row[pidx], jj] \
+                        + step_cost.sum()
+
+                min_pattern_idx = np.argmin(pattern_cost)
+                min_cost = pattern_cost[min_pattern_idx]
+                if min_cost != np.inf:
+                    D[di, j] = min_cost
+                    if store_tb:
+                        tb[w_offsets[row] + j - w_ranges[row, 0]] = min_pattern_idx
+
+    @jit(nopython=True, nogil=True)
+    def kernel(X, len_x, len_y, w_ranges, w_offsets, p_ar, open_begin,
+        x_valid, y_valid, gap_cost, num_rows, store_tb):
+        # cumsum matrix (or its rolling rows)
+        D = np.ones((num_rows, len_y), dtype=np.float64) * np.inf
+        if open_begin:
+            D[0, :] = 0
+        # traceback
+        if store_tb:
+            tb = np.full(w_offsets[-1], _TB_NONE, dtype=np.uint8)
+        else:
+            tb = np.zeros(0, dtype=np.uint8)
+        fill_rows(X, w_ranges, w_offsets, p_ar, open_begin, x_valid, y_valid,
+            gap_cost, D, tb, 0, len_x)
+        return D, tb
+
+    return fill_rows, kernel
+
+
+# traceback codes besides pattern indices
+_TB_ORIGIN = 254
+_TB_NONE = 255
+
+_CUMSUM_KERNELS = {}
+_CUMSUM_ROW_KERNELS = {}
+for _storage, _local_cost in (("dense", _dense_cost), ("banded", _banded_cost),
+    ("table", _table_cost), ("features", _feature_cost)):
+    for _masked in (False, True):
+        _CUMSUM_ROW_KERNELS[(_storage, _masked)], _CUMSUM_KERNELS[(_storage, _masked)] = \
+            _make_cumsum_ranges_kernel(_local_cost, _masked)
+
+
+def _get_cumsum_kernel(storage, masked):
+    """Row-range cumsum kernel for the given cost storage ("dense", "banded", "table", "features") and masking."""
+    return _CUMSUM_KERNELS[(storage, masked)]
+
+
+def _get_cumsum_rows_kernel(storage, masked):
+    """Row-chunk variant of ``_get_cumsum_kernel``, filling caller-allocated D and tb."""
+    return _CUMSUM_ROW_KERNELS[(storage, masked)]
+
+
+def _num_rolling_rows(p_ar):
+    """Number of cumsum rows the step pattern reaches back, current row included."""
+    return int(-p_ar[:, :, 0].min()) + 1
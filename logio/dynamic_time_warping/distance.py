@@ -1,19 +1,28 @@
 # -*- coding: utf-8 -*-
 import numpy as np
 
+
+class NoPathError(ValueError):
+    """Raised when no alignment path reaches the end point under the given constraints."""
+
+
 # Obtain Alignment distance after warping.
 def _get_alignment_distance(D, pattern, open_begin, open_end):
-    dist = D[-1, -1]
+    len_x = D.shape[0]
+    if open_begin:
+        # ignore first row
+        len_x -= 1
+    return _get_row_alignment_distance(D[-1, :], len_x, pattern, open_end)
+
+
+# Obtain Alignment distance from the last row of the cumsum matrix only.
+def _get_row_alignment_distance(last_row, len_x, pattern, open_end):
+    dist = last_row[-1]
     normalized_dist = None
     last_idx = -1
 
     if pattern.is_normalizable:
-        len_x, len_y = D.shape
-        if open_begin:
-            # ignore first row
-            len_x -= 1
-        # get the last row of D
-        last_row = D[-1, :]
+        len_y = last_row.shape[0]
         # normalize all value of last row
         normalized_last_row = pattern._normalize(
             last_row, len_x, len_y)
@@ -28,5 +37,5 @@ def _get_alignment_distance(D, pattern, open_begin, open_end):
 
     # check whether path can reach at end point with given constraint
     if dist == np.inf:
-        raise ValueError("No alignment path found at end point with given constraint. Try different constraints.")
+        raise NoPathError("No alignment path found at end point with given constraint. Try different constraints.")
     return dist, normalized_dist, last_idx
@@ -130,4 +130,107 @@ def ThreeWayPlot(alignment_vector, query=None, reference=None,
     else:
         raise ValueError("Both query and reference parameters are required as pandas.core.series.Series object.")
 
-    
\ No newline at end of file
+    
+
+# rows of the matrix reduced at once; bounds the temporaries of a heatmap
+_HEATMAP_CHUNK_CELLS = 2**22
+
+
+def _heatmap_shape(ax, resolution=None):
+    """Number of (query, reference) pixels of a heatmap: the axes size on screen by default."""
+    if resolution is not None:
+        return int(resolution[0]), int(resolution[1])
+    bbox = ax.get_window_extent()
+    return max(int(bbox.width), 1), max(int(bbox.height), 1)
+
+
+def _block_edges(n, num):
+    """Edges of at most ``num`` near-equal blocks covering ``range(n)``."""
+    return np.unique(np.linspace(0, n, min(n, num) + 1).astype(np.int64))
+
+
+def _block_reduce(matrix, shape, how="min"):
+    """
+    Reduce a matrix to at most ``shape`` blocks.
+
+    Parameters
+    ----------
+    matrix : 2D array
+        Matrix to reduce; never copied as a whole.
+    shape : tuple
+        Maximum number of row and column blocks.
+    how : str
+        "min" or "mean" of the finite values of each block; NaN if there are none.
+
+    Returns
+    -------
+    image : 2D array
+        Reduced matrix.
+    """
+    if how not in ("min", "mean"):
+        raise ValueError("how must be 'min' or 'mean'")
+    len_x, len_y = matrix.shape
+    row_edges = _block_edges(len_x, shape[0])
+    col_edges = _block_edges(len_y, shape[1])
+    chunk = max(_HEATMAP_CHUNK_CELLS // max(len_y, 1), 1)
+    image = np.empty((row_edges.size - 1, col_edges.size - 1))
+    for k in range(row_edges.size - 1):
+        lowest = np.full(len_y, np.inf)
+        total = np.zeros(len_y)
+        count = np.zeros(len_y)
+        for start in range(row_edges[k], row_edges[k + 1], chunk):
+            rows = np.asarray(matrix[start:min(start + chunk, row_edges[k + 1])], dtype=np.float64)
+            finite = np.isfinite(rows)
+            if how == "min":
+                np.fmin(lowest, np.where(finite, rows, np.inf).min(axis=0), out=lowest)
+            else:
+                total += np.where(finite, rows, 0.0).sum(axis=0)
+                count += finite.sum(axis=0)
+        if how == "min":
+            row = np.minimum.reduceat(lowest, col_edges[:-1])
+            row[np.isinf(row)] = np.nan
+        else:
+            with np.errstate(invalid="ignore"):
+                row = np.add.reduceat(total, col_edges[:-1]) / np.add.reduceat(count, col_edges[:-1])
+        image[k] = row
+    return image
+
+
+def _ranges_coverage(ranges, len_y, shape):
+    """
+    Fraction of the cells of each block covered by per-row ranges.
+
+    The dense window matrix is never built; per block row only a
+    (rows, column blocks) array is held.
+    """
+    len_x = ranges.shape[0]
+    row_edges = _block_edges(len_x, shape[0])
+    col_edges = _block_edges(len_y, shape[1])
+    chunk = max(_HEATMAP_CHUNK_CELLS // col_edges.size, 1)
+    image = np.empty((row_edges.size - 1, col_edges.size - 1))
+    for k in range(row_edges.size - 1):
+        covered = np.zeros(col_edges.size)
+        for start in range(row_edges[k], row_edges[k + 1], chunk):
+            part = ranges[start:min(start + chunk, row_edges[k + 1])]
+            # cells of each row left of every column edge
+            covered += np.clip(col_edges[np.newaxis, :] - part[:, 0:1], 0,
+                part[:, 1:2] - part[:, 0:1]).sum(axis=0)
+        area = (row_edges[k + 1] - row_edges[k]) * np.diff(col_edges)
+        image[k] = np.diff(covered) / area
+    return image
+
+
+def _window_image(window, shape):
+    """Coverage of a window reduced to at most ``shape`` blocks."""
+    if window.ranges is not None:
+        return _ranges_coverage(window.ranges, window.len_y, shape)
+    return _block_reduce(window.matrix, shape, how="mean")
+
+
+def _plot_heatmap(ax, image, len_x, len_y, vmin=None, vmax=None):
+    """Draw a reduced (query, reference) image over the full index extent."""
+    image = np.ma.masked_invalid(image.T)
+    mesh = ax.imshow(image, origin="lower", aspect="auto", interpolation="nearest",
+        extent=(-0.5, len_x - 0.5, -0.5, len_y - 0.5), vmin=vmin, vmax=vmax)
+    ax.figure.colorbar(mesh, ax=ax)
+    return mesh
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""Fixed-size embeddings of log intervals and a KD-tree prefilter over them."""
+
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pandas import DataFrame
+from scipy.spatial import cKDTree
+
+from .DTW import dtw
+from .distance import NoPathError
+from .features import _prepare_features
+
+EMBEDDINGS = ("paa", "stats")
+# summary statistics of every curve, as reported by ``Analysis.describe``
+STATS = ("mean", "median", "std", "min", "max", "skewness", "kurtosis")
+# buffered insertions are merged into the tree once they exceed this share of it
+_REBUILD_FRACTION = 0.1
+
+
+def _embed(values, embedding, size):
+    """
+    Embed one prepared interval (sample * curve) into a fixed-size vector.
+
+    "paa" takes the means of ``size`` equal segments of every curve; segment
+    bounds may fall between samples, so intervals of any length map to the same
+    size. "stats" takes the summary statistics of every curve. Missing samples
+    are left out.
+    """
+    present = ~np.isnan(values)
+    if embedding == "paa":
+        zero = np.zeros((1, values.shape[1]))
+        total = np.vstack((zero, np.cumsum(np.where(present, values, 0.0), axis=0)))
+        count = np.vstack((zero, np.cumsum(present, axis=0)))
+        edges = np.linspace(0, values.shape[0], size + 1)
+        grid = np.arange(values.shape[0] + 1)
+        # running sums at fractional edges, linear within a sample
+        total = np.column_stack([np.interp(edges, grid, col) for col in total.T])
+        count = np.column_stack([np.interp(edges, grid, col) for col in count.T])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vector = np.diff(total, axis=0) / np.diff(count, axis=0)
+        return vector.T.ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = present.sum(axis=0)
+        mean = np.nanmean(values, axis=0)
+        dev = values - mean
+        m2, m3, m4 = (np.nanmean(dev ** p, axis=0) for p in (2, 3, 4))
+        # sample-size corrected skewness and excess kurtosis, as pandas reports them;
+        # undefined for too few samples, so missing rather than infinite
+        std = np.where(n > 1, np.sqrt(m2 * n / (n - 1)), np.nan)
+        skewness = np.where(n > 2, np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5, np.nan)
+        kurtosis = np.where(n > 3, (n - 1) / ((n - 2) * (n - 3))
+            * ((n + 1) * m4 / m2 ** 2 - 3 * (n - 1)), np.nan)
+        vector = np.vstack((mean, np.nanmedian(values, axis=0), std,
+            np.nanmin(values, axis=0), np.nanmax(values, axis=0), skewness, kurtosis))
+    return vector.T.ravel()
+
+
+def _finite(vectors):
+    """Embeddings with missing or infinite entries set to zero, as the tree needs."""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    return np.where(np.isfinite(vectors), vectors, 0.0)
+
+
+class EmbeddingIndex():
+    """
+    Shortlist of similar log intervals by a KD-tree over fixed-size embeddings.
+
+    Every interval is reduced to a vector (segment means or summary statistics
+    per curve) kept in a ``scipy.spatial.cKDTree``. A query returns the nearest
+    vectors in time logarithmic in the library size, and :meth:`search` reranks
+    that shortlist with :func:`dtw`. Insertions go to a small buffer searched by
+    brute force and merged into the tree once it grows past a tenth of it.
+
+    Attributes
+    ----------
+        keys : list
+            Key of every stored interval, in insertion order.
+        vectors : 2d array
+            Embedding of every stored interval.
+
+    Methods
+    -------
+        embed(x):
+            Embedding of one interval.
+        add(key, x):
+            Insert an interval.
+        add_many(items):
+            Insert many intervals.
+        query(x, k=10):
+            Nearest stored intervals by embedding.
+        search(x, k=5, shortlist=50, n_jobs=None, **kwargs):
+            Nearest stored intervals by dtw, among the embedding shortlist.
+        save(path):
+            Write the index to a ``.npz`` file.
+        load(path):
+            Read an index written by ``save``.
+    """
+
+    def __init__(self, embedding="paa", size=16, curves=None, transforms=None, store_logs=True):
+        """
+        Constructs all the necessary attributes for the EmbeddingIndex object.
+
+        Parameters
+        ----------
+            embedding : str
+                "paa" for ``size`` segment means per curve, "stats" for the mean,
+                median, standard deviation, minimum, maximum, skewness and kurtosis
+                per curve. Statistics are scaled by their spread over the library.
+            size : int
+                Number of segments per curve, for "paa".
+            curves, transforms :
+                see :func:`dtw` function; applied to every interval before it is
+                embedded or aligned. transforms="zscore" matches intervals by shape.
+            store_logs : bool
+                Whether or not to keep the prepared intervals, so :meth:`search`
+                can align against them.
+        """
+        if embedding not in EMBEDDINGS:
+            raise ValueError("embedding must be any of: 'paa', 'stats'")
+        self.embedding = embedding
+        self.size = int(size)
+        self.curves = curves
+        self.transforms = transforms
+        self.store_logs = store_logs
+        self.keys = []
+        self._positions = {}
+        self._vectors = []
+        self._logs = {}
+        self._tree = None
+        self._tree_size = 0
+        self._scale = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __repr__(self):
+        rv = "embedding index: \n\n"
+        rv += "{0:<20s}{1}\n".format("intervals", len(self))
+        rv += "{0:<20s}{1}\n".format("embedding", self.embedding)
+        rv += "{0:<20s}{1}".format("dimensions", self.vectors.shape[1] if len(self) else 0)
+        return rv
+
+    @property
+    def vectors(self):
+        return np.array(self._vectors)
+
+    def _prepare(self, x):
+        values, _ = _prepare_features(x, self.curves, self.transforms)
+        return values
+
+    def embed(self, x):
+        """
+        Embedding of one interval.
+
+        Parameters
+        ----------
+        x : 1D or 2D array, Series or DataFrame
+            Log interval.
+
+        Returns
+        -------
+        1D array
+        """
+        return _embed(self._prepare(x), self.embedding, self.size)
+
+    def add(self, key, x):
+        """
+        Insert an interval.
+
+        Parameters
+        ----------
+        key : hashable
+            Name of the interval, e.g. (well, top, base).
+        x : 1D or 2D array, Series or DataFrame
+            Log interval.
+        """
+        if key in self._positions:
+            raise ValueError("key {0!r} already stored".format(key))
+        values = self._prepare(x)
+        vector = _embed(values, self.embedding, self.size)
+        if self._vectors and vector.shape != self._vectors[0].shape:
+            raise ValueError("interval has a different number of curves than the index")
+        self._positions[key] = len(self.keys)
+        self.keys.append(key)
+        self._vectors.append(vector)
+        if self.store_logs:
+            self._logs[key] = values
+        if len(self) - self._tree_size > max(_REBUILD_FRACTION * self._tree_size, 32):
+            self._build()
+
+    def add_many(self, items):
+        """
+        Insert many intervals.
+
+        Parameters
+        ----------
+        items : dict or iterable of (key, interval) pairs
+        """
+        items = items.items() if isinstance(items, dict) else items
+        for key, x in items:
+            self.add(key, x)
+
+    def _build(self):
+        """Merge the buffer into a new tree."""
+        vectors = _finite(self.vectors)
+        if self.embedding == "stats":
+            # statistics differ in units; weigh each by its spread over the library
+            spread = vectors.std(axis=0)
+            self._scale = np.where(spread > 0, 1 / np.where(spread > 0, spread, 1.0), 1.0)
+            vectors = vectors * self._scale
+        self._tree = cKDTree(vectors)
+        self._tree_size = len(self)
+
+    def _project(self, vector):
+        vector = _finite(vector)
+        return vector if self._scale is None else vector * self._scale
+
+    def query(self, x, k=10):
+        """
+        Nearest stored intervals by embedding.
+
+        Parameters
+        ----------
+        x : 1D or 2D array, Series or DataFrame
+            Query interval.
+        k : int
+            Shortlist length.
+
+        Returns
+        -------
+        DataFrame
+            Columns "key" and "embedding_distance", nearest first.
+        """
+        if not len(self):
+            return DataFrame({"key": [], "embedding_distance": []})
+        if self._tree is None:
+            self._build()
+        vector = self._project(self.embed(x))
+        k = min(k, len(self))
+        distances, positions = self._tree.query(vector, k=min(k, self._tree_size))
+        distances = np.atleast_1d(distances)
+        positions = np.atleast_1d(positions)
+        if len(self) > self._tree_size:
+            # buffered insertions since the last build
+            buffered = _finite(np.array(self._vectors[self._tree_size:]))
+            if self._scale is not None:
+                buffered = buffered * self._scale
+            distances = np.concatenate((distances, np.linalg.norm(buffered - vector, axis=1)))
+            positions = np.concatenate((positions, np.arange(self._tree_size, len(self))))
+        order = np.argsort(distances, kind="stable")[:k]
+        return DataFrame({"key": [self.keys[pos] for pos in positions[order]],
+            "embedding_distance": distances[order]})
+
+    def search(self, x, k=5, shortlist=50, logs=None, n_jobs=None, **kwargs):
+        """
+        Nearest stored intervals by dtw, among the embedding shortlist.
+
+        Parameters
+        ----------
+        x : 1D or 2D array, Series or DataFrame
+            Query interval.
+        k : int
+            Number of matches.
+        shortlist : int
+            Number of intervals aligned, nearest by embedding.
+        logs : dict, optional
+            Key to interval, for an index built with ``store_logs=False``;
+            intervals are prepared like the query.
+        n_jobs : int, optional
+            Number of worker threads. Defaults to the executor default; 1 runs serially.
+        **kwargs :
+            Passed to :func:`dtw`, e.g. step_pattern, window_type, open_end.
+
+        Returns
+        -------
+        DataFrame
+            Columns "key", "embedding_distance", "distance" and
+            "normalized_distance", best dtw match first. Intervals without a path
+            under the given constraints are left out.
+        """
+        candidates = self.query(x, shortlist)
+        values = self._prepare(x)
+
+        def align(key):
+            log = self._logs[key] if logs is None else self._prepare(logs[key])
+            try:
+                result = dtw(values, log, dist_only=True, **kwargs)
+            except NoPathError:
+                return np.inf, np.nan
+            normalized = np.nan if result.normalized_distance is None else result.normalized_distance
+            return result.distance, normalized
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            outcomes = list(executor.map(align, candidates["key"]))
+        candidates["distance"] = [outcome[0] for outcome in outcomes]
+        candidates["normalized_distance"] = [outcome[1] for outcome in outcomes]
+        candidates = candidates[np.isfinite(candidates["distance"])]
+        return candidates.sort_values("distance", kind="stable").head(k).reset_index(drop=True)
+
+    def save(self, path):
+        """
+        Write the index to a ``.npz`` file.
+
+        Keys must be JSON serializable (strings, numbers, lists). The file is
+        written to a temporary name and moved into place, so readers never see
+        a partial index.
+
+        Parameters
+        ----------
+        path : str or path-like
+            Target file.
+        """
+        config = {"embedding": self.embedding, "size": self.size, "curves": self.curves,
+            "transforms": self.transforms, "store_logs": self.store_logs, "keys": self.keys}
+        arrays = {"config": np.array(json.dumps(config)), "vectors": self.vectors}
+        if self.store_logs:
+            for pos, key in enumerate(self.keys):
+                arrays["log_{0}".format(pos)] = self._logs[key]
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by ``save``.
+
+        Parameters
+        ----------
+        path : str or path-like
+            Index file.
+
+        Returns
+        -------
+        EmbeddingIndex
+        """
+        with np.load(path) as data:
+            config = json.loads(str(data["config"]))
+            index = cls(config["embedding"], config["size"], config["curves"],
+                config["transforms"], config["store_logs"])
+            # JSON turns tuple keys into lists
+            keys = [tuple(key) if isinstance(key, list) else key for key in config["keys"]]
+            index.keys = keys
+            index._positions = {key: pos for pos, key in enumerate(keys)}
+            index._vectors = list(data["vectors"])
+            if index.store_logs:
+                index._logs = {key: data["log_{0}".format(pos)] for pos, key in enumerate(keys)}
+        if len(index):
+            index._build()
+        return index
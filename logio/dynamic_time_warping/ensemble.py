@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Ensembles of perturbed alignments and their depth-tie envelopes."""
+
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pandas import DataFrame
+
+from .DTW import dtw
+from .distance import NoPathError
+from .window import BaseWindow
+from .features import _prepare_features, _get_weights
+
+
+class DtwEnsemble():
+    """
+    Depth ties of an ensemble of perturbed alignments.
+
+    Only one tie per query sample and run is kept, never a cumsum matrix.
+
+    Attributes
+    ----------
+        ties : 2d array, shape (num_runs, len_x)
+            Mean reference index matched to every query sample, per run;
+            NaN where a run found no path or did not reach the sample.
+        runs : DataFrame
+            Step pattern, window size, seed, distance and normalized distance of every run.
+        query_depth : 1d array or None
+            Depth of each query log sample.
+        reference_depth : 1d array or None
+            Depth of each reference log sample.
+
+    Methods
+    -------
+        envelope(percentiles=(5, 50, 95)):
+            Per-sample percentiles of the depth ties.
+    """
+
+    def __init__(self, ties, runs, query_depth=None, reference_depth=None):
+        """
+        Constructs all the necessary attributes for the DtwEnsemble object.
+
+        Parameters
+        ----------
+            ties : 2d array, shape (num_runs, len_x)
+                Mean reference index matched to every query sample, per run.
+            runs : DataFrame
+                Parameters and distances of every run.
+            query_depth, reference_depth : 1d array, optional
+                Depth of each query and reference log sample.
+        """
+        self.ties = ties
+        self.runs = runs
+        self.query_depth = query_depth
+        self.reference_depth = reference_depth
+
+    def envelope(self, percentiles=(5, 50, 95)):
+        """
+        Per-sample percentiles of the depth ties.
+
+        Parameters
+        ----------
+        percentiles : list of float
+            Percentiles to report, between 0 and 100.
+
+        Returns
+        -------
+        DataFrame
+            One row per query sample: "query" (depth if known, else index), one
+            "p<percentile>" column per percentile and "spread" between the outer
+            two, in reference depth if known, else reference index.
+        """
+        percentiles = list(percentiles)
+        # runs without a tie for a sample are left out of its percentiles
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = np.nanpercentile(self.ties, percentiles, axis=0)
+        if self.reference_depth is not None:
+            values = np.interp(values, np.arange(self.reference_depth.size), self.reference_depth)
+        query = self.query_depth if self.query_depth is not None else np.arange(self.ties.shape[1])
+        envelope = DataFrame({"query": query})
+        for percentile, value in zip(percentiles, values):
+            envelope["p{0:g}".format(percentile)] = value
+        envelope["spread"] = values.max(axis=0) - values.min(axis=0)
+        return envelope
+
+    def __repr__(self):
+        rv = "dtw ensemble: \n\n"
+        rv += "{0:<20s}{1}\n".format("runs", self.ties.shape[0])
+        rv += "{0:<20s}{1}\n".format("failed runs", int(np.isinf(self.runs["distance"]).sum()))
+        rv += "{0:<20s}{1}".format("query samples", self.ties.shape[1])
+        return rv
+
+
+def dtw_ensemble(x, y, num_runs=50, step_patterns=("symmetric2",), window_type="none",
+    window_sizes=(None,), noise=0.05, seed=None, n_jobs=None, x_depth=None, y_depth=None,
+    curves=None, weights=None, transforms=None, **kwargs):
+    """
+    Run an ensemble of perturbed alignments and collect their depth ties.
+
+    Details
+    ----------
+    Every run draws a step pattern and a window size and adds Gaussian noise to
+    both logs, then aligns them with :func:`dtw`. Runs share the prepared logs and
+    the compiled kernels in a thread pool; windows given as row ranges run in
+    traceback mode, so no run keeps a cumsum matrix. Each path is reduced to the
+    mean reference index per query sample at once with ``np.bincount``.
+
+    Parameters
+    ----------
+    x : 1D or 2D array (sample * feature), Series or DataFrame
+        Query log.
+
+    y : 1D or 2D array (sample * feature), Series or DataFrame
+        Reference log.
+
+    num_runs : int
+        Number of alignments.
+
+    step_patterns : list of str
+        Step patterns drawn from.
+
+    window_sizes : list of int
+        Window sizes drawn from.
+
+    noise : float
+        Standard deviation of the added noise, as a fraction of each curve's
+        standard deviation.
+
+    seed : int, optional
+        Seed of the perturbations; runs are reproducible for a given seed.
+
+    n_jobs : int, optional
+        Number of worker threads. Defaults to the executor default; 1 runs serially.
+
+    **kwargs :
+        Passed to :func:`dtw`, e.g. dist, open_begin, open_end, nan_policy;
+        not dist_only, as the ties are taken from the paths.
+
+    others :
+        see :func:`dtw` function.
+
+    Returns
+    -------
+    ensemble.DtwEnsemble
+        Result obj.
+
+    """
+    if kwargs.get("dist_only"):
+        raise ValueError("dtw ensemble takes its depth ties from the paths; dist_only not allowed")
+    # prepared once, shared by every run; dtw takes them as they are
+    x, x_curves = _prepare_features(x, curves, transforms)
+    y, _ = _prepare_features(y, curves, transforms)
+    w = _get_weights(weights, x_curves)
+    len_x = x.shape[0]
+    with np.errstate(invalid="ignore"):
+        x_scale = noise * np.nanstd(x, axis=0)
+        y_scale = noise * np.nanstd(y, axis=0)
+
+    rng = np.random.default_rng(seed)
+    step_patterns = list(step_patterns)
+    window_sizes = list(window_sizes)
+    patterns = [step_patterns[k] for k in rng.integers(len(step_patterns), size=num_runs)]
+    sizes = [window_sizes[k] for k in rng.integers(len(window_sizes), size=num_runs)]
+    seeds = rng.integers(2**32, size=num_runs)
+
+    # windows without row ranges cannot run in traceback mode
+    traceback = not isinstance(window_type, BaseWindow) or window_type.ranges is not None
+
+    def run(k):
+        noise_rng = np.random.default_rng(seeds[k])
+        xk = x + noise_rng.standard_normal(x.shape) * x_scale if noise else x
+        yk = y + noise_rng.standard_normal(y.shape) * y_scale if noise else y
+        try:
+            result = dtw(xk, yk, window_type=window_type, window_size=sizes[k],
+                step_pattern=patterns[k], traceback=traceback, weights=w, **kwargs)
+        except NoPathError:
+            # no path within this window
+            return np.full(len_x, np.nan), np.inf, np.nan
+        path = result.path
+        count = np.bincount(path[:, 0], minlength=len_x)
+        total = np.bincount(path[:, 0], weights=path[:, 1], minlength=len_x)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tie = total / count
+        normalized = np.nan if result.normalized_distance is None else result.normalized_distance
+        return tie, result.distance, normalized
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        outcomes = list(executor.map(run, range(num_runs)))
+
+    ties = np.vstack([outcome[0] for outcome in outcomes]) if num_runs else np.empty((0, len_x))
+    runs = DataFrame({"step_pattern": patterns, "window_size": sizes, "seed": seeds,
+        "distance": [outcome[1] for outcome in outcomes],
+        "normalized_distance": [outcome[2] for outcome in outcomes]})
+    query_depth = None if x_depth is None else np.asarray(x_depth, dtype=np.float64)
+    reference_depth = None if y_depth is None else np.asarray(y_depth, dtype=np.float64)
+    return DtwEnsemble(ties, runs, query_depth, reference_depth)
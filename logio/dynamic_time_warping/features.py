@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Curve selection and per-curve normalization ahead of the local cost."""
+
+import numpy as np
+
+from .cost import _FEATURE_METRICS
+
+TRANSFORMS = ("log10", "zscore", "minmax")
+
+
+def _prepare_features(x, curves=None, transforms=None):
+    """
+    Select curves of a log and apply per-curve transforms.
+
+    The selected curves are copied once into a float64 (sample * curve) array;
+    log10 is applied to its columns in place, then every z-score and min-max
+    column is scaled by a single fused affine update.
+
+    Parameters
+    ----------
+    x : 1D/2D array, Series or DataFrame
+        Log samples.
+    curves : list, optional
+        Column names (DataFrame) or column indices (array) to use.
+        Defaults to all columns.
+    transforms : str, dict or list, optional
+        Transform per curve, any of "log10", "zscore", "minmax" or None.
+        A string applies the same transform to every curve.
+
+    Returns
+    -------
+    values : 2D array
+        Feature array, sample * curve.
+    curves : list
+        Name or index of every feature column.
+    """
+    if curves is None:
+        values = np.array(x, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        curves = list(getattr(x, "columns", range(values.shape[1])))
+    elif hasattr(x, "columns"):
+        curves = list(curves)
+        values = x[curves].to_numpy(dtype=np.float64, copy=True)
+    else:
+        curves = list(curves)
+        values = np.asarray(x, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        values = values[:, curves]
+
+    kinds = _get_per_curve(transforms, curves, "transforms")
+    for kind in kinds:
+        if kind is not None and kind not in TRANSFORMS:
+            raise ValueError("transforms must be any of: 'log10', 'zscore', 'minmax' or None")
+    kinds = np.array([str(kind) for kind in kinds])
+    if (kinds == "None").all():
+        return values, curves
+
+    log_cols = np.flatnonzero(kinds == "log10")
+    if log_cols.size:
+        logged = values[:, log_cols]
+        # non-positive readings have no logarithm; treat them as missing
+        logged[logged <= 0] = np.nan
+        values[:, log_cols] = np.log10(logged)
+
+    zscore = kinds == "zscore"
+    minmax = kinds == "minmax"
+    if zscore.any() or minmax.any():
+        offset = np.zeros(values.shape[1])
+        scale = np.ones(values.shape[1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if zscore.any():
+                offset[zscore] = np.nanmean(values[:, zscore], axis=0)
+                scale[zscore] = 1 / np.nanstd(values[:, zscore], axis=0)
+            if minmax.any():
+                low = np.nanmin(values[:, minmax], axis=0)
+                offset[minmax] = low
+                scale[minmax] = 1 / (np.nanmax(values[:, minmax], axis=0) - low)
+        # constant curves carry no shape information; leave them centred
+        scale[~np.isfinite(scale)] = 1.0
+        values -= offset
+        values *= scale
+    return values, curves
+
+
+def _get_weights(weights, curves):
+    """Per-curve weights as a 1D array, or None when all curves weigh the same."""
+    if weights is None:
+        return None
+    weights = np.array(_get_per_curve(weights, curves, "weights"), dtype=np.float64)
+    if (weights < 0).any():
+        raise ValueError("weights must NOT contain negative values")
+    return weights
+
+
+def _get_per_curve(option, curves, name):
+    """Expand a scalar, dict or sequence option into one value per curve."""
+    if option is None or isinstance(option, (str, int, float)):
+        return [option] * len(curves)
+    if isinstance(option, dict):
+        return [option.get(curve) if name == "transforms" else option.get(curve, 1.0)
+            for curve in curves]
+    option = list(option)
+    if len(option) != len(curves):
+        raise ValueError("{0} must have one entry per curve".format(name))
+    return option
+
+
+class FeatureCost():
+    """
+    Pair-wise cost of two logs computed from their samples cell by cell.
+
+    The cost of cell (i, j) is the weighted distance between ``x[i]`` and
+    ``y[j]``, evaluated inside the compiled kernel whenever the step pattern
+    reads it, so no pair-wise matrix is ever stored and memory stays linear in
+    the log lengths. ``dtw_from_distance_matrix`` and ``dtw_low`` accept this
+    object in place of a cost matrix.
+
+    Attributes
+    ----------
+        x, y : 2d array
+            Query and reference samples (sample * feature).
+        metric : str
+            "euclidean", "sqeuclidean" or "cityblock".
+        w : 1d array
+            Weight of every feature.
+        shape : tuple
+            (len_x, len_y) of the implied cost matrix.
+    """
+
+    def __init__(self, x, y, metric="euclidean", w=None):
+        """
+        Constructs all the necessary attributes for the FeatureCost object.
+
+        Parameters
+        ----------
+            x, y : 1d or 2d array
+                Query and reference samples (sample * feature).
+            metric : str
+                "euclidean", "sqeuclidean" or "cityblock", weighted like
+                ``scipy.spatial.distance``.
+            w : 1d array, optional
+                Weight of every feature; all ones by default.
+        """
+        if metric not in _FEATURE_METRICS:
+            raise ValueError("metric must be any of: 'euclidean', 'sqeuclidean', 'cityblock'")
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        if self.x.ndim == 1:
+            self.x = self.x[:, np.newaxis]
+        if self.y.ndim == 1:
+            self.y = self.y[:, np.newaxis]
+        if self.x.shape[1] != self.y.shape[1]:
+            raise ValueError("x and y must have the same number of features")
+        self.metric = metric
+        self.w = np.ones(self.x.shape[1]) if w is None else np.ascontiguousarray(w, dtype=np.float64)
+        if self.w.shape != (self.x.shape[1],) or (self.w < 0).any():
+            raise ValueError("w must hold one non-negative weight per feature")
+        self.shape = (self.x.shape[0], self.y.shape[0])
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.y.nbytes + self.w.nbytes
+
+    @property
+    def code(self):
+        """Metric code of the compiled lookup."""
+        return _FEATURE_METRICS[self.metric]
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""Reusable per-reference state for many interval queries against one well."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas import DataFrame
+from scipy.ndimage import minimum_filter1d, maximum_filter1d
+
+from .DTW import dtw_low, _get_pattern
+from .distance import NoPathError
+from .window import SakoechibaWindow
+from .banded import _banded_cdist, _pattern_ranges
+from .features import _prepare_features, _get_weights
+
+# metrics whose cost of a cell is bounded below by the distance to the envelope box
+_LB_METRICS = ("euclidean", "sqeuclidean", "cityblock")
+# patterns that charge every query sample at least once at weight >= 1
+_LB_PATTERNS = ("symmetric1", "symmetric2", "asymmetric")
+# ... and every reference sample too
+_LB_SYMMETRIC = ("symmetric1", "symmetric2")
+# candidate * sample * curve values held at once while computing lower bounds
+_LB_CHUNK_CELLS = 2**22
+
+
+class ReferenceIndex():
+    """
+    Reference log prepared once for many interval queries.
+
+    Every query interval is compared with every equal-length interval of the
+    reference under a Sakoe-Chiba band. Candidates are ranked by the LB_Keogh
+    lower bound and aligned in that order until the bound exceeds the k-th best
+    distance, so most candidates never reach the dtw kernels. Curve selection,
+    transforms, envelopes, cumulative statistics and windows are computed once
+    and shared by all queries.
+
+    Attributes
+    ----------
+        values : 2d array
+            Prepared reference curves (sample * curve).
+        curves : list
+            Name or index of every curve.
+        depth : 1d array or None
+            Depth of each reference sample.
+
+    Methods
+    -------
+        query(x, k=1, radius=None, stride=1, exclusion=None, return_results=False):
+            Best matching reference intervals of one query interval.
+        query_many(queries, n_jobs=None, **kwargs):
+            ``query`` for many intervals in a thread pool.
+    """
+
+    def __init__(self, reference, dist="euclidean", step_pattern="symmetric2", radius=None,
+        curves=None, transforms=None, weights=None, znorm=False, depth=None):
+        """
+        Constructs all the necessary attributes for the ReferenceIndex object.
+
+        Parameters
+        ----------
+            reference : 1D or 2D array, Series or DataFrame
+                Reference log.
+            dist : str
+                Metric argument of ``scipy.spatial.distance``. Candidates are
+                pruned by lower bound for "euclidean", "sqeuclidean" and "cityblock".
+            step_pattern : str
+                Step pattern. Candidates are pruned by lower bound for
+                "symmetric1", "symmetric2" and "asymmetric".
+            radius : int, optional
+                Sakoe-Chiba window size. Defaults to a tenth of each query's length.
+            curves, transforms, weights :
+                see :func:`dtw` function; applied to the reference once and to
+                every query.
+            znorm : bool
+                Whether or not to z-normalize the query and every candidate
+                interval per curve, so intervals match by shape regardless of
+                offset and scale.
+            depth : 1D array, optional
+                Depth of each reference sample.
+        """
+        self.values, self.curves = _prepare_features(reference, curves, transforms)
+        self._curve_selection = curves
+        self._transforms = transforms
+        self._w = _get_weights(weights, self.curves)
+        self.dist = dist
+        self.step_pattern = step_pattern
+        self.radius = radius
+        self.znorm = znorm
+        self.depth = None if depth is None else np.asarray(depth, dtype=np.float64)
+        if self.depth is not None and self.depth.shape != (self.values.shape[0],):
+            raise ValueError("depth must have one value per reference sample")
+        self._pattern = _get_pattern(step_pattern)
+        self._prune = dist in _LB_METRICS and step_pattern in _LB_PATTERNS
+        self._envelopes = {}
+        self._windows = {}
+        # per-curve running sums, for the mean and deviation of every interval
+        zero = np.zeros((1, self.values.shape[1]))
+        self._cum = np.vstack((zero, np.cumsum(self.values, axis=0)))
+        self._cum_sq = np.vstack((zero, np.cumsum(self.values ** 2, axis=0)))
+        if radius is not None:
+            self._envelope(radius)
+
+    def __repr__(self):
+        rv = "reference index: \n\n"
+        rv += "{0:<20s}{1}\n".format("samples", self.values.shape[0])
+        rv += "{0:<20s}{1}\n".format("curves", len(self.curves))
+        rv += "{0:<20s}{1}\n".format("dist", self.dist)
+        rv += "{0:<20s}{1}".format("step pattern", self.step_pattern)
+        return rv
+
+    def _radius(self, length, radius=None):
+        """Band radius of a query of ``length`` samples."""
+        if radius is not None:
+            return radius
+        return self.radius if self.radius is not None else max(length // 10, 1)
+
+    def _envelope(self, radius):
+        """Running (lower, upper) envelope of the reference over +-radius samples."""
+        if radius not in self._envelopes:
+            size = 2 * radius + 1
+            self._envelopes[radius] = (minimum_filter1d(self.values, size, axis=0, mode="nearest"),
+                maximum_filter1d(self.values, size, axis=0, mode="nearest"))
+        return self._envelopes[radius]
+
+    def _window(self, length, radius):
+        """Band window and the cost cells it reads, for one query length."""
+        key = (length, radius)
+        if key not in self._windows:
+            window = SakoechibaWindow(length, length, radius)
+            self._windows[key] = (window, _pattern_ranges(window.ranges, self._pattern.array, length))
+        return self._windows[key]
+
+    def _candidate(self, start, length, stats):
+        """Reference interval starting at ``start``, z-normalized if requested."""
+        values = self.values[start:start + length]
+        if self.znorm:
+            mean, scale = stats
+            values = (values - mean[start]) * scale[start]
+        return values
+
+    def _lower_bounds(self, x, starts, radius, stats):
+        """LB_Keogh of every candidate interval."""
+        length = x.shape[0]
+        # envelope around the reference, against the query
+        lower, upper = self._envelope(radius)
+        lower = sliding_window_view(lower, length, axis=0)
+        upper = sliding_window_view(upper, length, axis=0)
+        # envelope around the query, against each normalized candidate; a bound
+        # only for patterns that charge every candidate sample, but tighter
+        symmetric = self.znorm and self.step_pattern in _LB_SYMMETRIC
+        if symmetric:
+            x_lower = minimum_filter1d(x, 2 * radius + 1, axis=0, mode="nearest").T
+            x_upper = maximum_filter1d(x, 2 * radius + 1, axis=0, mode="nearest").T
+            values = sliding_window_view(self.values, length, axis=0)
+        w = np.ones(x.shape[1]) if self._w is None else self._w
+        bounds = np.empty(starts.size)
+        chunk = max(_LB_CHUNK_CELLS // x.size, 1)
+        for c0 in range(0, starts.size, chunk):
+            idx = starts[c0:c0 + chunk]
+            # (candidate, curve, sample) windows
+            low, up = lower[idx], upper[idx]
+            if self.znorm:
+                # z-normalizing is increasing per curve, so it maps the envelope
+                # onto an envelope of the normalized candidate; the reference
+                # envelope reaches past the candidate's ends, which only loosens it
+                mean, scale = stats
+                mean, scale = mean[idx, :, np.newaxis], scale[idx, :, np.newaxis]
+                low, up = (low - mean) * scale, (up - mean) * scale
+            excess = np.maximum(np.maximum(x.T - up, low - x.T), 0.0)
+            bound = _box_cost(excess, w, self.dist)
+            if symmetric:
+                cand = (values[idx] - mean) * scale
+                excess = np.maximum(np.maximum(cand - x_upper, x_lower - cand), 0.0)
+                bound = np.fmax(bound, _box_cost(excess, w, self.dist))
+            bounds[c0:c0 + chunk] = bound
+        # missing samples give no bound
+        return np.nan_to_num(bounds, nan=0.0)
+
+    def _stats(self, length):
+        """Mean and inverse deviation of every reference interval of ``length`` samples."""
+        total = self._cum[length:] - self._cum[:-length]
+        total_sq = self._cum_sq[length:] - self._cum_sq[:-length]
+        mean = total / length
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = 1 / np.sqrt(np.maximum(total_sq / length - mean * mean, 0.0))
+        # constant intervals carry no shape information; leave them centred
+        scale[~np.isfinite(scale)] = 1.0
+        return mean, scale
+
+    def _align(self, x, start, radius, stats, dist_only=True):
+        """Align the query with one candidate interval."""
+        length = x.shape[0]
+        window, ranges = self._window(length, radius)
+        X = _banded_cdist(x, self._candidate(start, length, stats), ranges, metric=self.dist, w=self._w)
+        return dtw_low(X, window, self._pattern, dist_only=dist_only)
+
+    def query(self, x, k=1, radius=None, stride=1, exclusion=None, return_results=False):
+        """
+        Best matching reference intervals of one query interval.
+
+        Parameters
+        ----------
+        x : 1D or 2D array, Series or DataFrame
+            Query interval, with the index's curves.
+        k : int
+            Number of matches.
+        radius : int, optional
+            Sakoe-Chiba window size; overrides the index's radius.
+        stride : int
+            Step between candidate interval starts.
+        exclusion : int, optional
+            Matches starting closer than this to a better one are skipped.
+            Defaults to half the query length.
+        return_results : bool
+            Whether or not to add a "result" column holding the result.DtwResult
+            of every match, with paths in interval-local indices.
+
+        Returns
+        -------
+        DataFrame
+            Best match first: "start" and "stop" reference sample of the match,
+            "top" and "base" depth if the index has a depth axis, "distance",
+            "normalized_distance" and "lower_bound".
+        """
+        x, _ = _prepare_features(x, self._curve_selection, self._transforms)
+        length = x.shape[0]
+        if length > self.values.shape[0]:
+            raise ValueError("query is longer than the reference")
+        radius = self._radius(length, radius)
+        exclusion = length // 2 if exclusion is None else int(exclusion)
+        stats = None
+        if self.znorm:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                x = (x - np.nanmean(x, axis=0)) / np.nanstd(x, axis=0)
+            x[~np.isfinite(x)] = 0.0
+            stats = self._stats(length)
+
+        starts = np.arange(0, self.values.shape[0] - length + 1, stride)
+        bounds = self._lower_bounds(x, starts, radius, stats)
+        order = np.argsort(bounds, kind="stable")
+
+        evaluated = []
+        threshold = np.inf
+        for idx in order:
+            if self._prune and bounds[idx] >= threshold:
+                # no remaining candidate can beat the k-th match
+                break
+            try:
+                result = self._align(x, starts[idx], radius, stats)
+            except NoPathError:
+                # no path within the band
+                continue
+            distance = result.distance
+            evaluated.append((distance, starts[idx], bounds[idx], result.normalized_distance))
+            if self._prune and distance < threshold:
+                hits = _select_hits(evaluated, k, exclusion)
+                if len(hits) == k:
+                    threshold = hits[-1][0]
+
+        hits = _select_hits(evaluated, k, exclusion)
+        matches = DataFrame({"start": [hit[1] for hit in hits],
+            "stop": [hit[1] + length for hit in hits]})
+        if self.depth is not None:
+            matches["top"] = self.depth[matches["start"].to_numpy()]
+            matches["base"] = self.depth[matches["stop"].to_numpy() - 1]
+        matches["distance"] = [hit[0] for hit in hits]
+        matches["normalized_distance"] = [hit[3] for hit in hits]
+        matches["lower_bound"] = [hit[2] for hit in hits]
+        if return_results:
+            results = []
+            for hit in hits:
+                result = self._align(x, hit[1], radius, stats, dist_only=False)
+                if self.depth is not None:
+                    result.reference_depth = self.depth[hit[1]:hit[1] + length]
+                results.append(result)
+            matches["result"] = results
+        return matches
+
+    def query_many(self, queries, n_jobs=None, **kwargs):
+        """
+        ``query`` for many intervals in a thread pool.
+
+        Parameters
+        ----------
+        queries : list
+            Query intervals.
+        n_jobs : int, optional
+            Number of worker threads. Defaults to the executor default; 1 runs serially.
+        **kwargs :
+            Passed to :meth:`query`.
+
+        Returns
+        -------
+        list of DataFrame
+            Matches of every query, in order.
+        """
+        # shared state for all threads; envelopes and windows are built up
+        # front, so the threads only read the caches
+        queries = list(queries)
+        for length in {len(x) for x in queries}:
+            radius = self._radius(length, kwargs.get("radius"))
+            self._envelope(radius)
+            self._window(length, radius)
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(lambda x: self.query(x, **kwargs), queries))
+
+
+def _box_cost(excess, w, dist):
+    """Summed cost of the (candidate, curve, sample) distances to an envelope box."""
+    if dist == "cityblock":
+        cost = np.einsum("k,ckn->cn", w, excess)
+    else:
+        cost = np.einsum("k,ckn->cn", w, excess * excess)
+        if dist == "euclidean":
+            cost = np.sqrt(cost)
+    return cost.sum(axis=1)
+
+
+def _select_hits(evaluated, k, exclusion):
+    """Best ``k`` (distance, start, bound, normalized) entries whose starts are ``exclusion`` apart."""
+    hits = []
+    for entry in sorted(evaluated, key=lambda entry: entry[0]):
+        if all(abs(entry[1] - hit[1]) >= max(exclusion, 1) for hit in hits):
+            hits.append(entry)
+            if len(hits) == k:
+                break
+    return hits
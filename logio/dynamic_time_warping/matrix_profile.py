@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""AB-join matrix profile: most similar interval of one log for every interval of another."""
+
+import numpy as np
+from numba import jit
+from pandas import DataFrame
+from scipy.signal import fftconvolve
+
+from .DTW import dtw
+
+
+class MatrixProfile():
+    """
+    AB-join matrix profile of two logs.
+
+    For every interval of ``window`` samples of log A, the z-normalized Euclidean
+    distance to its most similar interval of log B, and where that interval starts.
+
+    Attributes
+    ----------
+        profile : 1d array
+            Distance from every A interval to its nearest B interval;
+            inf for intervals holding missing samples.
+        index : 1d array
+            Start of the nearest B interval, -1 where there is none.
+        window : int
+            Interval length in samples.
+
+    Methods
+    -------
+        top_hits(k=10, exclusion=None):
+            Best matching interval pairs.
+        align_top_hits(k=5, exclusion=None, **kwargs):
+            Run dtw on the best matching interval pairs.
+    """
+
+    def __init__(self, profile, index, window, a, b):
+        """
+        Constructs all the necessary attributes for the MatrixProfile object.
+
+        Parameters
+        ----------
+            profile : 1d array
+                Distance from every A interval to its nearest B interval.
+            index : 1d array
+                Start of the nearest B interval.
+            window : int
+                Interval length in samples.
+            a, b : 1d array
+                The joined logs.
+        """
+        self.profile = profile
+        self.index = index
+        self.window = window
+        self._a = a
+        self._b = b
+
+    def top_hits(self, k=10, exclusion=None):
+        """
+        Best matching interval pairs.
+
+        Parameters
+        ----------
+        k : int
+            Number of pairs.
+        exclusion : int, optional
+            A intervals starting closer than this to an already reported one are
+            skipped, so a single match is not reported at every sample shift.
+            Defaults to half the window.
+
+        Returns
+        -------
+        DataFrame
+            Columns "a_start", "b_start" and "distance", best pair first.
+        """
+        exclusion = self.window // 2 if exclusion is None else int(exclusion)
+        order = np.argsort(self.profile, kind="stable")
+        order = order[np.isfinite(self.profile[order])]
+        taken = np.zeros(self.profile.size, dtype=bool)
+        hits = []
+        for start in order:
+            if taken[start]:
+                continue
+            hits.append(start)
+            if len(hits) == k:
+                break
+            taken[max(start - exclusion, 0):start + exclusion + 1] = True
+        hits = np.array(hits, dtype=np.int64)
+        return DataFrame({"a_start": hits, "b_start": self.index[hits],
+            "distance": self.profile[hits]})
+
+    def align_top_hits(self, k=5, exclusion=None, **kwargs):
+        """
+        Run dtw on the best matching interval pairs.
+
+        Parameters
+        ----------
+        k, exclusion :
+            see :meth:`top_hits`.
+        **kwargs :
+            Passed to :func:`dtw`. ``transforms`` defaults to "zscore", matching
+            the z-normalized distance of the profile.
+
+        Returns
+        -------
+        list of result.DtwResult
+            One result per pair, in the order of :meth:`top_hits`. Paths are in
+            interval-local sample indices.
+        """
+        hits = self.top_hits(k, exclusion)
+        m = self.window
+        kwargs.setdefault("transforms", "zscore")
+        return [dtw(self._a[a_start:a_start + m], self._b[b_start:b_start + m], **kwargs)
+            for a_start, b_start in zip(hits["a_start"], hits["b_start"])]
+
+    def __repr__(self):
+        rv = "matrix profile: \n\n"
+        rv += "{0:<20s}{1}\n".format("window", self.window)
+        rv += "{0:<20s}{1}\n".format("intervals", self.profile.size)
+        finite = self.profile[np.isfinite(self.profile)]
+        if finite.size:
+            rv += "{0:<20s}{1:.6f}".format("best distance", finite.min())
+        return rv
+
+
+def matrix_profile(a, b, window):
+    """
+    Compute the AB-join matrix profile of two logs.
+
+    Details
+    ----------
+    Sliding dot products of the first interval of each log against the other are
+    obtained by FFT; all others follow by the STOMP diagonal update, so the join
+    costs O(N * M) time and O(N + M) memory. Intervals holding missing samples
+    are skipped. Candidate intervals can then be aligned with dtw, see
+    :meth:`MatrixProfile.align_top_hits`.
+
+    Parameters
+    ----------
+    a : 1D array or Series
+        Log A, e.g. the query well curve.
+
+    b : 1D array or Series
+        Log B.
+
+    window : int
+        Interval length in samples.
+
+    Returns
+    -------
+    MatrixProfile
+        Result obj.
+
+    """
+    a = np.array(a, dtype=np.float64).squeeze()
+    b = np.array(b, dtype=np.float64).squeeze()
+    if a.ndim != 1 or b.ndim != 1:
+        raise ValueError("matrix profile requires single curve logs")
+    window = int(window)
+    if window < 2 or window > min(a.size, b.size):
+        raise ValueError("window must be at least 2 and no longer than either log")
+    mu_a, sig_a, valid_a, a_filled = _rolling_stats(a, window)
+    mu_b, sig_b, valid_b, b_filled = _rolling_stats(b, window)
+    # dot products of A's first interval with every B interval, and vice versa
+    qt_row = fftconvolve(b_filled, a_filled[window - 1::-1], mode="valid")
+    qt_col = fftconvolve(a_filled, b_filled[window - 1::-1], mode="valid")
+    profile, index = _ab_join_jit(a_filled, b_filled, window, qt_row, qt_col,
+        mu_a, sig_a, valid_a, mu_b, sig_b, valid_b)
+    return MatrixProfile(profile, index, window, a, b)
+
+
+def _rolling_stats(x, window):
+    """Mean, standard deviation and validity of every interval, and the centred, NaN-free log."""
+    missing = np.isnan(x)
+    # centring leaves z-normalized distances unchanged and keeps the sums well conditioned
+    x = np.where(missing, 0.0, x - np.nanmean(x))
+    cum = np.concatenate(([0.0], np.cumsum(x)))
+    cum_sq = np.concatenate(([0.0], np.cumsum(x * x)))
+    cum_missing = np.concatenate(([0], np.cumsum(missing)))
+    mu = (cum[window:] - cum[:-window]) / window
+    var = (cum_sq[window:] - cum_sq[:-window]) / window - mu * mu
+    sig = np.sqrt(np.maximum(var, 0.0))
+    valid = (cum_missing[window:] - cum_missing[:-window]) == 0
+    return mu, sig, valid, x
+
+
+@jit(nopython=True, nogil=True)
+def _ab_join_jit(a, b, m, qt_row, qt_col, mu_a, sig_a, valid_a, mu_b, sig_b, valid_b):
+    """STOMP AB-join by numba.jit; qt holds one row of sliding dot products at a time."""
+    num_a = mu_a.shape[0]
+    num_b = mu_b.shape[0]
+    profile = np.full(num_a, np.inf)
+    index = np.full(num_a, -1, dtype=np.int64)
+    qt = qt_row.copy()
+    # intervals flatter than this are treated as constant
+    eps = 1e-8
+    for i in range(num_a):
+        if i > 0:
+            # slide both intervals one sample along the diagonal
+            for j in range(num_b - 1, 0, -1):
+                qt[j] = qt[j - 1] - a[i - 1] * b[j - 1] + a[i + m - 1] * b[j + m - 1]
+            qt[0] = qt_col[i]
+        if not valid_a[i]:
+            continue
+        for j in range(num_b):
+            if not valid_b[j]:
+                continue
+            if sig_a[i] < eps and sig_b[j] < eps:
+                dist = 0.0
+            elif sig_a[i] < eps or sig_b[j] < eps:
+                dist = np.sqrt(m)
+            else:
+                corr = (qt[j] - m * mu_a[i] * mu_b[j]) / (m * sig_a[i] * sig_b[j])
+                corr = min(max(corr, -1.0), 1.0)
+                dist = np.sqrt(2 * m * (1 - corr))
+            if dist < profile[i]:
+                profile[i] = dist
+                index[i] = j
+    return profile, index
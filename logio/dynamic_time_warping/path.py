@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Run-length encoded warping paths."""
+
+import numpy as np
+
+# longest run held by one uint8 length
+_MAX_RUN = np.iinfo(np.uint8).max
+
+
+class RLEPath():
+    """
+    Warping path stored as runs of identical steps.
+
+    A path of L cells takes 16 * L bytes as an int64 (L, 2) array; here each run
+    of repeated steps takes two bytes (step code and length), so typical dtw
+    paths shrink 10x or more, and smooth ones far more. The object behaves like
+    the (L, 2) path array where ``DtwResult`` needs one: ``path[:, 0]`` decodes a
+    single column, and ``np.asarray(path)`` the whole path.
+
+    Attributes
+    ----------
+        start : 1d array
+            (query, reference) index of the first cell.
+        steps : 2d array
+            Distinct (query, reference) steps of the path, shape (S, 2).
+        codes : 1d uint8 array
+            Step of every run, as a row of ``steps``.
+        lengths : 1d uint8 array
+            Number of steps in every run; longer runs are split.
+        shape : tuple
+            (L, 2) shape of the decoded path.
+
+    Methods
+    -------
+        from_path(path):
+            Encode a path array.
+        to_array():
+            Decode to an int64 (L, 2) array.
+        column(k):
+            Decode the query (0) or reference (1) column only.
+    """
+
+    def __init__(self, start, steps, codes, lengths):
+        """
+        Constructs all the necessary attributes for the RLEPath object.
+
+        Parameters
+        ----------
+            start : 1d array
+                (query, reference) index of the first cell.
+            steps : 2d array
+                Distinct (query, reference) steps, shape (S, 2).
+            codes : 1d array
+                Step of every run, as a row of ``steps``.
+            lengths : 1d array
+                Number of steps in every run, at most 255.
+        """
+        self.start = np.asarray(start, dtype=np.int64).reshape(2)
+        self.steps = np.asarray(steps, dtype=np.int64).reshape(-1, 2)
+        self.codes = np.asarray(codes, dtype=np.uint8)
+        self.lengths = np.asarray(lengths, dtype=np.uint8)
+        if self.codes.shape != self.lengths.shape:
+            raise ValueError("codes and lengths must have one value per run")
+        if self.codes.size and self.codes.max() >= self.steps.shape[0]:
+            raise ValueError("codes must index steps")
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        Encode a path array.
+
+        Parameters
+        ----------
+        path : 2D array
+            (L, 2) path, e.g. ``DtwResult.path``.
+
+        Returns
+        -------
+        RLEPath
+        """
+        path = np.asarray(path, dtype=np.int64)
+        if path.ndim != 2 or path.shape[1] != 2 or path.shape[0] == 0:
+            raise ValueError("path must be a non-empty (L, 2) array")
+        deltas = np.diff(path, axis=0)
+        if deltas.shape[0] == 0:
+            return cls(path[0], np.empty((0, 2)), [], [])
+        steps, step_idx = np.unique(deltas, axis=0, return_inverse=True)
+        if steps.shape[0] > _MAX_RUN + 1:
+            raise ValueError("path has more than 256 distinct steps")
+        step_idx = step_idx.ravel()
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(step_idx)) + 1, [step_idx.size]))
+        run_codes = step_idx[bounds[:-1]]
+        run_lengths = np.diff(bounds)
+        # split runs that do not fit one length byte
+        pieces = -(-run_lengths // _MAX_RUN)
+        codes = np.repeat(run_codes, pieces)
+        lengths = np.full(codes.size, _MAX_RUN, dtype=np.int64)
+        lengths[np.cumsum(pieces) - 1] = run_lengths - _MAX_RUN * (pieces - 1)
+        return cls(path[0], steps, codes, lengths)
+
+    def __len__(self):
+        return 1 + int(self.lengths.sum(dtype=np.int64))
+
+    @property
+    def shape(self):
+        return (len(self), 2)
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def nbytes(self):
+        return self.start.nbytes + self.steps.nbytes + self.codes.nbytes + self.lengths.nbytes
+
+    def column(self, k):
+        """
+        Decode one column of the path.
+
+        Parameters
+        ----------
+        k : int
+            0 for query indices, 1 for reference indices.
+
+        Returns
+        -------
+        1D int64 array
+        """
+        deltas = np.repeat(self.steps[self.codes, k], self.lengths)
+        column = np.empty(deltas.size + 1, dtype=np.int64)
+        column[0] = self.start[k]
+        np.cumsum(deltas, out=column[1:])
+        column[1:] += self.start[k]
+        return column
+
+    def to_array(self):
+        """Decode to an int64 (L, 2) array."""
+        return np.column_stack((self.column(0), self.column(1)))
+
+    def __array__(self, dtype=None, copy=None):
+        path = self.to_array()
+        return path if dtype is None else path.astype(dtype)
+
+    def __getitem__(self, key):
+        # path[:, k] decodes one column only
+        if isinstance(key, tuple) and len(key) == 2 and key[0] == slice(None) \
+                and isinstance(key[1], (int, np.integer)):
+            return self.column(int(key[1]) % 2)
+        return self.to_array()[key]
+
+    def __eq__(self, other):
+        if not isinstance(other, RLEPath):
+            return NotImplemented
+        return np.array_equal(self.to_array(), other.to_array())
+
+    def __repr__(self):
+        return "RLEPath(length={0}, runs={1}, nbytes={2})".format(len(self), self.codes.size, self.nbytes)
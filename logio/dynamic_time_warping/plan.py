@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Memory estimates of the dtw strategies and the choice among them."""
+
+import re
+
+from .cost import _FEATURE_METRICS
+from .backtrack import _checkpoint_levels, _NUM_SPLITS
+
+_UNITS = {"": 1, "b": 1, "kb": 10**3, "mb": 10**6, "gb": 10**9, "tb": 10**12,
+    "kib": 2**10, "mib": 2**20, "gib": 2**30, "tib": 2**40}
+
+
+class DtwPlan():
+    """
+    Memory plan of a dtw run.
+
+    Estimated bytes held at once by every strategy that applies to the run, and
+    the one chosen for the given budget:
+
+    * "dense": full cost matrix and full cumsum matrix.
+    * "banded": costs of the cells the step pattern reads inside the window,
+      full cumsum matrix.
+    * "traceback": banded costs, rolling cumsum rows and one byte per window cell.
+    * "linear": costs computed cell by cell from the samples and rolling cumsum
+      rows, plus copies of them saved at block starts; the traceback of one
+      block at a time is recomputed while the path is walked.
+    * "out-of-core": costs computed cell by cell from the samples, rolling
+      cumsum rows and one byte per window cell (len_x * len_y without a window)
+      in a memory-mapped temporary file.
+
+    Every strategy gives the same distance and path.
+
+    Attributes
+    ----------
+        strategy : str
+            Chosen strategy.
+        estimates : dict
+            Estimated peak bytes of every applicable strategy, in order of preference.
+        budget : int
+            Memory budget in bytes.
+        disk_bytes : int
+            Size of the temporary file of the "out-of-core" strategy.
+    """
+
+    def __init__(self, strategy, estimates, budget, disk_bytes=0):
+        """
+        Constructs all the necessary attributes for the DtwPlan object.
+
+        Parameters
+        ----------
+            strategy : str
+                Chosen strategy.
+            estimates : dict
+                Estimated peak bytes of every applicable strategy.
+            budget : int
+                Memory budget in bytes.
+            disk_bytes : int
+                Size of the temporary file of the "out-of-core" strategy.
+        """
+        self.strategy = strategy
+        self.estimates = estimates
+        self.budget = budget
+        self.disk_bytes = disk_bytes
+
+    @property
+    def estimate(self):
+        """Estimated peak bytes of the chosen strategy."""
+        return self.estimates[self.strategy]
+
+    def __repr__(self):
+        rv = "dtw plan: \n\n"
+        for name, nbytes in self.estimates.items():
+            rv += "{0:<20s}{1:.3f} MB".format(name, nbytes / 1e6)
+            if name == self.strategy:
+                rv += "  (chosen)"
+            rv += "\n"
+        if self.strategy == "out-of-core":
+            rv += "{0:<20s}{1:.3f} MB\n".format("on disk", self.disk_bytes / 1e6)
+        rv += "{0:<20s}{1:.3f} MB".format("budget", self.budget / 1e6)
+        return rv
+
+
+def _get_budget(memory_budget):
+    """Map the ``memory_budget`` argument (bytes, or a string such as "2GB" or "512 MiB") to bytes."""
+    if isinstance(memory_budget, str):
+        match = re.fullmatch(r"\s*([0-9.]+)\s*([a-zA-Z]*)\s*", memory_budget)
+        if match is None or match.group(2).lower() not in _UNITS:
+            raise ValueError("memory_budget must be a number of bytes or a size such as '2GB'")
+        memory_budget = float(match.group(1)) * _UNITS[match.group(2).lower()]
+    if memory_budget <= 0:
+        raise ValueError("memory_budget must be positive")
+    return int(memory_budget)
+
+
+def _estimate(len_x, len_y, num_features, window, pattern_cells, num_rolling, dist, dist_only,
+    open_begin):
+    """
+    Estimated peak bytes of every strategy that applies.
+
+    Parameters
+    ----------
+    len_x, len_y : int
+        Log lengths.
+    num_features : int
+        Number of curves.
+    window : window.BaseWindow
+        Window of the run.
+    pattern_cells : int or None
+        Cells the step pattern reads inside the window; None if the window has
+        no row ranges.
+    num_rolling : int
+        Cumsum rows the step pattern reaches back.
+    dist : str or callable
+        Local cost metric.
+    dist_only, open_begin : bool
+        see :func:`dtw` function.
+
+    Returns
+    -------
+    estimates : dict
+        Bytes per strategy, in order of preference.
+    disk_bytes : int
+        Size of the temporary file of the "out-of-core" strategy.
+    """
+    cells = window.num_cells
+    num_rows = len_x + int(open_begin)
+    path = 0 if dist_only else (len_x + len_y) * 16
+    traceback = 0 if dist_only else cells
+    estimates = {}
+    if window.ranges is None:
+        # cell-list kernel: dense cost, window matrix and cell list
+        estimates["dense"] = len_x * len_y * 9 + cells * 16 \
+            + num_rows * len_y * 8 * (1 + int(open_begin)) + path
+        return estimates, 0
+    ranges = len_x * 24
+    estimates["dense"] = len_x * len_y * 8 + num_rows * len_y * 8 + ranges + path
+    if type(dist) != str:
+        # a callable metric fills a dense matrix, cell by cell from the window list
+        estimates["dense"] += cells * 16
+        return estimates, 0
+    banded = pattern_cells * 8 + ranges * 2
+    if 2 * pattern_cells < len_x * len_y:
+        # as ``dtw`` does without a budget: narrow windows go banded first
+        estimates = {"banded": banded + num_rows * len_y * 8 + path, **estimates}
+    else:
+        estimates["banded"] = banded + num_rows * len_y * 8 + path
+    rolling = min(num_rolling, num_rows) * len_y * 8
+    estimates["traceback"] = banded + rolling + traceback + path
+    if dist in _FEATURE_METRICS:
+        # a float copy of both logs
+        samples = (len_x + len_y) * num_features * 8
+        estimates["linear"] = samples + ranges + rolling + path
+        if not dist_only:
+            # as dtw_low: checkpoints, their working copy and one block's traceback
+            base_cells = rolling
+            levels = _checkpoint_levels(cells, base_cells)
+            estimates["linear"] += rolling * (levels * (_NUM_SPLITS - 1) + 1) \
+                + min(cells, base_cells) + len_x * 8
+        if not dist_only:
+            estimates["out-of-core"] = samples + ranges + rolling + path
+            return estimates, cells
+    return estimates, 0
+
+
+def _plan(budget, estimates, disk_bytes=0, traceback=False, disk_free=None):
+    """
+    Choose the first strategy that fits the budget.
+
+    Parameters
+    ----------
+    budget : int
+        Memory budget in bytes.
+    estimates : dict
+        Bytes per strategy, see ``_estimate``.
+    disk_bytes : int
+        Size of the temporary file of the "out-of-core" strategy.
+    traceback : bool
+        Whether traceback mode was requested; strategies keeping the full
+        cumsum matrix are then left out.
+    disk_free : int, optional
+        Free bytes of the temporary directory; "out-of-core" is left out if its
+        file would not fit.
+
+    Returns
+    -------
+    DtwPlan
+
+    Raises
+    ------
+    MemoryError
+        No strategy fits; the message lists every estimate.
+    """
+    candidates = {name: nbytes for name, nbytes in estimates.items()
+        if not (traceback and name in ("dense", "banded"))
+        and not (name == "out-of-core" and disk_free is not None and disk_bytes > disk_free)}
+    for name, nbytes in candidates.items():
+        if nbytes <= budget:
+            return DtwPlan(name, estimates, budget, disk_bytes if name == "out-of-core" else 0)
+    needs = ", ".join("{0} {1:.3f} MB".format(name, nbytes / 1e6) for name, nbytes in candidates.items())
+    raise MemoryError("no dtw strategy fits the memory budget of {0:.3f} MB; estimates: {1}. "
+        "Narrow the window, use reduce or dist_only, or raise the budget".format(budget / 1e6, needs))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Per-stage timing and counters of a dtw run."""
+
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class DtwProfile():
+    """
+    Wall time per stage, matrix sizes and memory estimates of a dtw run.
+
+    Attributes
+    ----------
+        timings : dict
+            Wall time (seconds) per stage, in execution order:
+            "distance", "window", "validation", "cumsum", "alignment_distance", "backtrack".
+        counters : dict
+            Sizes recorded during the run, e.g. "len_x", "len_y", "window_cells",
+            "matrix_cells", "path_length".
+        compiled : dict
+            Whether a jit kernel was compiled during a stage. The time of a stage
+            that compiled includes the compilation.
+        allocations : dict
+            Estimated bytes allocated per array ("cost_matrix", "cumsum_matrix", ...).
+
+    Methods
+    -------
+        stage(name, kernel=None):
+            Context manager timing a stage.
+        count(name, value):
+            Record a counter.
+        allocate(name, nbytes):
+            Record an allocation estimate.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self.compiled = {}
+        self.allocations = {}
+
+    @contextmanager
+    def stage(self, name, kernel=None):
+        """
+        Time a stage.
+
+        Parameters
+        ----------
+        name : str
+            Stage name.
+        kernel : numba dispatcher, optional
+            Kernel called within the stage; compilation is detected from its signatures.
+        """
+        num_signatures = len(kernel.signatures) if kernel is not None else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+            if kernel is not None:
+                self.compiled[name] = len(kernel.signatures) > num_signatures
+
+    def count(self, name, value):
+        """Record a counter."""
+        self.counters[name] = value
+
+    def allocate(self, name, nbytes):
+        """Record an allocation estimate in bytes."""
+        self.allocations[name] = int(nbytes)
+
+    @property
+    def total_time(self):
+        """Sum of all stage timings."""
+        return sum(self.timings.values())
+
+    @property
+    def peak_bytes(self):
+        """Estimated peak allocation: all recorded arrays alive at once."""
+        return sum(self.allocations.values())
+
+    def __repr__(self):
+        rv = "dtw profile: \n\n"
+        for name, sec in self.timings.items():
+            rv += "{0:<20s}{1:10.6f} s".format(name, sec)
+            if self.compiled.get(name):
+                rv += "  (compiled)"
+            rv += "\n"
+        rv += "{0:<20s}{1:10.6f} s\n\n".format("total", self.total_time)
+        for name, value in self.counters.items():
+            rv += "{0:<20s}{1}\n".format(name, value)
+        rv += "\n"
+        for name, nbytes in self.allocations.items():
+            rv += "{0:<20s}{1:.3f} MB\n".format(name, nbytes / 1e6)
+        rv += "{0:<20s}{1:.3f} MB".format("peak estimate", self.peak_bytes / 1e6)
+        return rv
+
+
+class _NoProfile():
+    """Profile stand-in used when profiling is disabled; every call is a no-op."""
+
+    enabled = False
+
+    def stage(self, name, kernel=None):
+        return nullcontext()
+
+    def count(self, name, value):
+        pass
+
+    def allocate(self, name, nbytes):
+        pass
+
+
+_NO_PROFILE = _NoProfile()
+
+
+def _get_profile(profile):
+    """Map the ``profile`` argument (bool or DtwProfile) to a profile object."""
+    if isinstance(profile, DtwProfile):
+        return profile
+    return DtwProfile() if profile else _NO_PROFILE
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Progress reporting and cooperative cancellation of long dtw runs."""
+
+import threading
+import time
+
+import numpy as np
+
+# window cells per kernel call when running in chunks; about 0.1 s each
+_CHUNK_CELLS = 2**22
+
+
+class DtwCancelled(Exception):
+    """Raised by a dtw run whose cancel token was set."""
+
+
+class CancelToken(threading.Event):
+    """
+    Flag to stop a running alignment from another thread.
+
+    The cumsum kernel runs in chunks of rows while a token is given, and the
+    token is checked before every chunk; the kernels release the GIL, so any
+    thread (or the progress callback) can cancel. A ``threading.Event`` works
+    the same way.
+
+    Methods
+    -------
+        cancel():
+            Request cancellation.
+        cancelled:
+            Whether cancellation was requested.
+    """
+
+    def cancel(self):
+        """Request cancellation."""
+        self.set()
+
+    @property
+    def cancelled(self):
+        return self.is_set()
+
+
+def _check_cancel(cancel):
+    """Raise DtwCancelled if the token is set."""
+    if cancel is not None and cancel.is_set():
+        raise DtwCancelled("dtw run cancelled")
+
+
+def _run_in_chunks(fill, w_offsets, progress=None, cancel=None, chunk_cells=_CHUNK_CELLS):
+    """
+    Fill all window rows in chunks of about ``chunk_cells`` cells.
+
+    Parameters
+    ----------
+    fill : callable
+        fill(row_start, row_stop) computes window rows [row_start, row_stop).
+    w_offsets : 1D array
+        Position of the first cell of every row, total cell count last.
+    progress : callable, optional
+        Called after every chunk as progress(rows_done, total_rows, eta), eta
+        being the estimated seconds left from the cell rate so far. The rate is
+        timed from the end of the first chunk, which includes compiling the
+        kernel, so eta is NaN after it unless the run is done; the last call
+        reports all rows and an eta of 0.
+    cancel : CancelToken or threading.Event, optional
+        Checked before every chunk.
+    chunk_cells : int
+        Window cells per chunk; a chunk holds at least one row.
+    """
+    num_rows = w_offsets.size - 1
+    total_cells = int(w_offsets[-1])
+    start = None
+    row = 0
+    while row < num_rows:
+        _check_cancel(cancel)
+        stop = int(np.searchsorted(w_offsets, w_offsets[row] + chunk_cells, side="right")) - 1
+        stop = min(max(stop, row + 1), num_rows)
+        fill(row, stop)
+        row = stop
+        done = int(w_offsets[row])
+        if progress is not None:
+            if done == total_cells:
+                eta = 0.0
+            elif start is None or done == start_cells:
+                eta = np.nan
+            else:
+                eta = (time.perf_counter() - start) * (total_cells - done) / (done - start_cells)
+            progress(row, num_rows, eta)
+        if start is None:
+            # the first chunk compiles the kernel; time the cell rate from here
+            start = time.perf_counter()
+            start_cells = done
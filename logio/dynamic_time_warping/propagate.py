@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Composition of warping paths and propagation of picks across wells."""
+
+import networkx as nx
+import numpy as np
+from pandas import DataFrame, Series
+
+
+class WarpMapping():
+    """
+    Monotone mapping from positions in one log to positions in another.
+
+    Built from a warping path as the mean matched position of every sample, and
+    evaluated by linear interpolation between samples, so fractional indices and
+    depths between samples are mapped too. Positions outside the aligned part of
+    the source log map to NaN.
+
+    Attributes
+    ----------
+        xp : 1d array
+            Increasing source positions (depth if known, else sample index).
+        fp : 1d array
+            Matched target position of every source position.
+
+    Methods
+    -------
+        from_result(result, inverse=False):
+            Mapping of a dtw result, query to reference or back.
+        then(other):
+            This mapping followed by another one.
+        inverse():
+            Mapping from the target back to the source.
+    """
+
+    def __init__(self, xp, fp):
+        """
+        Constructs all the necessary attributes for the WarpMapping object.
+
+        Parameters
+        ----------
+            xp : 1d array
+                Increasing source positions.
+            fp : 1d array
+                Matched target position of every source position.
+        """
+        self.xp = np.asarray(xp, dtype=np.float64)
+        self.fp = np.asarray(fp, dtype=np.float64)
+        if self.xp.ndim != 1 or self.xp.shape != self.fp.shape or self.xp.size == 0:
+            raise ValueError("xp and fp must be non-empty 1D arrays of equal length")
+        # also rejects NaN positions
+        if not (np.all(np.diff(self.xp) > 0) and np.all(np.diff(self.fp) >= 0)):
+            raise ValueError("xp must be strictly increasing and fp non-decreasing")
+
+    @classmethod
+    def from_result(cls, result, inverse=False):
+        """
+        Mapping of a dtw result.
+
+        Parameters
+        ----------
+        result : result.DtwResult
+            Alignment with a path. Positions are depths if both depth axes are
+            attached (see ``DtwResult.set_depth``), else sample indices. Depth
+            axes must be strictly increasing; resample descending logs first
+            (see ``core.Resampler``).
+        inverse : bool
+            Whether to map reference to query instead of query to reference.
+
+        Returns
+        -------
+        WarpMapping
+        """
+        if result.dist_only:
+            raise ValueError("alignment has no path; it was computed with dist_only")
+        source, target = (1, 0) if inverse else (0, 1)
+        source_idx = result.path[:, source]
+        count = np.bincount(source_idx)
+        total = np.bincount(source_idx, weights=result.path[:, target])
+        xp = np.flatnonzero(count)
+        fp = total[xp] / count[xp]
+        depths = (result.query_depth, result.reference_depth)
+        if depths[0] is not None and depths[1] is not None:
+            if not all(np.all(np.diff(depth) > 0) for depth in depths):
+                raise ValueError("depth axes must be strictly increasing")
+            xp = depths[source][xp]
+            fp = np.interp(fp, np.arange(depths[target].size), depths[target])
+        return cls(xp, fp)
+
+    def __call__(self, positions):
+        """Map source positions; NaN outside the aligned part of the source."""
+        return np.interp(positions, self.xp, self.fp, left=np.nan, right=np.nan)
+
+    def then(self, other):
+        """
+        This mapping followed by another one.
+
+        Parameters
+        ----------
+        other : WarpMapping
+            Mapping from this mapping's target to a third log.
+
+        Returns
+        -------
+        WarpMapping
+            Mapping from this source to the other's target; equal to applying
+            both in turn. Source positions that leave the other's range are dropped.
+        """
+        # breakpoints of both mappings, in this mapping's source positions
+        inner = other.xp[(other.xp >= self.fp[0]) & (other.xp <= self.fp[-1])]
+        xp = np.union1d(self.xp, np.interp(inner, self.fp, self.xp))
+        fp = other(self(xp))
+        keep = ~np.isnan(fp)
+        if not keep.any():
+            raise ValueError("mappings do not overlap")
+        return WarpMapping(xp[keep], fp[keep])
+
+    def inverse(self):
+        """Mapping from the target back to the source."""
+        fp, first = np.unique(self.fp, return_index=True)
+        # flat stretches of fp map back to their mean source position
+        total = np.add.reduceat(self.xp, first)
+        count = np.diff(np.append(first, self.xp.size))
+        return WarpMapping(fp, total / count)
+
+    def __repr__(self):
+        return "WarpMapping([{0:g}, {1:g}] -> [{2:g}, {3:g}])".format(
+            self.xp[0], self.xp[-1], self.fp[0], self.fp[-1])
+
+
+def propagate_picks(results, picks, source, weight="normalized_distance"):
+    """
+    Carry picks from one well to every connected well.
+
+    Details
+    ----------
+    Pair-wise alignments form a graph of wells. Picks follow the lowest-weight
+    chain of alignments from the source to each well, so a poor pair is bypassed
+    when a better route exists. Each alignment is turned into a
+    :class:`WarpMapping` once and all picks cross it in one vectorized ``np.interp``
+    call; alignments are followed in either direction, and the mappings along a
+    chain are composed with :meth:`WarpMapping.then`.
+
+    Parameters
+    ----------
+    results : dict
+        (query well, reference well) to result.DtwResult with a path. Depth axes
+        should be attached to all results or to none; picks are in depth or
+        sample index units accordingly.
+
+    picks : dict, Series or 1D array
+        Pick depth (or index) in the source well, e.g. formation tops by name.
+
+    source : hashable
+        Well the picks are made in.
+
+    weight : str or None
+        Result attribute used as the cost of following an alignment:
+        "normalized_distance", "distance", or None to follow the fewest alignments.
+
+    Returns
+    -------
+    DataFrame
+        One row per pick and one column per reachable well, source first, in
+        order of distance from the source; NaN where a pick leaves the aligned
+        part of a well.
+
+    """
+    graph = nx.Graph()
+    with_depth = set()
+    for (query, reference), result in results.items():
+        if weight is None:
+            cost = 1.0
+        else:
+            cost = getattr(result, weight)
+            if cost is None:
+                raise ValueError("result {0!r} has no {1}; use weight=None".format((query, reference), weight))
+        with_depth.add(result.query_depth is not None and result.reference_depth is not None)
+        if not graph.has_edge(query, reference) or cost < graph[query][reference]["weight"]:
+            graph.add_edge(query, reference, weight=cost, result=result, query=query)
+    if len(with_depth) > 1:
+        raise ValueError("depth axes must be attached to all results or to none")
+    if source not in graph:
+        raise KeyError("well {0!r} not in any result".format(source))
+
+    if isinstance(picks, dict):
+        names, values = list(picks), np.asarray(list(picks.values()), dtype=np.float64)
+    elif isinstance(picks, Series):
+        names, values = list(picks.index), np.asarray(picks, dtype=np.float64)
+    else:
+        values = np.asarray(picks, dtype=np.float64).ravel()
+        names = list(range(values.size))
+
+    costs, chains = nx.single_source_dijkstra(graph, source)
+    # wells in order of settled distance, so each parent is done before its children;
+    # a well whose chain leaves the aligned part of the source maps to None
+    mappings = {}
+    propagated = {source: values}
+    for well in costs:
+        if well == source:
+            continue
+        parent = chains[well][-2]
+        edge = graph[parent][well]
+        step = WarpMapping.from_result(edge["result"], inverse=edge["query"] != parent)
+        if parent == source:
+            mappings[well] = step
+        elif mappings[parent] is None:
+            mappings[well] = None
+        else:
+            try:
+                mappings[well] = mappings[parent].then(step)
+            except ValueError:
+                mappings[well] = None
+        if mappings[well] is None:
+            propagated[well] = np.full(values.size, np.nan)
+        else:
+            propagated[well] = mappings[well](values)
+    return DataFrame(propagated, index=names)
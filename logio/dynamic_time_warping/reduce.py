@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Piecewise aggregate reduction of logs and mapping of coarse alignments back."""
+
+import numpy as np
+
+from .result import DtwResult
+from .window import RangesWindow, _stack_ranges
+
+
+def _get_reduction(reduce):
+    """Map the ``reduce`` argument (int or (method, factor)) to (method, factor)."""
+    method, factor = ("paa", reduce) if np.isscalar(reduce) else reduce
+    if method not in ("paa", "envelope"):
+        raise NotImplementedError("given reduction method not supported")
+    if int(factor) != factor or factor < 1:
+        raise ValueError("reduction factor must be a positive integer")
+    return method, int(factor)
+
+
+def _reduce_log(x, method, factor):
+    """
+    Reduce a log to one sample per segment of ``factor`` samples.
+
+    Parameters
+    ----------
+    x : 2D array
+        Log samples (sample * feature).
+    method : str
+        "paa" for segment means, "envelope" for segment minima followed by
+        segment maxima of every curve. Missing values are left out; segments
+        with none present stay missing.
+    factor : int
+        Segment length; the last segment may be shorter.
+
+    Returns
+    -------
+    2D array
+        Reduced log, ceil(len / factor) samples.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    starts = np.arange(0, x.shape[0], factor)
+    if method == "envelope":
+        return np.hstack((np.fmin.reduceat(x, starts, axis=0), np.fmax.reduceat(x, starts, axis=0)))
+    present = ~np.isnan(x)
+    total = np.add.reduceat(np.where(present, x, 0.0), starts, axis=0)
+    count = np.add.reduceat(present, starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+
+def _reduce_window(window, factor, len_x, len_y):
+    """Coarse window covering every segment pair that meets the full-resolution window."""
+    ranges = RangesWindow.from_window(window).ranges
+    starts = np.arange(0, window.len_x, factor)
+    start = np.minimum.reduceat(ranges[:, 0], starts) // factor
+    stop = -(-np.maximum.reduceat(ranges[:, 1], starts) // factor)
+    return RangesWindow(len_x, len_y, _stack_ranges(start, np.minimum(stop, len_y)), window.label)
+
+
+def _expand_path(path, factor, len_x, len_y):
+    """
+    Full-resolution path through the segment blocks of a coarse path.
+
+    The path runs from the first corner of the first block through the centre
+    of every block to the last corner of the last block, rasterized with unit
+    steps, so it stays monotone and connected. Factor 1 returns the path as is.
+    """
+    lower = path * factor
+    upper = np.minimum(lower + factor, (len_x, len_y)) - 1
+    knots = (lower + upper) // 2
+    knots[0] = lower[0]
+    knots[-1] = upper[-1]
+    deltas = np.diff(knots, axis=0)
+    num_steps = deltas.max(axis=1)
+    moving = num_steps > 0
+    knots = np.vstack((knots[:1], knots[1:][moving]))
+    deltas = deltas[moving]
+    num_steps = num_steps[moving]
+    # step t of a segment moves t / num_steps of the way along it
+    segment = np.repeat(np.arange(num_steps.size), num_steps)
+    t = np.arange(segment.size) - np.repeat(np.cumsum(num_steps) - num_steps, num_steps) + 1
+    offsets = np.floor(t[:, np.newaxis] * deltas[segment] / num_steps[segment, np.newaxis] + 0.5)
+    return np.vstack((knots[:1], knots[segment] + offsets.astype(np.int64)))
+
+
+def _expand_result(result, factor, len_x, len_y):
+    """Result of a coarse alignment mapped back to full-resolution indices."""
+    coarse = RangesWindow.from_window(result._window).ranges
+    rows = np.arange(len_x) // factor
+    ranges = _stack_ranges(coarse[rows, 0] * factor, np.minimum(coarse[rows, 1] * factor, len_y))
+    window = RangesWindow(len_x, len_y, ranges, result._window.label)
+    path = None if result.dist_only else _expand_path(result.path, factor, len_x, len_y)
+    expanded = DtwResult(None, path, window, result._pattern)
+    expanded.distance = result.distance
+    expanded.normalized_distance = result.normalized_distance
+    expanded.profile = result.profile
+    expanded.plan = result.plan
+    return expanded
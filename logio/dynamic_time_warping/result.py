@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 from scipy.interpolate import interp1d
 from .dtwPlot import *
+from .dtwPlot import _block_reduce, _heatmap_shape, _plot_heatmap, _window_image
+from .window import RangesWindow
+from .path import RLEPath
 
 class DtwResult():
     """
@@ -11,9 +13,9 @@ class DtwResult():
     
     Attributes
     ----------
-        cumsum_matrix : 2d array
-            Alignment matrix
-        path : float
+        cumsum_matrix : 2d array or None
+            Alignment matrix; None in traceback mode
+        path : 2d array or path.RLEPath
            Alignment path.  
             * First column: query path array
             * Second column: reference path array
@@ -21,16 +23,30 @@ class DtwResult():
             window constraints
         pattern: 2d array
             Alignment pattern
+        query_depth : 1d array or None
+            Depth of each query log sample.
+        reference_depth : 1d array or None
+            Depth of each reference log sample.
+        profile : profile.DtwProfile or None
+            Per-stage timings and counters, if requested with ``profile=True``.
+        plan : plan.DtwPlan or None
+            Memory estimates and chosen strategy, if a ``memory_budget`` was given.
 
     Methods
     -------
         get_warping_path(target="query"):
             Get warping path.
+        set_depth(query_depth, reference_depth):
+            Attach depth axes of both logs.
+        get_depth_path():
+            Get alignment path in depth units.
+        slim(rle=False):
+            Copy without the cumsum matrix, for storing or sending between processes.
         plot_window():
             visualize window
-        plot_cumsum_matrix():
+        plot_cumsum_matrix(resolution=None, how="min"):
             plot heatmap of cumsum_matrix
-        plot_path(with_="cum"):
+        plot_path(with_="cum", resolution=None, how="min"):
             plot alignment path; warp function/curve
         plot_pattern():
             Plot alignment pattern
@@ -68,6 +84,10 @@ class DtwResult():
 
         self._window = window
         self._pattern = pattern
+        self.query_depth = None
+        self.reference_depth = None
+        self.profile = None
+        self.plan = None
 
     def get_warping_path(self, target="query"):
         """
@@ -101,28 +121,108 @@ class DtwResult():
 
         return warping_index
 
+    def set_depth(self, query_depth=None, reference_depth=None):
+        """
+        Attach depth axes so the alignment path can be reported in depth units.
+
+        Parameters
+        ----------
+        query_depth : 1D array, optional
+            Depth of each query log sample.
+        reference_depth : 1D array, optional
+            Depth of each reference log sample.
+        """
+        len_x, len_y = self._window.len_x, self._window.len_y
+        if query_depth is not None:
+            query_depth = np.asarray(query_depth, dtype=np.float64)
+            if query_depth.shape != (len_x,):
+                raise ValueError("query_depth must have one value per query log sample")
+        if reference_depth is not None:
+            reference_depth = np.asarray(reference_depth, dtype=np.float64)
+            if reference_depth.shape != (len_y,):
+                raise ValueError("reference_depth must have one value per reference log sample")
+        self.query_depth = query_depth
+        self.reference_depth = reference_depth
+
+    def get_depth_path(self):
+        """
+        Get alignment path in depth units.
+
+        Returns
+        -------
+        depth_path : 2D array
+            * First column: query depth
+            * Second column: reference depth
+        """
+        if self.dist_only:
+            raise Exception("alignment path not calculated.")
+        if self.query_depth is None or self.reference_depth is None:
+            raise ValueError("depth axes not set; pass x_depth and y_depth to dtw() or call set_depth()")
+        return np.column_stack((self.query_depth[self.path[:, 0]],
+            self.reference_depth[self.path[:, 1]]))
+
+    def slim(self, rle=False):
+        """
+        Copy of the result without the cumsum matrix.
+
+        The window is kept as its row ranges only (see ``window.RangesWindow``),
+        so the copy is cheap to store or to send between processes.
+
+        Parameters
+        ----------
+        rle : bool
+            Whether or not to run-length encode the path (see ``path.RLEPath``).
+
+        Returns
+        -------
+        DtwResult
+        """
+        window = RangesWindow.from_window(self._window)
+        path = None if self.dist_only else self.path
+        if rle and path is not None and not isinstance(path, RLEPath):
+            path = RLEPath.from_path(path)
+        result = DtwResult(None, path, window, self._pattern)
+        result.distance = getattr(self, "distance", None)
+        result.normalized_distance = getattr(self, "normalized_distance", None)
+        result.query_depth = self.query_depth
+        result.reference_depth = self.reference_depth
+        return result
+
     def plot_window(self):
         """Visualize window constraint"""
         self._window.plot()
 
-    def plot_cumsum_matrix(self):
-        """Plot heatmap of cumsum matrix"""
-        # extract max value with ignoring inf
-        masked_array = np.ma.masked_array(self.cumsum_matrix,
-            mask=self.cumsum_matrix == np.inf)
-        _,ax = plt.subplots(1)
-        sns.heatmap(self.cumsum_matrix.T, vmax=masked_array.max(), vmin=0,
-            xticklabels=self.cumsum_matrix.shape[0]//10,
-            yticklabels=self.cumsum_matrix.shape[1]//10,
-            ax=ax
-        )
-        ax.invert_yaxis()
+    def plot_cumsum_matrix(self, resolution=None, how="min"):
+        """
+        Plot heatmap of cumsum matrix.
+
+        The matrix is reduced to screen resolution block by block before it is
+        drawn, so large matrices are neither copied nor drawn cell by cell.
+
+        Parameters
+        ----------
+        resolution : tuple, optional
+            (query, reference) number of pixels. Defaults to the size of the axes.
+        how : string, "min" or "mean"
+            Aggregation of the finite cells of each pixel block.
+        """
+        if self.cumsum_matrix is None:
+            raise Exception("cumsum matrix not stored (traceback mode).")
+        _, ax = plt.subplots(1)
+        self._plot_cumsum_image(ax, resolution, how)
         ax.set_xlabel("query log index")
         ax.set_ylabel("reference log index")
         ax.set_title("cumsum matrix")
         plt.show()
 
-    def plot_path(self, with_="cum"):
+    def _plot_cumsum_image(self, ax, resolution, how):
+        """Draw the reduced cumsum matrix on ``ax``."""
+        len_x, len_y = self.cumsum_matrix.shape
+        image = _block_reduce(self.cumsum_matrix, _heatmap_shape(ax, resolution), how)
+        vmax = np.nanmax(image) if np.isfinite(image).any() else None
+        _plot_heatmap(ax, image, len_x, len_y, vmin=0, vmax=vmax)
+
+    def plot_path(self, with_="cum", resolution=None, how="min"):
         """
         Plot alignment path.
 
@@ -132,6 +232,10 @@ class DtwResult():
             If given, following will be plotted with alignment path:  
             * "win" : window matrix
             * "cum" : cumsum matrix
+        resolution : tuple, optional
+            (query, reference) number of pixels of the heatmap. Defaults to the size of the axes.
+        how : string, "min" or "mean"
+            Aggregation of the cumsum matrix cells of each pixel block.
         """
 
         if self.dist_only:
@@ -140,22 +244,15 @@ class DtwResult():
         if with_ is None:
             ax.plot(self.path[:, 0], self.path[:, 1])
         elif with_ == "win":
-            sns.heatmap(self._window.matrix.T, vmin=0, vmax=1,
-                xticklabels=self._window.matrix.shape[0]//10,
-                yticklabels=self._window.matrix.shape[1]//10,
-                ax=ax)
+            window = self._window
+            _plot_heatmap(ax, _window_image(window, _heatmap_shape(ax, resolution)),
+                window.len_x, window.len_y, vmin=0, vmax=1)
             ax.plot(self.path[:, 0], self.path[:, 1], "b")
-            ax.invert_yaxis()
         elif with_ == "cum":
-            # extract max value with ignoring inf
-            masked_array = np.ma.masked_array(self.cumsum_matrix,
-                mask=self.cumsum_matrix == np.inf)
-            sns.heatmap(self.cumsum_matrix.T, vmax=masked_array.max(), vmin=0,
-                xticklabels=self.cumsum_matrix.shape[0]//10,
-                yticklabels=self.cumsum_matrix.shape[1]//10,
-                ax=ax)
+            if self.cumsum_matrix is None:
+                raise Exception("cumsum matrix not stored (traceback mode).")
+            self._plot_cumsum_image(ax, resolution, how)
             ax.plot(self.path[:, 0], self.path[:, 1], "y")
-            ax.invert_yaxis()
         else:
             raise NotImplementedError("'with_' argument only supports: 'win','cum'")
         ax.set_title("alignment path")
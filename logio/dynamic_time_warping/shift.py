@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Bulk shift and stretch between two logs by FFT cross-correlation."""
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+DEFAULT_STRETCHES = np.geomspace(0.8, 1.25, 21)
+# shared by every call, possibly from several threads
+DEFAULT_STRETCHES.flags.writeable = False
+
+
+def estimate_shift(x, y, stretches=None, min_overlap=0.5):
+    """
+    Estimate the bulk shift and stretch that best line up a query log with a reference log.
+
+    Details
+    ----------
+    For every candidate stretch the query is resampled once, and the Pearson
+    correlation over the overlap of the two logs is evaluated at all lags at once:
+    the cross products come from one FFT convolution and the overlap sums from
+    cumulative sums, so each stretch costs O(N log N). Multi-curve logs use the
+    mean correlation over curves. Missing samples are replaced by the curve mean.
+
+    Parameters
+    ----------
+    x : 1D or 2D array (sample * feature), Series or DataFrame
+        Query log.
+
+    y : 1D or 2D array (sample * feature), Series or DataFrame
+        Reference log.
+
+    stretches : list of float, optional
+        Candidate reference samples per query sample.
+        Defaults to 21 values between 0.8 and 1.25. The best candidate is
+        refined on a finer grid between its neighbours.
+
+    min_overlap : float
+        Smallest overlap considered, as a fraction of the shorter log.
+
+    Returns
+    -------
+    shift : int
+        Reference index matched to the first query sample; may be negative.
+    stretch : float
+        Reference samples per query sample.
+    score : float
+        Correlation coefficient at the best shift and stretch.
+
+    """
+    x = _fill_missing(x)
+    y = _fill_missing(y)
+    if x.shape[1] != y.shape[1]:
+        raise ValueError("x and y must have the same number of curves")
+    stretches = DEFAULT_STRETCHES if stretches is None else np.atleast_1d(stretches)
+    if (np.asarray(stretches) <= 0).any():
+        raise ValueError("stretches must be positive")
+
+    best = _best_lag(x, y, stretches, min_overlap, (0, 1.0, -np.inf))
+    if len(stretches) > 1 and np.isfinite(best[2]):
+        # second pass on a finer grid between the neighbours of the best stretch
+        grid = np.sort(np.asarray(stretches, dtype=np.float64))
+        idx = np.searchsorted(grid, best[1])
+        low = grid[max(idx - 1, 0)]
+        high = grid[min(idx + 1, grid.size - 1)]
+        best = _best_lag(x, y, np.geomspace(low, high, 9), min_overlap, best)
+    return best
+
+
+def _best_lag(x, y, stretches, min_overlap, best):
+    """Best (lag, stretch, score) over the given stretches, starting from ``best``."""
+    for stretch in stretches:
+        len_s = int(round(x.shape[0] * stretch))
+        if len_s < 2:
+            continue
+        # query resampled so one sample spans one reference sample
+        pos = np.arange(len_s) / stretch
+        xs = np.column_stack([np.interp(pos, np.arange(x.shape[0]), col) for col in x.T])
+        lags, score = _overlap_correlation(xs, y, min_overlap)
+        if score.size == 0:
+            continue
+        idx = np.argmax(score)
+        if score[idx] > best[2]:
+            best = (int(lags[idx]), float(stretch), float(score[idx]))
+    return best
+
+
+def _overlap_correlation(xs, y, min_overlap):
+    """Mean Pearson correlation of xs[k] and y[k + lag] over the overlap, for every lag."""
+    len_s, len_y = xs.shape[0], y.shape[0]
+    lags = np.arange(-(len_s - 1), len_y)
+    # overlapping query samples: first <= k < last
+    first = np.maximum(0, -lags)
+    last = np.minimum(len_s, len_y - lags)
+    n = last - first
+    keep = n >= max(2, min_overlap * min(len_s, len_y))
+    lags, first, last, n = lags[keep], first[keep], last[keep], n[keep]
+
+    score = np.zeros(lags.size)
+    for cx, cy in zip(xs.T, y.T):
+        # lag t of the full convolution sits at index t + len_s - 1
+        sxy = fftconvolve(cy, cx[::-1], mode="full")[lags + len_s - 1]
+        cum_x = np.concatenate(([0.0], np.cumsum(cx)))
+        cum_xx = np.concatenate(([0.0], np.cumsum(cx * cx)))
+        cum_y = np.concatenate(([0.0], np.cumsum(cy)))
+        cum_yy = np.concatenate(([0.0], np.cumsum(cy * cy)))
+        sx = cum_x[last] - cum_x[first]
+        sxx = cum_xx[last] - cum_xx[first]
+        sy = cum_y[last + lags] - cum_y[first + lags]
+        syy = cum_yy[last + lags] - cum_yy[first + lags]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        score += np.nan_to_num(r, nan=0.0, posinf=0.0, neginf=0.0)
+    return lags, score / xs.shape[1]
+
+
+def _fill_missing(x):
+    """Float (sample * feature) copy of a log, centred, with NaNs set to the curve mean."""
+    x = np.array(x, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, np.newaxis]
+    with np.errstate(invalid="ignore"):
+        x -= np.nanmean(x, axis=0)
+    x[np.isnan(x)] = 0.0
+    return x
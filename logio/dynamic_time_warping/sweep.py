@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Parameter sweep of step patterns and windows over one cost matrix."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pandas import DataFrame
+from scipy.spatial.distance import cdist
+
+from .DTW import dtw_low, _get_window, _get_pattern, _get_validity, _check_cost
+from .distance import NoPathError
+from .window import BaseWindow, ShiftedBandWindow
+from .shift import estimate_shift
+from .banded import _banded_cdist, _pattern_ranges
+from .features import _prepare_features, _get_weights
+
+
+def dtw_sweep(x, y, patterns=("symmetric2",), windows=("none",), dist="euclidean",
+    open_begin=False, open_end=False, return_path=False, traceback=True, n_jobs=None,
+    curves=None, weights=None, transforms=None, nan_policy="propagate", gap_cost=None):
+    """
+    Evaluate every combination of step patterns and windows on one cost matrix.
+
+    Details
+    ----------
+    The pair-wise cost matrix is computed once. If every window is given as row
+    ranges, only the cells of their union are computed and stored (see
+    :class:`banded.BandedMatrix`), so windows that are subsets of a larger one reuse
+    its costs. Identical windows are built once. The combinations run in a thread
+    pool; the row-range kernels release the GIL.
+
+    Parameters
+    ----------
+    x : 1D or 2D array (sample * feature), Series or DataFrame
+        Query log.
+
+    y : 1D or 2D array (sample * feature), Series or DataFrame
+        Reference log.
+
+    patterns : list of str
+        Step patterns to evaluate.
+
+    windows : list
+        Windows to evaluate. Each entry is a window type string ("none", "itakura"),
+        a (window_type, window_size) tuple such as ("sakoechiba", 50) or
+        ("shifted", 50), or a window.BaseWindow object.
+
+    dist : string or callable
+        Local cost metric, see :func:`dtw`.
+
+    return_path : bool
+        Whether or not to add the warping path of each combination to the table.
+
+    traceback : bool
+        Whether or not to run windows given as row ranges in traceback mode,
+        keeping only the rolling rows of each cumsum matrix while combinations
+        run side by side. Paths are the same as those of :func:`dtw`.
+
+    n_jobs : int, optional
+        Number of worker threads. Defaults to the executor default; 1 runs serially.
+
+    others :
+        see :func:`dtw` function.
+
+    Returns
+    -------
+    DataFrame
+        One row per (pattern, window) combination with columns "step_pattern",
+        "window_type", "window_size", "distance", "normalized_distance" and, if
+        return_path, "path". Combinations without a path to the end point have
+        an infinite distance.
+
+    """
+    w = None
+    if curves is not None or weights is not None or transforms is not None:
+        x, x_curves = _prepare_features(x, curves, transforms)
+        y, _ = _prepare_features(y, curves, transforms)
+        w = _get_weights(weights, x_curves)
+        if w is not None and type(dist) != str:
+            raise ValueError("weights require dist to be given as a string metric")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, np.newaxis]
+    if y.ndim == 1:
+        y = y[:, np.newaxis]
+    len_x, len_y = x.shape[0], y.shape[0]
+    x_valid, y_valid, gap_cost = _get_validity(x, y, nan_policy, gap_cost)
+
+    patterns = [(name, _get_pattern(name)) for name in patterns]
+    for name, pattern in patterns:
+        if open_begin and not pattern.normalize_guide == "N":
+            raise ValueError("open-begin alignment requires 'N' normalizable step pattern: " + name)
+        if open_end and not pattern.is_normalizable:
+            raise ValueError("open-end alignment requires normalizable step pattern: " + name)
+
+    # build every distinct window once
+    labels, unique, window_of = [], [], []
+    for spec in windows:
+        window_type, window_size, window = _get_sweep_window(spec, x, y)
+        labels.append((window_type, window_size))
+        for idx, other in enumerate(unique):
+            if _same_window(window, other):
+                window_of.append(idx)
+                break
+        else:
+            window_of.append(len(unique))
+            unique.append(window)
+
+    X = _get_sweep_cost(x, y, unique, [pattern for _, pattern in patterns], dist, w)
+    # checked once for all combinations
+    _check_cost(X)
+
+    def run(pattern, window):
+        use_tb = traceback and window.ranges is not None
+        try:
+            result = dtw_low(X, window, pattern, dist_only=not return_path,
+                open_begin=open_begin, open_end=open_end, x_valid=x_valid,
+                y_valid=y_valid, gap_cost=gap_cost, traceback=use_tb, check_cost=False)
+        except NoPathError:
+            # no path reaches the end point within this window
+            return np.inf, np.nan, None
+        normalized = np.nan if result.normalized_distance is None else result.normalized_distance
+        return result.distance, normalized, getattr(result, "path", None)
+
+    jobs = [(p, u) for p in range(len(patterns)) for u in range(len(unique))]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {job: executor.submit(run, patterns[job[0]][1], unique[job[1]]) for job in jobs}
+        outcomes = {job: future.result() for job, future in futures.items()}
+
+    rows = []
+    for p, (name, _) in enumerate(patterns):
+        for (window_type, window_size), u in zip(labels, window_of):
+            distance, normalized, path = outcomes[(p, u)]
+            row = {"step_pattern": name, "window_type": window_type, "window_size": window_size,
+                "distance": distance, "normalized_distance": normalized}
+            if return_path:
+                row["path"] = path
+            rows.append(row)
+    columns = ["step_pattern", "window_type", "window_size", "distance", "normalized_distance"]
+    return DataFrame(rows, columns=columns + (["path"] if return_path else []))
+
+
+def _get_sweep_window(spec, x, y):
+    """Window type, window size and window object of a sweep window entry."""
+    if isinstance(spec, BaseWindow):
+        return type(spec).__name__, getattr(spec, "size", None), spec
+    if isinstance(spec, str):
+        window_type, window_size = spec, None
+    else:
+        window_type, window_size = spec
+    len_x, len_y = x.shape[0], y.shape[0]
+    if window_type == "shifted":
+        shift, stretch, _ = estimate_shift(x, y)
+        return window_type, window_size, ShiftedBandWindow(len_x, len_y, window_size, shift, stretch)
+    return window_type, window_size, _get_window(window_type, window_size, len_x, len_y)
+
+
+def _same_window(window, other):
+    """Whether two windows cover the same cells."""
+    if window is other:
+        return True
+    if window.ranges is not None and other.ranges is not None:
+        return np.array_equal(window.ranges, other.ranges)
+    return window.matrix.shape == other.matrix.shape and (window.matrix == other.matrix).all()
+
+
+def _get_sweep_cost(x, y, windows, patterns, dist, w):
+    """Pair-wise cost matrix covering every cell read by any combination."""
+    len_x, len_y = x.shape[0], y.shape[0]
+    if all(window.ranges is not None for window in windows):
+        # hull of the union, row by row
+        ranges = np.zeros((len_x, 2), dtype=np.int64)
+        ranges[:, 0] = len_y
+        for window in windows:
+            for pattern in patterns:
+                # multi-step patterns read cells outside the window
+                reach = _pattern_ranges(window.ranges, pattern.array, len_y)
+                filled = reach[:, 1] > reach[:, 0]
+                ranges[filled, 0] = np.minimum(ranges[filled, 0], reach[filled, 0])
+                ranges[filled, 1] = np.maximum(ranges[filled, 1], reach[filled, 1])
+        ranges[:, 1] = np.maximum(ranges[:, 0], ranges[:, 1])
+        if type(dist) == str and 2 * (ranges[:, 1] - ranges[:, 0]).sum() < len_x * len_y:
+            return _banded_cdist(x, y, ranges, metric=dist, w=w)
+    if type(dist) == str:
+        return cdist(x, y, metric=dist) if w is None else cdist(x, y, metric=dist, w=w)
+    # user defined metric, evaluated on the union of the windows only
+    union = np.zeros((len_x, len_y), dtype=bool)
+    for window in windows:
+        union |= window.matrix
+    X = np.ones([len_x, len_y]) * np.inf
+    for i, j in np.argwhere(union):
+        X[i, j] = dist(x[i, :], y[j, :])
+    return X
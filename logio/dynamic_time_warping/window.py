@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import numpy as np
-from numba import jit
 import matplotlib.pyplot as plt
-import seaborn as sns
+from scipy.ndimage import minimum_filter1d, maximum_filter1d
+from .dtwPlot import _heatmap_shape, _plot_heatmap, _window_image
 
 class BaseWindow():
     """
@@ -16,23 +16,67 @@ class BaseWindow():
     1. Sakoechiba's Window implemented in `SakoechibaWindow` class.
     2. Itakura's Window implemented in `ItakuraWindow` class.
 
+    Windows whose cells form one contiguous run per query row describe themselves
+    with ``ranges``: a (len_x, 2) int array holding, for every query index, the first
+    and one-past-last reference index inside the window. The dense ``matrix`` and
+    the cell ``list`` are derived from it on first access only.
+
+    Attributes
+    ----------
+    ranges : 2D array or None
+        Per-row [start, stop) reference index bounds.
+    matrix : 2D bool array
+        Dense window matrix.
+    list : 2D array
+        (row, column) index of every cell inside the window, in row-major order.
+
     Methods
     -------
-    plot():
+    plot(resolution=None):
         Visualize window (constraint)..   
     """
 
+    ranges = None
+    _matrix = None
+    _list = None
+
     def __init__(self):
         pass
 
-    def plot(self):
-        """Visualize window (constraint)."""
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = _ranges_to_matrix(self.ranges, self.len_y)
+        return self._matrix
+
+    @property
+    def list(self):
+        if self._list is None:
+            self._list = _ranges_to_list(self.ranges)
+        return self._list
+
+    @property
+    def num_cells(self):
+        """Number of cells inside the window."""
+        if self.ranges is not None:
+            return int((self.ranges[:, 1] - self.ranges[:, 0]).sum())
+        return self.list.shape[0]
+
+    def plot(self, resolution=None):
+        """
+        Visualize window (constraint).
+
+        The window is drawn as the fraction of each pixel block inside it,
+        computed from ``ranges`` where available, so no dense matrix is built.
+
+        Parameters
+        ----------
+        resolution : tuple, optional
+            (query, reference) number of pixels. Defaults to the size of the axes.
+        """
         _, ax = plt.subplots(1)
-        sns.heatmap(self.matrix.T, vmin=0, vmax=1,
-            xticklabels=self.matrix.shape[0]//10,
-            yticklabels=self.matrix.shape[1]//10,
-            ax=ax)
-        ax.invert_yaxis()
+        _plot_heatmap(ax, _window_image(self, _heatmap_shape(ax, resolution)),
+            self.len_x, self.len_y, vmin=0, vmax=1)
         ax.set_title(self.label)
         ax.set_xlabel("query index")
         ax.set_ylabel("reference index")
@@ -69,11 +113,13 @@ class NoWindow(BaseWindow):
                 Length of reference log.
         """
 
+        self.len_x = len_x
+        self.len_y = len_y
         self._gen_window(len_x, len_y)
 
     def _gen_window(self, len_x, len_y):
-        self.matrix = np.ones([len_x, len_y], dtype=bool)
-        self.list = np.argwhere(self.matrix == True)
+        self.ranges = np.zeros((len_x, 2), dtype=np.int64)
+        self.ranges[:, 1] = len_y
 
 #Define warping constraints.
 class SakoechibaWindow(BaseWindow):
@@ -110,14 +156,18 @@ class SakoechibaWindow(BaseWindow):
             size : int
                 Size of window width.
         """
-        
+
+        self.len_x = len_x
+        self.len_y = len_y
+        self.size = size
         self._gen_window(len_x, len_y, size)
 
     def _gen_window(self, len_x, len_y, size):
-        xx = np.arange(len_x)
-        yy = np.arange(len_y)
-        self.matrix = np.abs(xx[:,np.newaxis] - yy[np.newaxis, :]) <= size
-        self.list = np.argwhere(self.matrix == True)
+        # cells satisfying |x - y| <= size, bounded per row
+        xx = np.arange(len_x, dtype=np.int64)
+        start = np.clip(xx - size, 0, len_y)
+        stop = np.clip(xx + size + 1, 0, len_y)
+        self.ranges = _stack_ranges(start, stop)
 
 
 class ItakuraWindow(BaseWindow):
@@ -148,24 +198,162 @@ class ItakuraWindow(BaseWindow):
             len_y : int
                 Length of reference log.
         """
-       
+
+        self.len_x = len_x
+        self.len_y = len_y
         self._gen_window(len_x, len_y)
 
     def _gen_window(self, len_x, len_y):
-        self.matrix = _gen_itakura_window(len_x, len_y).astype(np.bool)
-        self.list = np.argwhere(self.matrix == True)
-
-#speed up _gen_itakura_window using JIT (just-in-time) compiler .
-@jit(nopython=True)
-def _gen_itakura_window(len_x, len_y):
-    matrix = np.zeros((len_x, len_y), dtype=np.int8)
-    for xidx in range(len_x):
-        for yidx in range(len_y):
-            if (yidx < 2*xidx + 1) and (xidx <= 2*yidx + 1) and \
-                (xidx >= len_x - 2*(len_y - yidx)) and \
-                (yidx > len_y - 2*(len_x - xidx)):
-                matrix[xidx, yidx] = 1
-    return matrix
+        # the parallelogram (yidx < 2*xidx + 1) and (xidx <= 2*yidx + 1) and
+        # (xidx >= len_x - 2*(len_y - yidx)) and (yidx > len_y - 2*(len_x - xidx))
+        # solved for yidx on every row
+        xx = np.arange(len_x, dtype=np.int64)
+        start = np.maximum(np.maximum(xx // 2, len_y - 2*(len_x - xx) + 1), 0)
+        stop = np.minimum(np.minimum(2*xx, len_y - (len_x - xx + 1)//2), len_y - 1) + 1
+        self.ranges = _stack_ranges(start, stop)
+
+
+class ShiftedBandWindow(BaseWindow):
+    """
+    Band window following a bulk depth shift and stretch.
+
+    Query index ``i`` is expected to match reference index ``stretch * i + shift``;
+    cells within ``size`` of that line are inside the window. Unlike the diagonal
+    Sakoechiba window, a band narrow enough for small local stretches still covers
+    a large bulk offset between the logs. The band is widened where needed so the
+    first row reaches the first reference index, the last row reaches the last one,
+    and every row overlaps the previous one.
+
+    Attributes
+    ----------
+        len_x : int
+            Length of query log.
+        len_y : int
+            Length of reference log.
+        size : int
+            Half width of the band, in reference samples.
+        shift : float
+            Reference index matched to the first query sample.
+        stretch : float
+            Reference samples per query sample.
+
+    Methods
+    -------
+        _gen_window(len_x, len_y, size, shift, stretch):
+            Generates the window constraint matrix.
+    """
+
+    label = "shifted band window"
+    def __init__(self, len_x, len_y, size, shift=0.0, stretch=1.0):
+        """
+        Constructs all the necessary attributes for the ShiftedBandWindow object.
+
+        Parameters
+        ----------
+            len_x : int
+                Length of query log.
+            len_y : int
+                Length of reference log.
+            size : int
+                Half width of the band, in reference samples.
+            shift : float
+                Reference index matched to the first query sample,
+                e.g. as returned by ``estimate_shift``.
+            stretch : float
+                Reference samples per query sample.
+        """
+        if size is None or size < 0:
+            raise ValueError("size must be a non-negative number of samples")
+        if stretch <= 0:
+            raise ValueError("stretch must be positive")
+        self.len_x = len_x
+        self.len_y = len_y
+        self.size = size
+        self.shift = float(shift)
+        self.stretch = float(stretch)
+        self._gen_window(len_x, len_y, size, self.shift, self.stretch)
+
+    def _gen_window(self, len_x, len_y, size, shift, stretch):
+        center = stretch * np.arange(len_x) + shift
+        start = np.ceil(center - size).astype(np.int64)
+        stop = np.floor(center + size).astype(np.int64) + 1
+        self.ranges = _connect_ranges(start, stop, len_y)
+
+
+class CorridorWindow(BaseWindow):
+    """
+    Corridor window around a known alignment path.
+
+    Cells within ``radius`` samples (along both axes) of the path are inside the
+    window. Query rows the path does not visit, e.g. after the depth range was
+    extended, follow the path linearly interpolated (held constant past its ends).
+    The corridor is kept connected and reaches both corners, so re-aligning costs
+    about path length * radius cells instead of len_x * len_y.
+
+    Attributes
+    ----------
+        len_x : int
+            Length of query log.
+        len_y : int
+            Length of reference log.
+        radius : int
+            Corridor half width, in samples.
+
+    Methods
+    -------
+        _gen_window(len_x, len_y, path, radius):
+            Generates the window constraint matrix.
+    """
+
+    label = "corridor window"
+    def __init__(self, len_x, len_y, path, radius):
+        """
+        Constructs all the necessary attributes for the CorridorWindow object.
+
+        Parameters
+        ----------
+            len_x : int
+                Length of query log.
+            len_y : int
+                Length of reference log.
+            path : 2D array
+                Prior alignment path; query index in the first column and
+                reference index in the second. Fractional indices are allowed.
+            radius : int
+                Corridor half width, in samples.
+        """
+        if radius is None or radius < 0:
+            raise ValueError("radius must be a non-negative number of samples")
+        self.len_x = len_x
+        self.len_y = len_y
+        self.radius = radius
+        self._gen_window(len_x, len_y, path, radius)
+
+    def _gen_window(self, len_x, len_y, path, radius):
+        path = np.asarray(path, dtype=np.float64)
+        if path.ndim != 2 or path.shape[1] != 2:
+            raise ValueError("path must be a (length, 2) array")
+        rows = np.rint(path[:, 0]).astype(np.int64)
+        keep = (rows >= 0) & (rows < len_x)
+        if not keep.any():
+            raise ValueError("path does not cross the query log")
+        rows, cols = rows[keep], path[keep, 1]
+        # reference extent of the path on every row it visits
+        low = np.full(len_x, np.inf)
+        high = np.full(len_x, -np.inf)
+        np.minimum.at(low, rows, cols)
+        np.maximum.at(high, rows, cols)
+        visited = np.isfinite(low)
+        xx = np.arange(len_x)
+        low = np.interp(xx, xx[visited], low[visited])
+        high = np.interp(xx, xx[visited], high[visited])
+        # widen by radius along the query axis, then along the reference axis
+        size = 2 * int(radius) + 1
+        low = minimum_filter1d(low, size, mode="nearest") - radius
+        high = maximum_filter1d(high, size, mode="nearest") + radius
+        start = np.ceil(low).astype(np.int64)
+        stop = np.floor(high).astype(np.int64) + 1
+        self.ranges = _connect_ranges(start, stop, len_y)
 
 
 class UserWindow(BaseWindow):
@@ -210,13 +398,129 @@ class UserWindow(BaseWindow):
                 Arguments for win_func
         """
 
+        self.len_x = len_x
+        self.len_y = len_y
         self._gen_window(len_x, len_y, win_func, *args, **kwargs)
 
     def _gen_window(self, len_x, len_y, win_func, *args, **kwargs):
-        matrix = np.zeros((len_x, len_y), dtype=np.bool)
+        matrix = np.zeros((len_x, len_y), dtype=bool)
         for xidx in range(len_x):
             for yidx in range(len_y):
                 if win_func(xidx, yidx, *args, **kwargs):
                     matrix[xidx,yidx] = True
-        self.matrix = matrix
-        self.list = np.argwhere(self.matrix == True)
+        self._matrix = matrix
+        self._list = np.argwhere(self._matrix == True)
+        # rows holding one contiguous run of cells can also be given as ranges
+        count = matrix.sum(axis=1)
+        start = np.where(count > 0, matrix.argmax(axis=1), 0)
+        stop = np.where(count > 0, len_y - matrix[:, ::-1].argmax(axis=1), 0)
+        if (stop - start == count).all():
+            self.ranges = _stack_ranges(start, stop)
+
+
+class RangesWindow(BaseWindow):
+    """
+    Window given directly by its per-row ranges.
+
+    Used by slim results (see ``DtwResult.slim``), which keep only the row
+    ranges of the window they were computed with.
+
+    Attributes
+    ----------
+        len_x : int
+            Length of query log.
+        len_y : int
+            Length of reference log.
+        label : str
+            Label of the original window.
+
+    Methods
+    -------
+        from_window(window):
+            Row ranges of any window; the per-row hull if its rows are not contiguous.
+    """
+
+    label = "window"
+    def __init__(self, len_x, len_y, ranges, label=None):
+        """
+        Constructs all the necessary attributes for the RangesWindow object.
+
+        Parameters
+        ----------
+            len_x : int
+                Length of query log.
+            len_y : int
+                Length of reference log.
+            ranges : 2D array
+                Per-row [start, stop) reference index bounds.
+            label : str, optional
+                Label of the original window.
+        """
+        ranges = np.asarray(ranges, dtype=np.int64)
+        if ranges.shape != (len_x, 2):
+            raise ValueError("ranges must hold one [start, stop) pair per query sample")
+        self.len_x = len_x
+        self.len_y = len_y
+        self.ranges = _stack_ranges(ranges[:, 0], ranges[:, 1])
+        if label is not None:
+            self.label = label
+
+    @classmethod
+    def from_window(cls, window):
+        """Row ranges of any window; the per-row hull if its rows are not contiguous."""
+        if window.ranges is not None:
+            return cls(window.len_x, window.len_y, window.ranges, window.label)
+        cells = window.list
+        start = np.full(window.len_x, window.len_y, dtype=np.int64)
+        stop = np.zeros(window.len_x, dtype=np.int64)
+        np.minimum.at(start, cells[:, 0], cells[:, 1])
+        np.maximum.at(stop, cells[:, 0], cells[:, 1] + 1)
+        return cls(window.len_x, window.len_y, _stack_ranges(np.minimum(start, stop), stop), window.label)
+
+
+def _stack_ranges(start, stop):
+    """Stack per-row bounds into a (len_x, 2) array; empty rows get stop == start."""
+    return np.column_stack((start, np.maximum(stop, start))).astype(np.int64)
+
+
+def _connect_ranges(start, stop, len_y):
+    """
+    Clip per-row bounds and widen them into a monotone, connected corridor.
+
+    Every row keeps at least one cell, bounds never move backwards, each row
+    overlaps (diagonally) the previous one, and the corridor contains both
+    corner cells (0, 0) and (len_x - 1, len_y - 1).
+    """
+    start = np.clip(start, 0, len_y - 1)
+    stop = np.clip(stop, 1, len_y)
+    start = np.minimum.accumulate(start[::-1])[::-1]
+    stop = np.maximum.accumulate(stop)
+    stop = np.maximum(stop, start + 1)
+    # row i must reach back to a cell of row i - 1
+    start[1:] = np.minimum(start[1:], stop[:-1])
+    start[0] = 0
+    stop[-1] = len_y
+    return _stack_ranges(start, stop)
+
+
+def _intersect_ranges(ranges, other):
+    """Per-row intersection of two range arrays."""
+    start = np.maximum(ranges[:, 0], other[:, 0])
+    stop = np.minimum(ranges[:, 1], other[:, 1])
+    return _stack_ranges(start, stop)
+
+
+def _ranges_to_list(ranges):
+    """(row, column) index of every cell covered by ``ranges``, in row-major order."""
+    counts = ranges[:, 1] - ranges[:, 0]
+    rows = np.repeat(np.arange(ranges.shape[0], dtype=np.int64), counts)
+    offsets = np.cumsum(counts) - counts
+    cols = np.arange(counts.sum(), dtype=np.int64) \
+        - np.repeat(offsets - ranges[:, 0], counts)
+    return np.column_stack((rows, cols))
+
+
+def _ranges_to_matrix(ranges, len_y):
+    """Dense bool matrix of the cells covered by ``ranges``."""
+    cols = np.arange(len_y)
+    return (cols[np.newaxis, :] >= ranges[:, 0:1]) & (cols[np.newaxis, :] < ranges[:, 1:2])
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def make_logs():
+    """Factory of random-walk query and reference logs (sample * curve)."""
+    def make(seed=0, len_x=80, len_y=90, num_curves=2):
+        rng = np.random.default_rng(seed)
+        return (np.cumsum(rng.normal(size=(len_x, num_curves)), axis=0),
+            np.cumsum(rng.normal(size=(len_y, num_curves)), axis=0))
+    return make
+
+
+@pytest.fixture
+def logs(make_logs):
+    """Query and reference logs of 80 and 90 samples, two curves."""
+    return make_logs()
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, dtw_from_distance_matrix
+from logio.dynamic_time_warping.DTW import _get_pattern, _get_window
+from logio.dynamic_time_warping.backtrack import _backtrack_checkpointed
+from logio.dynamic_time_warping.cost import _get_cumsum_rows_kernel, _num_rolling_rows
+from logio.dynamic_time_warping.features import FeatureCost
+
+PATTERNS = ["symmetric1", "symmetric2", "symmetricP05", "symmetricP0", "symmetricP1",
+    "symmetricP2", "asymmetric", "asymmetricP0", "asymmetricP05", "asymmetricP1",
+    "asymmetricP2", "typeIa", "typeIb", "typeIc", "typeId", "typeIas", "typeIbs",
+    "typeIcs", "typeIds", "typeIIa", "typeIIb", "typeIIc", "typeIId", "typeIIIc",
+    "typeIVc", "mori2006"]
+
+
+@pytest.mark.parametrize("step_pattern", PATTERNS)
+@pytest.mark.parametrize("options", [{}, {"window_type": "sakoechiba", "window_size": 20},
+    {"open_end": True}, {"open_begin": True, "open_end": True}])
+def test_traceback_path_equals_dense_path(step_pattern, options, make_logs):
+    pattern = _get_pattern(step_pattern)
+    if options.get("open_begin") and pattern.normalize_guide != "N":
+        pytest.skip("open begin needs an N-normalizable pattern")
+    if options.get("open_end") and not pattern.is_normalizable:
+        pytest.skip("open end needs a normalizable pattern")
+    for seed in range(3):
+        x, y = make_logs(seed, 60, 70)
+        try:
+            dense = dtw(x, y, step_pattern=step_pattern, **options)
+        except ValueError:
+            # no path within the window for this pattern
+            continue
+        traced = dtw(x, y, step_pattern=step_pattern, traceback=True, **options)
+        assert dense.distance == pytest.approx(traced.distance)
+        np.testing.assert_array_equal(dense.path, traced.path)
+
+
+@pytest.mark.parametrize("options", [{}, {"nan_policy": "gap", "gap_cost": 1.0}])
+def test_symmetric2_path_cost_equals_distance(options, make_logs):
+    x, y = make_logs(0, 60, 70)
+    x[5:9] = np.nan
+    if not options:
+        x = np.nan_to_num(x)
+    result = dtw(x, y, step_pattern="symmetric2", **options)
+    cost = np.sqrt(((x[:, None] - y[None]) ** 2).sum(axis=2))
+    if options:
+        cost[np.isnan(cost)] = options["gap_cost"]
+    path = result.path
+    total = cost[path[0, 0], path[0, 1]]
+    for (i0, j0), (i1, j1) in zip(path[:-1], path[1:]):
+        total += (2 if i1 > i0 and j1 > j0 else 1) * cost[i1, j1]
+    assert total == pytest.approx(result.distance)
+
+
+@pytest.mark.parametrize("step_pattern", ["symmetric2", "asymmetric", "typeIIIc", "mori2006"])
+@pytest.mark.parametrize("options", [{}, {"window_type": "itakura"},
+    {"open_begin": True, "open_end": True}])
+def test_linear_space_path_equals_traceback_path(step_pattern, options, make_logs):
+    pattern = _get_pattern(step_pattern)
+    if options.get("open_begin") and pattern.normalize_guide != "N":
+        pytest.skip("open begin needs an N-normalizable pattern")
+    x, y = make_logs(0, 150, 170)
+    traced = dtw(x, y, step_pattern=step_pattern, traceback=True, **options)
+    linear = dtw_from_distance_matrix(FeatureCost(x, y, "euclidean"), step_pattern=step_pattern,
+        linear_space=True, profile=True, **options)
+    assert linear.distance == pytest.approx(traced.distance)
+    np.testing.assert_array_equal(linear.path, traced.path)
+    # one block of traceback bytes, not one per window cell
+    assert linear.profile.allocations["traceback"] < linear.profile.counters["window_cells"]
+
+
+@pytest.mark.parametrize("base_cells, num_splits", [(1, 2), (40, 3), (500, 8)])
+def test_checkpointed_backtrack_with_small_blocks(base_cells, num_splits, make_logs):
+    x, y = make_logs(1, 60, 70)
+    traced = dtw(x, y, step_pattern="typeIIIc", window_type="sakoechiba", window_size=15,
+        traceback=True)
+    pattern = _get_pattern("typeIIIc").array
+    window = _get_window("sakoechiba", 15, 60, 70)
+    w_offsets = np.concatenate(([0], np.cumsum(window.ranges[:, 1] - window.ranges[:, 0])))
+    cost = FeatureCost(x, y, "euclidean")
+    kernel = _get_cumsum_rows_kernel("features", False)
+
+    def fill(D, tb, tb_offsets, row_start, row_stop):
+        kernel((cost.x, cost.y, cost.w, cost.code), window.ranges, tb_offsets, pattern, False,
+            np.ones(0, dtype=np.bool_), np.ones(0, dtype=np.bool_), 0.0, D, tb, row_start,
+            row_stop)
+
+    D = np.full((_num_rolling_rows(pattern), 70), np.inf)
+    path = _backtrack_checkpointed(fill, D, window.ranges, w_offsets, pattern, 69, 0, base_cells,
+        num_splits)
+    np.testing.assert_array_equal(path, traced.path)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.spatial.distance import cdist
+
+from logio.dynamic_time_warping import dtw_from_distance_matrix, BandedMatrix
+
+
+def _band(cost, radius):
+    """Costs within radius of the diagonal as a BandedMatrix, and dense with inf outside."""
+    rows = np.arange(cost.shape[0])
+    ranges = np.column_stack((np.maximum(rows - radius, 0),
+        np.minimum(rows + radius + 1, cost.shape[1])))
+    dense = np.full(cost.shape, np.inf)
+    data = []
+    for i, (start, stop) in enumerate(ranges):
+        dense[i, start:stop] = cost[i, start:stop]
+        data.append(cost[i, start:stop])
+    return BandedMatrix(np.concatenate(data), ranges, cost.shape), dense
+
+
+@pytest.mark.parametrize("step_pattern", ["symmetric2", "symmetricP1", "typeIIIc", "asymmetric"])
+@pytest.mark.parametrize("radius", [25, 12])
+@pytest.mark.parametrize("traceback", [False, True])
+def test_banded_and_csr_equal_dense(step_pattern, radius, traceback, make_logs):
+    x, y = make_logs(4, 80, 85)
+    banded, dense = _band(cdist(x, y), radius)
+    # a sakoechiba window of the band radius; cells outside the band are unreachable
+    options = {"step_pattern": step_pattern, "window_type": "sakoechiba",
+        "window_size": radius, "traceback": traceback}
+    reference = dtw_from_distance_matrix(dense, **options)
+    sparse = csr_matrix(np.where(np.isfinite(dense), dense, 0.0))
+    sparse.eliminate_zeros()
+    for X in (banded, sparse):
+        result = dtw_from_distance_matrix(X, **options)
+        assert result.distance == pytest.approx(reference.distance)
+        np.testing.assert_array_equal(result.path, reference.path)
+
+
+@pytest.mark.parametrize("traceback", [False, True])
+def test_band_short_of_the_pattern_reach(traceback, make_logs):
+    x, y = make_logs(4, 80, 80)
+    cost = cdist(x, y)
+    banded, dense = _band(cost, 2)
+    options = {"step_pattern": "typeIIIc", "window_type": "sakoechiba", "window_size": 2,
+        "traceback": traceback}
+    reference = dtw_from_distance_matrix(dense, **options)
+    # typeIIIc steps read costs two columns off its start; the band cuts some paths
+    assert reference.distance > dtw_from_distance_matrix(cost, **options).distance
+    for X in (banded, csr_matrix(np.where(np.isfinite(dense), dense, 0.0))):
+        result = dtw_from_distance_matrix(X, **options)
+        assert result.distance == pytest.approx(reference.distance)
+        np.testing.assert_array_equal(result.path, reference.path)
+
+
+def test_csr_rows_with_holes(make_logs):
+    x, y = make_logs(5, 40, 45)
+    cost = cdist(x, y)
+    keep = np.abs(np.arange(40)[:, None] - np.arange(45)) <= 8
+    # unsorted columns and a hole inside the band of every tenth row
+    keep[::10, 3::7] = False
+    rows, cols = np.nonzero(keep)
+    order = np.random.default_rng(0).permutation(rows.size)
+    sparse = csr_matrix((cost[rows, cols][order], (rows[order], cols[order])), shape=cost.shape)
+    dense = np.where(keep, cost, np.inf)
+    options = {"window_type": "sakoechiba", "window_size": 8}
+    reference = dtw_from_distance_matrix(dense, **options)
+    result = dtw_from_distance_matrix(sparse, **options)
+    assert result.distance == pytest.approx(reference.distance)
+    np.testing.assert_array_equal(result.path, reference.path)
+
+
+def test_banded_rejects_negative_stored_costs(make_logs):
+    x, y = make_logs(6, 30, 30)
+    banded, _ = _band(cdist(x, y), 5)
+    banded.data[7] = -1.0
+    with pytest.raises(ValueError, match="negative"):
+        dtw_from_distance_matrix(banded, window_type="sakoechiba", window_size=5)
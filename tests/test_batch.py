@@ -0,0 +1,64 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, dtw_batch
+from logio.dynamic_time_warping import batch
+
+
+@pytest.fixture
+def created_blocks(monkeypatch):
+    """Names of the shared memory blocks created in this process."""
+    names = []
+
+    class RecordingSharedMemory(SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if kwargs.get("create"):
+                names.append(self.name)
+
+    monkeypatch.setattr(batch, "SharedMemory", RecordingSharedMemory)
+    return names
+
+
+def _assert_unlinked(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+
+@pytest.mark.parametrize("rle", [False, True])
+def test_batch_equals_serial_dtw(rle, created_blocks, make_logs):
+    wells = {}
+    for seed, name in enumerate(["A", "B", "C"]):
+        wells[name] = make_logs(seed, len_x=50 + 10 * seed)[0]
+    pairs = [("A", "B"), ("B", "C"), ("C", "A"), ("A", "A")]
+    options = {"step_pattern": "symmetricP05", "window_type": "itakura"}
+    results = dtw_batch(wells, pairs, n_jobs=2, rle=rle, **options)
+    assert len(results) == len(pairs)
+    for (query, reference), result in zip(pairs, results):
+        expected = dtw(wells[query], wells[reference], **options)
+        assert result.cumsum_matrix is None
+        assert result.distance == pytest.approx(expected.distance)
+        np.testing.assert_array_equal(np.asarray(result.path), expected.path)
+    _assert_unlinked(created_blocks)
+
+
+def test_blocks_are_unlinked_after_a_failed_batch(created_blocks, make_logs):
+    x, y = make_logs()
+    with pytest.raises(KeyError, match="D"):
+        dtw_batch({"A": x, "B": y}, [("A", "B"), ("A", "D")], n_jobs=1)
+    _assert_unlinked(created_blocks)
+
+
+def test_open_store_is_kept_for_the_caller(make_logs):
+    x, y = make_logs()
+    with batch.SharedWellStore({"A": x, "B": y}) as store:
+        first, = dtw_batch(store, [("A", "B")], n_jobs=1)
+        second, = dtw_batch(store, [("B", "A")], n_jobs=1)
+        names = [store.descriptor(name)[0] for name in store.names]
+    assert first.distance == pytest.approx(dtw(x, y).distance)
+    assert second.distance == pytest.approx(dtw(y, x).distance)
+    _assert_unlinked(names)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, DtwCache
+
+
+def test_hit_on_identical_and_miss_on_changed_arguments(tmp_path, logs):
+    x, y = logs
+    cache = DtwCache(tmp_path)
+    computed = dtw(x, y, window_type="sakoechiba", window_size=20, cache=cache)
+    assert computed.cumsum_matrix is not None and len(cache) == 1
+    # a hit is the slim stored copy
+    hit = dtw(x.copy(), y.copy(), window_type="sakoechiba", window_size=20, cache=cache)
+    assert hit.cumsum_matrix is None and len(cache) == 1
+    assert hit.distance == computed.distance
+    np.testing.assert_array_equal(hit.path, computed.path)
+    for options in [{"window_size": 21}, {"step_pattern": "asymmetric", "window_size": 20},
+        {"window_size": 20, "open_end": True}]:
+        options.setdefault("window_type", "sakoechiba")
+        miss = dtw(x, y, cache=cache, **options)
+        assert miss.cumsum_matrix is not None
+    assert len(cache) == 4
+    y[0, 0] += 1e-9
+    assert dtw(x, y, window_type="sakoechiba", window_size=20, cache=cache).cumsum_matrix \
+        is not None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, logs):
+    x, y = logs
+    result = dtw(x, y)
+    cache = DtwCache(tmp_path)
+    cache.put("a", result)
+    entry_bytes = cache.size_bytes
+    cache.max_bytes = int(2.5 * entry_bytes)
+    cache.put("b", result)
+    os.utime(tmp_path / "a.npz", (1000, 1000))
+    os.utime(tmp_path / "b.npz", (2000, 2000))
+    # reading "a" makes "b" the least recently used entry
+    assert cache.get("a", result._pattern) is not None
+    cache.put("c", result)
+    assert sorted(path.stem for path in tmp_path.glob("*.npz")) == ["a", "c"]
+    assert cache.size_bytes <= cache.max_bytes
+
+
+@pytest.mark.parametrize("damage", ["garbage", "truncated", "empty"])
+def test_corrupted_entry_is_dropped_and_recomputed(tmp_path, damage, logs):
+    x, y = logs
+    cache = DtwCache(tmp_path)
+    computed = dtw(x, y, cache=cache)
+    (entry,) = tmp_path.glob("*.npz")
+    content = entry.read_bytes()
+    entry.write_bytes({"garbage": b"not an npz file", "truncated": content[:len(content) // 2],
+        "empty": b""}[damage])
+    assert cache.get(entry.stem, computed._pattern) is None
+    assert not entry.exists()
+    recomputed = dtw(x, y, cache=cache)
+    assert recomputed.cumsum_matrix is not None
+    assert recomputed.distance == computed.distance
+    assert dtw(x, y, cache=cache).cumsum_matrix is None
+
+
+def test_stale_partial_writes_are_removed(tmp_path, logs):
+    x, y = logs
+    stale = tmp_path / "dead-writer.tmp"
+    fresh = tmp_path / "live-writer.tmp"
+    stale.write_bytes(b"partial")
+    fresh.write_bytes(b"partial")
+    os.utime(stale, (1000, 1000))
+    dtw(x, y, cache=tmp_path)
+    assert not stale.exists() and fresh.exists()
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import EmbeddingIndex
+from logio.dynamic_time_warping.embedding import _embed
+
+
+def test_stats_of_short_intervals_are_missing():
+    vector = _embed(np.array([[1.0], [2.0], [4.0]]), "stats", 16)
+    mean, median, std, low, high, skewness, kurtosis = vector
+    assert np.isfinite([mean, median, std, low, high, skewness]).all()
+    assert np.isnan(kurtosis)
+    assert np.isnan(_embed(np.array([[1.0]]), "stats", 16)[2:]).sum() == 3
+
+
+def test_short_interval_keeps_the_library_scale():
+    rng = np.random.default_rng(0)
+    index = EmbeddingIndex(embedding="stats")
+    for key in range(20):
+        index.add(key, rng.gamma(2.0 + key, size=50))
+    index.add("short", np.array([1.0, 2.0, 4.0]))
+    index.query(rng.gamma(2.0, size=50))
+    # every statistic, kurtosis included, keeps its weight
+    assert np.isfinite(index._scale).all()
+    assert (index._scale > 0).all()
+
+
+def test_search_raises_invalid_arguments():
+    rng = np.random.default_rng(0)
+    index = EmbeddingIndex()
+    for key in range(5):
+        index.add(key, rng.normal(size=40))
+    with pytest.raises(ValueError, match="open-begin"):
+        index.search(rng.normal(size=30), open_begin=True, open_end=True)
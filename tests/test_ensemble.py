@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, dtw_ensemble
+from logio.dynamic_time_warping import DTW, ensemble, features
+
+
+def test_ensemble_raises_invalid_arguments(logs):
+    x, y = logs
+    # open begin needs an N-normalizable pattern; not a missing path
+    with pytest.raises(ValueError, match="open-begin"):
+        dtw_ensemble(x, y, num_runs=3, open_begin=True, open_end=True, seed=0)
+
+
+def test_ensemble_runs_without_path_have_infinite_distance(logs):
+    x, y = logs
+    ensemble = dtw_ensemble(x[:20], y, num_runs=4, window_type="sakoechiba",
+        window_sizes=(2, 80), seed=0)
+    no_path = ensemble.runs["window_size"] == 2
+    assert no_path.any() and (~no_path).any()
+    assert np.isinf(ensemble.runs["distance"][no_path]).all()
+    assert np.isfinite(ensemble.runs["distance"][~no_path]).all()
+
+
+def test_ensemble_rejects_dist_only(logs):
+    x, y = logs
+    with pytest.raises(ValueError, match="dist_only"):
+        dtw_ensemble(x, y, num_runs=2, seed=0, dist_only=True)
+
+
+def test_ensemble_prepares_the_features_once(logs, monkeypatch):
+    x, y = logs
+    calls = []
+
+    def prepare(*args, **kwargs):
+        calls.append(args)
+        return features._prepare_features(*args, **kwargs)
+
+    monkeypatch.setattr(ensemble, "_prepare_features", prepare)
+    monkeypatch.setattr(DTW, "_prepare_features", prepare)
+    result = dtw_ensemble(x, y, num_runs=3, noise=0, weights=[1, 3], transforms="zscore", seed=0)
+    # once per log, never per run
+    assert len(calls) == 2
+    path = dtw(x, y, weights=[1, 3], transforms="zscore").path
+    tie = np.bincount(path[:, 0], weights=path[:, 1]) / np.bincount(path[:, 0])
+    for run_ties in result.ties:
+        np.testing.assert_allclose(run_ties, tie)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, ReferenceIndex
+
+
+def _brute_force(reference, x, radius, znorm, **kwargs):
+    """Distance to every candidate interval, by plain dtw."""
+    if znorm:
+        x = (x - x.mean(axis=0)) / x.std(axis=0)
+    distances = []
+    for start in range(reference.shape[0] - x.shape[0] + 1):
+        candidate = reference[start:start + x.shape[0]]
+        if znorm:
+            candidate = (candidate - candidate.mean(axis=0)) / candidate.std(axis=0)
+        distances.append(dtw(x, candidate, window_type="sakoechiba", window_size=radius,
+            **kwargs).distance)
+    return np.array(distances)
+
+
+@pytest.mark.parametrize("step_pattern", ["symmetric1", "symmetric2", "asymmetric"])
+@pytest.mark.parametrize("dist", ["euclidean", "sqeuclidean", "cityblock"])
+@pytest.mark.parametrize("znorm", [False, True])
+def test_query_finds_the_brute_force_best_match(step_pattern, dist, znorm):
+    for seed in range(4):
+        rng = np.random.default_rng(seed)
+        reference = np.cumsum(rng.normal(size=(300, 2)), axis=0)
+        x = reference[120:160] * 1.5 + 3.0 + rng.normal(0, 0.8, size=(40, 2))
+        index = ReferenceIndex(reference, dist=dist, step_pattern=step_pattern, radius=4,
+            znorm=znorm)
+        matches = index.query(x)
+        distances = _brute_force(reference, x, 4, znorm, dist=dist, step_pattern=step_pattern)
+        assert matches["distance"][0] == pytest.approx(distances.min(), rel=1e-9)
+        assert matches["start"][0] == np.argmin(distances)
+
+
+def test_znorm_asymmetric_query_keeps_the_best_match():
+    # every other reference sample is noise, which asymmetric steps can skip
+    for seed in range(10):
+        rng = np.random.default_rng(seed)
+        reference = np.sin(np.arange(300) / 4)[:, np.newaxis]
+        x = reference[120:160] + rng.normal(0, 0.1, size=(40, 1))
+        reference[1::2] = rng.normal(0, 3, size=(150, 1))
+        index = ReferenceIndex(reference, step_pattern="asymmetric", radius=4, znorm=True)
+        distances = _brute_force(reference, x, 4, True, step_pattern="asymmetric")
+        assert index.query(x)["distance"][0] == pytest.approx(distances.min(), rel=1e-9)
+
+
+def test_query_many_matches_query():
+    rng = np.random.default_rng(0)
+    reference = np.cumsum(rng.normal(size=(400, 2)), axis=0)
+    queries = [reference[s:s + n] + rng.normal(0, 0.3, size=(n, 2))
+        for s, n in [(10, 30), (200, 45), (300, 30), (50, 60)]]
+    index = ReferenceIndex(reference, znorm=True)
+    for matches, x in zip(index.query_many(queries, n_jobs=4, k=2), queries):
+        expected = index.query(x, k=2)
+        np.testing.assert_array_equal(matches["start"], expected["start"])
+        np.testing.assert_allclose(matches["distance"], expected["distance"])
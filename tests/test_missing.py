@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from scipy.spatial.distance import cdist
+
+from logio.dynamic_time_warping import dtw, dtw_from_distance_matrix, BandedMatrix
+from logio.dynamic_time_warping.features import FeatureCost
+
+
+@pytest.mark.parametrize("options, distance", [({"nan_policy": "gap", "gap_cost": 0.5}, 0.5),
+    ({"nan_policy": "skip"}, 0.0)])
+@pytest.mark.parametrize("traceback", [False, True])
+def test_masked_alignment_equals_hand_computed(options, distance, traceback):
+    # cost rows [0, 1, 2], [gap, gap, gap], [2, 1, 0]
+    x = np.array([0.0, np.nan, 2.0])
+    y = np.array([0.0, 1.0, 2.0])
+    result = dtw(x, y, step_pattern="symmetric1", traceback=traceback, **options)
+    assert result.distance == pytest.approx(distance)
+    if options["nan_policy"] == "gap":
+        # a free gap row ties with other paths; a costly one runs the diagonal
+        np.testing.assert_array_equal(result.path, [[0, 0], [1, 1], [2, 2]])
+
+
+def test_masked_alignment_equals_filled_cost_matrix(make_logs):
+    x, y = make_logs(2)
+    x[10:15] = np.nan
+    y[40] = np.nan
+    result = dtw(x, y, nan_policy="gap", gap_cost=1.5)
+    cost = cdist(x, y)
+    cost[np.isnan(cost)] = 1.5
+    filled = dtw_from_distance_matrix(cost)
+    assert result.distance == pytest.approx(filled.distance)
+    np.testing.assert_array_equal(result.path, filled.path)
+
+
+def test_nan_policy_raise(make_logs):
+    x, y = make_logs()
+    # complete logs align as with "propagate"
+    assert dtw(x, y, nan_policy="raise").distance == pytest.approx(dtw(x, y).distance)
+    x[3, 1] = np.nan
+    with pytest.raises(ValueError, match="missing"):
+        dtw(x, y, nan_policy="raise")
+    with pytest.raises(ValueError, match="gap_cost"):
+        dtw(x, y, nan_policy="gap")
+    with pytest.raises(NotImplementedError):
+        dtw(x, y, nan_policy="drop")
+
+
+def test_default_gap_cost_for_every_storage(make_logs):
+    x, y = make_logs(3)
+    x_valid = np.ones(x.shape[0], dtype=np.bool_)
+    y_valid = np.ones(y.shape[0], dtype=np.bool_)
+    x_valid[20:25] = False
+    y_valid[[5, 60]] = False
+    cost = cdist(x, y)
+    rows = np.arange(x.shape[0])
+    ranges = np.column_stack((np.maximum(rows - 30, 0), np.minimum(rows + 31, y.shape[0])))
+    banded = BandedMatrix(np.concatenate([cost[i, start:stop] for i, (start, stop)
+        in enumerate(ranges)]), ranges, cost.shape)
+    storages = [cost, banded, FeatureCost(x, y, "euclidean")]
+    # masked cells cost 0.0 unless a gap cost is given
+    expected = cost.copy()
+    expected[~x_valid, :] = 0.0
+    expected[:, ~y_valid] = 0.0
+    reference = dtw_from_distance_matrix(expected, window_type="sakoechiba", window_size=30)
+    for X in storages:
+        result = dtw_from_distance_matrix(X, window_type="sakoechiba", window_size=30,
+            x_valid=x_valid, y_valid=y_valid)
+        assert result.distance == pytest.approx(reference.distance)
+        np.testing.assert_array_equal(result.path, reference.path)
@@ -0,0 +1,59 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw
+from logio.dynamic_time_warping.path import RLEPath
+
+
+def _paths(make_logs):
+    x, y = make_logs(7, 60, 75)
+    yield dtw(x, y).path
+    yield dtw(x, y, step_pattern="asymmetric", open_begin=True, open_end=True).path
+    # one cell, and runs longer than a length byte
+    yield np.array([[3, 4]])
+    yield np.column_stack((np.arange(700), np.arange(700) // 2))
+    yield np.vstack(([[0, 0]], np.column_stack((np.ones(600, dtype=int), np.arange(1, 601)))))
+
+
+def test_round_trip(make_logs):
+    for path in _paths(make_logs):
+        rle = RLEPath.from_path(path)
+        assert rle.shape == path.shape and len(rle) == path.shape[0]
+        np.testing.assert_array_equal(rle.to_array(), path)
+        np.testing.assert_array_equal(np.asarray(rle), path)
+        np.testing.assert_array_equal(pickle.loads(pickle.dumps(rle)).to_array(), path)
+        assert rle == RLEPath.from_path(path.copy())
+    # the last path is two runs
+    assert rle.nbytes < path.nbytes / 100
+
+
+def test_indexing(make_logs):
+    for path in _paths(make_logs):
+        rle = RLEPath.from_path(path)
+        for k in (0, 1, -1):
+            np.testing.assert_array_equal(rle[:, k], path[:, k])
+        for key in (0, -1, slice(2, 9), (slice(None, None, 3), 1), np.array([0, len(rle) - 1])):
+            np.testing.assert_array_equal(rle[key], path[key])
+
+
+def test_invalid_paths():
+    with pytest.raises(ValueError):
+        RLEPath.from_path(np.empty((0, 2)))
+    with pytest.raises(ValueError):
+        RLEPath.from_path(np.arange(5))
+    with pytest.raises(ValueError):
+        RLEPath([0, 0], [[1, 1]], [1], [3])
+
+
+@pytest.mark.parametrize("target", ["query", "reference"])
+def test_slim_result_keeps_the_warping_path(target, make_logs):
+    x, y = make_logs(8, 60, 75)
+    result = dtw(x, y, step_pattern="symmetricP05")
+    slim = result.slim(rle=True)
+    assert isinstance(slim.path, RLEPath) and slim.cumsum_matrix is None
+    assert slim.distance == result.distance
+    np.testing.assert_array_equal(slim.get_warping_path(target), result.get_warping_path(target))
+    # encoding twice keeps the encoded path
+    assert slim.slim(rle=True).path is slim.path
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw
+from logio.dynamic_time_warping.plan import _plan
+
+
+@pytest.mark.parametrize("options", [{}, {"window_type": "sakoechiba", "window_size": 40},
+    {"open_begin": True, "open_end": True, "step_pattern": "asymmetric"},
+    {"nan_policy": "gap", "gap_cost": 2.0}, {"weights": [1, 2, 0.5], "dist": "cityblock"},
+    {"dist": "sqeuclidean", "window_type": "itakura"}])
+def test_all_strategies_give_the_same_alignment(options):
+    rng = np.random.default_rng(1)
+    x = np.cumsum(rng.normal(size=(150, 3)), axis=0)
+    y = np.cumsum(rng.normal(size=(170, 3)), axis=0)
+    if "nan_policy" in options:
+        x[5, 1] = np.nan
+    reference = dtw(x, y, **options)
+    estimates = dtw(x, y, memory_budget=1e12, **options).plan.estimates
+    strategies = set()
+    for name, nbytes in estimates.items():
+        result = dtw(x, y, memory_budget=nbytes, **options)
+        strategies.add(result.plan.strategy)
+        assert result.distance == pytest.approx(reference.distance, rel=1e-12)
+        np.testing.assert_array_equal(result.path, reference.path)
+    assert {"traceback", "linear"} <= strategies
+
+
+def test_out_of_core_needs_the_disk_space_of_every_window_cell():
+    rng = np.random.default_rng(1)
+    x = np.cumsum(rng.normal(size=(1000, 3)), axis=0)
+    y = np.cumsum(rng.normal(size=(1100, 3)), axis=0)
+    plan = dtw(x, y, memory_budget=1e12).plan
+    # one traceback byte per cell on disk, none of them in memory
+    assert plan.estimates["out-of-core"] < 1000 * 1100
+    assert plan.estimates["linear"] < 1000 * 1100
+    budget = plan.estimates["out-of-core"]
+    assert _plan(budget, plan.estimates, 1000 * 1100).strategy == "out-of-core"
+    with pytest.raises(MemoryError):
+        _plan(budget, plan.estimates, 1000 * 1100, disk_free=1000 * 1100 - 1)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from scipy.spatial.distance import cdist
+
+from logio.dynamic_time_warping import dtw, dtw_from_distance_matrix
+
+
+@pytest.mark.parametrize("window_type", ["none", "sakoechiba", "shifted"])
+def test_prior_without_corridor_raises(window_type, logs):
+    x, y = logs
+    prior = dtw(x, y)
+    with pytest.raises(ValueError, match="corridor"):
+        dtw(x, y, window_type=window_type, window_size=10, prior=prior)
+    if window_type != "shifted":
+        with pytest.raises(ValueError, match="corridor"):
+            dtw_from_distance_matrix(cdist(x, y), window_type=window_type, window_size=10,
+                prior=prior)
+
+
+def test_corridor_follows_prior(logs):
+    x, y = logs
+    prior = dtw(x, y)
+    result = dtw(x, y, window_type="corridor", window_size=5, prior=prior)
+    assert result.distance == pytest.approx(prior.distance)
+    matrix = dtw_from_distance_matrix(cdist(x, y), window_type="corridor", window_size=5,
+        prior=prior.path)
+    np.testing.assert_array_equal(matrix.path, result.path)
+
+
+@pytest.mark.parametrize("len_x", [200, 400])
+def test_corridor_allocations_scale_with_the_corridor(len_x, make_logs):
+    x, y = make_logs(len_x=len_x, len_y=len_x + 20)
+    prior = dtw(x, y)
+    result = dtw(x, y, window_type="corridor", window_size=5, prior=prior, profile=True)
+    allocations = result.profile.allocations
+    window_cells = result.profile.counters["window_cells"]
+    # rolling cumsum rows, one traceback byte and a banded cost per corridor cell
+    assert allocations["cumsum_matrix"] < 8 * (len_x + 20) * 8
+    assert allocations["traceback"] == window_cells
+    assert allocations["cost_matrix"] < 2 * 8 * window_cells
+    assert result.distance == pytest.approx(prior.distance)
+    np.testing.assert_array_equal(result.path, prior.path)
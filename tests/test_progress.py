@@ -0,0 +1,78 @@
+import functools
+import tempfile
+
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, CancelToken, DtwCancelled
+from logio.dynamic_time_warping import DTW
+from logio.dynamic_time_warping.progress import _run_in_chunks
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Run the kernel in chunks of 500 window cells."""
+    monkeypatch.setattr(DTW, "_run_in_chunks", functools.partial(_run_in_chunks, chunk_cells=500))
+
+
+@pytest.mark.parametrize("traceback", [False, True])
+def test_progress_is_monotone_and_ends_at_all_rows(traceback, small_chunks, logs):
+    x, y = logs
+    calls = []
+    result = dtw(x, y, window_type="sakoechiba", window_size=30, traceback=traceback,
+        progress=lambda *args: calls.append(args))
+    rows = [call[0] for call in calls]
+    assert len(calls) > 3
+    assert all(call[1] == x.shape[0] for call in calls)
+    assert np.all(np.diff(rows) > 0)
+    assert rows[-1] == x.shape[0] and calls[-1][2] == 0.0
+    # the first chunk may include compilation; later etas come from the rate after it
+    assert np.isnan(calls[0][2])
+    assert all(np.isfinite(call[2]) and call[2] >= 0 for call in calls[1:])
+    reference = dtw(x, y, window_type="sakoechiba", window_size=30, traceback=traceback)
+    assert result.distance == reference.distance
+    np.testing.assert_array_equal(result.path, reference.path)
+
+
+def test_progress_of_the_cell_list_kernel_reports_all_rows(logs):
+    x, y = logs
+    calls = []
+    # column 45 is cut out of every row but one, so rows are not contiguous
+    window = DTW.UserWindow(x.shape[0], y.shape[0], lambda i, j: j != 45 or i == 45)
+    assert window.ranges is None
+    dtw(x, y, window_type=window, progress=lambda *args: calls.append(args))
+    assert calls == [(x.shape[0], x.shape[0], 0.0)]
+
+
+def test_cancel_raises_and_removes_the_scratch_file(small_chunks, monkeypatch, tmp_path, logs):
+    x, y = logs
+    files = []
+
+    def temporary_file(*args, **kwargs):
+        files.append(temporary(*args, **kwargs))
+        return files[-1]
+
+    temporary = tempfile.TemporaryFile
+    monkeypatch.setattr(DTW.tempfile, "TemporaryFile", temporary_file)
+    token = CancelToken()
+    calls = []
+
+    def progress(*args):
+        calls.append(args)
+        token.cancel()
+
+    with pytest.raises(DtwCancelled):
+        DTW.dtw_from_distance_matrix(np.ones((x.shape[0], y.shape[0])), traceback=True,
+            scratch_dir=tmp_path, progress=progress, cancel=token)
+    # stopped after the first chunk
+    assert len(calls) == 1 and calls[0][0] < x.shape[0]
+    assert len(files) == 1 and files[0].closed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cancel_before_the_run(logs):
+    x, y = logs
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(DtwCancelled):
+        dtw(x, y, cancel=token)
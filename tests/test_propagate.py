@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from logio.core import LogSynthesizer
+from logio.dynamic_time_warping import dtw, propagate_picks, WarpMapping
+
+CURVES = ["GR", "RHOB", "NPHI"]
+
+
+def _ties(path):
+    """Mean reference index of every query sample."""
+    return np.bincount(path[:, 0], weights=path[:, 1]) / np.bincount(path[:, 0])
+
+
+def _align(query, reference):
+    return dtw(query[CURVES], reference[CURVES], curves=CURVES, transforms="zscore",
+        step_pattern="symmetricP05", open_end=True, x_depth=query["DEPTH"].to_numpy(),
+        y_depth=reference["DEPTH"].to_numpy())
+
+
+def test_pick_crosses_two_wells_to_the_known_warp():
+    synthesizer = LogSynthesizer(seed=1, noise=0.3)
+    reference = synthesizer.log(1500, top=2000.0)
+    first, first_truth = synthesizer.warp(reference, stretch=1.15, depth_shift=-30.0)
+    second, second_truth = synthesizer.warp(reference, stretch=0.85, depth_shift=25.0)
+    # the second well is only reached through the reference, against its alignment
+    results = {("A", "R"): _align(first, reference), ("B", "R"): _align(second, reference)}
+    depth = {"A": first["DEPTH"].to_numpy(), "R": reference["DEPTH"].to_numpy(),
+        "B": second["DEPTH"].to_numpy()}
+    index = np.array([150, 500, 900])
+    picks = propagate_picks(results, dict(zip(["top", "middle", "base"], depth["A"][index])), "A")
+    assert list(picks.columns) == ["A", "R", "B"]
+    assert list(picks.index) == ["top", "middle", "base"]
+
+    # true position of the picks in the reference, then in the second well
+    ref_position = _ties(first_truth)[index]
+    second_ties = _ties(second_truth)
+    second_position = np.interp(ref_position, second_ties, np.arange(second_ties.size))
+    step = synthesizer.step
+    np.testing.assert_allclose(picks["R"], np.interp(ref_position, np.arange(depth["R"].size),
+        depth["R"]), atol=3 * step)
+    np.testing.assert_allclose(picks["B"], np.interp(second_position, np.arange(depth["B"].size),
+        depth["B"]), atol=3 * step)
+
+    # composing the mappings equals applying them in turn
+    there = WarpMapping.from_result(results[("A", "R")])
+    back = WarpMapping.from_result(results[("B", "R")], inverse=True)
+    np.testing.assert_allclose(there.then(back)(depth["A"][index]), back(there(depth["A"][index])))
+
+
+def test_picks_outside_the_alignment_are_missing():
+    mapping = WarpMapping([0.0, 1.0, 2.0], [10.0, 10.0, 12.0])
+    assert np.isnan(mapping([-1.0, 3.0])).all()
+    np.testing.assert_allclose(mapping([0.5, 1.5]), [10.0, 11.0])
+    # the flat stretch maps back to its mean
+    np.testing.assert_allclose(mapping.inverse()([10.0, 11.0, 12.0]), [0.5, 1.25, 2.0])
+    with pytest.raises(ValueError, match="overlap"):
+        mapping.then(WarpMapping([20.0, 30.0], [0.0, 1.0]))
+
+
+@pytest.mark.parametrize("xp, fp", [([0.0, 2.0, 1.0], [0.0, 1.0, 2.0]),
+    ([0.0, 1.0, 1.0], [0.0, 1.0, 2.0]), ([0.0, 1.0, 2.0], [0.0, 2.0, 1.0]),
+    ([0.0, np.nan, 2.0], [0.0, 1.0, 2.0])])
+def test_non_monotone_positions_are_rejected(xp, fp):
+    with pytest.raises(ValueError, match="increasing"):
+        WarpMapping(xp, fp)
+
+
+def test_descending_depth_axes_are_rejected(make_logs):
+    x, y = make_logs()
+    result = dtw(x, y, x_depth=-np.arange(x.shape[0], dtype=np.float64),
+        y_depth=np.arange(y.shape[0], dtype=np.float64))
+    with pytest.raises(ValueError, match="depth axes"):
+        WarpMapping.from_result(result)
+    with pytest.raises(ValueError, match="depth axes"):
+        propagate_picks({("A", "B"): result}, [-10.0], "A")
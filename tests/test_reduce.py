@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from logio.core import LogSynthesizer
+from logio.dynamic_time_warping import dtw
+from logio.dynamic_time_warping.reduce import _reduce_log
+
+
+def _ties(path):
+    """Mean reference index of every query sample."""
+    return np.bincount(path[:, 0], weights=path[:, 1]) / np.bincount(path[:, 0])
+
+
+@pytest.mark.parametrize("method", ["paa", "envelope"])
+@pytest.mark.parametrize("factor", [2, 3, 8])
+def test_expanded_path_stays_in_the_coarse_blocks(method, factor, make_logs):
+    x, y = make_logs(9, 200, 230)
+    result = dtw(x, y, reduce=(method, factor), window_type="sakoechiba", window_size=60)
+    coarse = dtw(_reduce_log(x, method, factor), _reduce_log(y, method, factor),
+        window_type="sakoechiba", window_size=-(-60 // factor))
+    assert result.distance == pytest.approx(coarse.distance)
+    path = result.path
+    # full-resolution, monotone, connected and corner to corner
+    np.testing.assert_array_equal(path[0], [0, 0])
+    np.testing.assert_array_equal(path[-1], [199, 229])
+    steps = np.diff(path, axis=0)
+    assert steps.min() >= 0 and steps.max() <= 1 and (steps.sum(axis=1) > 0).all()
+    # every cell lies in a block of the coarse path
+    blocks = set(map(tuple, coarse.path))
+    assert all(tuple(block) in blocks for block in path // factor)
+    # and in the full-resolution window of the result
+    ranges = result._window.ranges
+    assert ((path[:, 1] >= ranges[path[:, 0], 0]) & (path[:, 1] < ranges[path[:, 0], 1])).all()
+
+
+@pytest.mark.parametrize("reduce", [2, 4, ("envelope", 2), ("envelope", 4)])
+def test_reduced_alignment_recovers_a_known_warp(reduce):
+    query, reference, truth = LogSynthesizer(seed=0, noise=0.3).pair(1500, stretch=1.1)
+    curves = ["GR", "RHOB", "NPHI"]
+    result = dtw(query[curves], reference[curves], curves=curves, transforms="zscore",
+        reduce=reduce, step_pattern="symmetricP05", open_end=True)
+    factor = reduce if np.isscalar(reduce) else reduce[1]
+    estimate, expected = _ties(result.path), _ties(truth)
+    num = min(estimate.size, expected.size)
+    # within a block of the true tie for most samples
+    assert np.median(np.abs(estimate[:num] - expected[:num])) <= factor
+
+
+def test_factor_one_is_the_full_alignment(make_logs):
+    x, y = make_logs(10, 60, 70)
+    reduced, full = dtw(x, y, reduce=1), dtw(x, y)
+    assert reduced.distance == pytest.approx(full.distance)
+    np.testing.assert_array_equal(reduced.path, full.path)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from logio.core import Resampler
+from logio.dynamic_time_warping import dtw
+
+
+def _irregular(seed=0, num=300):
+    """Log at irregular depths no further apart than the default max_gap; curves linear in depth."""
+    rng = np.random.default_rng(seed)
+    depth = 1000.0 + np.cumsum(rng.uniform(0.05, 0.18, num))
+    return DataFrame({"DEPTH": depth, "GR": 2.0 * depth - 1900.0, "RHOB": 3.0 - 0.001 * depth,
+        "FACIES": np.where(depth < depth[num // 2], "sand", "shale")})
+
+
+def test_irregular_depth_is_interpolated_onto_the_grid():
+    data = _irregular()
+    out = Resampler(0.1).resample(data)
+    nodes = out["DEPTH"].to_numpy()
+    np.testing.assert_allclose(np.diff(nodes), 0.1)
+    # nodes are multiples of the step and cover the data
+    np.testing.assert_allclose(nodes / 0.1, np.round(nodes / 0.1), atol=1e-6)
+    assert data["DEPTH"].iloc[0] <= nodes[0] < data["DEPTH"].iloc[0] + 0.1
+    assert data["DEPTH"].iloc[-1] - 0.1 < nodes[-1] <= data["DEPTH"].iloc[-1]
+    # linear curves are interpolated exactly
+    np.testing.assert_allclose(out["GR"], 2.0 * nodes - 1900.0)
+    np.testing.assert_allclose(out["RHOB"], 3.0 - 0.001 * nodes)
+    assert list(out.columns) == list(data.columns)
+    assert set(out["FACIES"]) == {"sand", "shale"}
+
+
+def test_wide_gaps_are_missing():
+    data = _irregular(1)
+    data = data[(data["DEPTH"] < 1010) | (data["DEPTH"] > 1012)]
+    out = Resampler(0.1).resample(data)
+    nodes = out["DEPTH"].to_numpy()
+    in_gap = (nodes > 1010.3) & (nodes < 1011.7)
+    assert in_gap.any() and out["GR"][in_gap].isna().all()
+    assert out["FACIES"][in_gap].isna().all()
+    # nodes on either side are interpolated as before
+    outside = (nodes < 1009.9) | (nodes > 1012.1)
+    np.testing.assert_allclose(out["GR"][outside], 2.0 * nodes[outside] - 1900.0)
+    # a wider max_gap bridges it
+    bridged = Resampler(0.1, max_gap=3.0).resample(data)
+    assert not bridged["GR"].isna().any()
+
+
+def test_descending_depth_equals_ascending():
+    data = _irregular(2)
+    resampler = Resampler(0.1)
+    descending = data.iloc[::-1].reset_index(drop=True)
+    ascending = resampler.resample(data)
+    for method in ("linear", "mean"):
+        resampler.method = method
+        assert_frame_equal(resampler.resample(descending), resampler.resample(data))
+    assert ascending["DEPTH"].is_monotonic_increasing
+
+
+def test_block_mean_and_decimate():
+    depth = np.arange(0.0, 10.0, 0.5)
+    data = DataFrame({"DEPTH": depth, "GR": np.arange(depth.size, dtype=np.float64)})
+    out = Resampler(1.0, method="mean").resample(data)
+    # bins centred on the nodes: node k averages samples at k - 0.5 (exclusive) to k + 0.5
+    np.testing.assert_allclose(out["GR"].to_numpy()[1:], np.arange(2, depth.size, 2) - 0.5)
+    decimated = Resampler(0.5).decimate(data, 2)
+    np.testing.assert_allclose(decimated.to_numpy(), out.to_numpy())
+    with pytest.raises(ValueError):
+        Resampler(0.5).decimate(data, 0)
+
+
+@pytest.mark.parametrize("options", [{}, {"window_type": "sakoechiba", "window_size": 80,
+    "traceback": True}, {"reduce": 3}])
+def test_depths_reach_the_depth_path(options):
+    resampler = Resampler(0.1)
+    query = resampler.resample(_irregular(3, 400))
+    reference = resampler.resample(_irregular(4, 450))
+    x_depth, y_depth = query["DEPTH"].to_numpy(), reference["DEPTH"].to_numpy()
+    result = dtw(query[["GR", "RHOB"]].to_numpy(), reference[["GR", "RHOB"]].to_numpy(),
+        x_depth=x_depth, y_depth=y_depth, **options)
+    depth_path = result.get_depth_path()
+    np.testing.assert_array_equal(depth_path[:, 0], x_depth[result.path[:, 0]])
+    np.testing.assert_array_equal(depth_path[:, 1], y_depth[result.path[:, 1]])
+    np.testing.assert_array_equal(depth_path[[0, -1]], [[x_depth[0], y_depth[0]],
+        [x_depth[-1], y_depth[-1]]])
+    with pytest.raises(ValueError, match="x_depth"):
+        dtw(query[["GR"]].to_numpy(), reference[["GR"]].to_numpy(), **options).get_depth_path()
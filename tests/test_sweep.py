@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from logio.dynamic_time_warping import dtw, dtw_sweep
+
+
+def test_sweep_paths_equal_dtw_paths(logs):
+    x, y = logs
+    patterns = ("symmetric2", "symmetricP05", "asymmetric")
+    windows = ("none", ("sakoechiba", 20), ("itakura", None))
+    sweep = dtw_sweep(x, y, patterns=patterns, windows=windows, return_path=True)
+    for row in sweep.itertuples():
+        window_type, window_size = ("none", None) if row.window_type == "none" \
+            else (row.window_type, row.window_size)
+        result = dtw(x, y, step_pattern=row.step_pattern, window_type=window_type,
+            window_size=window_size)
+        assert row.distance == pytest.approx(result.distance)
+        np.testing.assert_array_equal(row.path, result.path)
+
+
+def test_sweep_raises_invalid_cost(logs):
+    x, y = logs
+    # a bad cost matrix is an error, not a missing path
+    with pytest.raises(ValueError, match="negative"):
+        dtw_sweep(x, y, dist=lambda a, b: -1.0)
+
+
+@pytest.mark.parametrize("step_pattern, window, len_y", [("symmetricP1", ("itakura", None), 90),
+    ("symmetricP2", ("itakura", None), 90), ("asymmetricP1", ("itakura", None), 90),
+    ("typeIIIc", ("sakoechiba", 2), 80)])
+def test_sweep_reads_the_pattern_reach_outside_the_window(step_pattern, window, len_y,
+    make_logs):
+    # multi-step patterns read cost cells outside the window
+    x, y = make_logs(len_y=len_y)
+    sweep = dtw_sweep(x, y, patterns=(step_pattern,), windows=[window])
+    result = dtw(x, y, step_pattern=step_pattern, window_type=window[0], window_size=window[1])
+    assert np.isfinite(result.distance)
+    assert sweep["distance"][0] == pytest.approx(result.distance)